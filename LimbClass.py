@@ -3,23 +3,23 @@ import maya.cmds as cmds
 from typing import *
 from library import *
 from modules import *
-
-myLimbObject = None
-myHandObject = None
-
+from config import LimbConfig
+from context import limb_context
+from hierarchy import hierarchy_index, index_hierarchy
+from manifest import get_manifest
+from names import LimbNames
+from snapshot import match_world_matrix, take_snapshot
+from limb_solver import NODE_TYPE as SOLVER_NODE_TYPE, load_plugin
+from performance import with_performance_mode
+from transaction import transactional
 
 def getLimbObject():
-    global myLimbObject
-    if myLimbObject is None:
-        myLimbObject = LimbClass()
-    return myLimbObject
+    # Limb of the window, cached per root joint and switch for the session (context.py)
+    return limb_context(LimbConfig.from_ui()).get("limb", LimbClass)
 
 
 def getHandObject():
-    global myHandObject
-    if myHandObject is None:
-        myHandObject = HandClass()
-    return myHandObject
+    return limb_context(LimbConfig.from_ui()).get("hand", HandClass)
 
 class LimbClass:
     
@@ -40,34 +40,38 @@ class LimbClass:
     ik_control: str
     pole_control: str
 
-    def __init__(self):
+    def __init__(self, config: Optional[LimbConfig] = None):
+
+        if config is None:
+            config = LimbConfig.from_ui()
 
-        self.root_joint = get_loaded_text_field("txt_joint_root")
-        self.scale = get_float_field("ff_limb_scale")
+        self.config = config
+
+        self.root_joint = config.root_joint
+        self.scale = config.scale
 
         if len(self.root_joint) == 0:
             raise ValueError ("Please load a root joint.")
 
-        self.limb_type = "biped" if radio_is_checked("rad_limb_biped") else "quadruped"
+        self.limb_type = config.limb_type
 
-        self.hierarchy = get_hierachy(self.root_joint)
+        # Indexed once, shared with HandClass and the bendy limbs
+        self.index = index_hierarchy(self.root_joint)
+        self.hierarchy = self.index.joints
 
-        self.limb_joint_number = 3 if radio_is_checked("rad_limb_biped") else 4
+        self.limb_joint_number = 3 if self.limb_type == "biped" else 4
 
-        if self.limb_type == "biped":
-            if radio_is_checked("rad_limb_biped_arm"):
-                self.limb_name = BipedLimb.Arm
-            else:
+        self.limb_name = config.limb_name
 
-                if len(self.hierarchy) >= 5 :  # Check if a foot is included
-                    self.limb_joint_number = 5
+        if self.limb_name == BipedLimb.Leg:
+            if "toe" in self.index.roles:  # Check if a foot is included
+                self.limb_joint_number = 5
 
-                self.limb_name = BipedLimb.Leg
+        self.limb_joints = self.index.chain[: self.limb_joint_number]
+        self.end_joint = self.index.role("end")
 
-        else:
-            self.limb_name = (
-                "front" if radio_is_checked("rad_limb_quadruped_front") else "rear"
-            )
+        # Roles of the limb joints ("root", "mid", "end", "ball", "toe"), used as manifest roles
+        self.joint_roles = {role: joint for role, joint in self.index.roles.items() if joint in self.limb_joints}
 
         self.side = self.root_joint[-1]
 
@@ -82,7 +86,10 @@ class LimbClass:
 
         self.root_parent = root_parents[0]
 
-        self.switch = get_loaded_text_field("txt_controller_switch")
+        # World matrices of the SK joints, read once for the whole build
+        self.snapshot = take_snapshot(self.root_joint, self.hierarchy)
+
+        self.switch = config.switch
 
         if len(self.switch) == 0:
             raise ValueError("Please load a switch controller.")
@@ -105,6 +112,19 @@ class LimbClass:
 
         self.pole_control = f"{NameConvention.controller}_pole_" + self.suffix_name
 
+        # Every name the build creates, checked against the scene before each stage
+        self.names = LimbNames(self.limb_joints, self.suffix_name, self.side, fkik_blend=config.fkik_blend)
+
+    @property
+    def manifest(self):
+        return get_manifest(self.suffix_name)
+
+    def _joint_roles(self, kind: str, nodes: Optional[Dict[str, Any]] = None):
+        # {"fk.root": "FK_shoulder_L", ...} for a kind of joint_names, or for nodes made per SK joint
+        if nodes is None:
+            nodes = {joint: self.names[joint][kind] for joint in self.joint_roles.values()}
+        return {f"{kind}.{role}": nodes[joint] for role, joint in self.joint_roles.items()}
+
     def duplicate_hierarchy(self):
 
         ###################################
@@ -116,29 +136,30 @@ class LimbClass:
 
         ###################################
 
-        cmds.select(cl=True)
+        self.names.check("duplicate_hierarchy")
 
-        for new_joint_prefix in self.JOINTS_PREFIX:
+        for kind in ["fk", "ik"]:
 
-            for i in range(self.limb_joint_number):
+            # Every joint is created under the previous one, the root under the root parent
+            parent = self.root_parent
 
-                new_joint_name = self.hierarchy[i]
+            for sk_jnt in self.limb_joints:
 
-                new_joint_name = new_joint_name.replace(NameConvention.main + "_", new_joint_prefix)
+                new_joint_name = self.names[sk_jnt][kind]
 
-                cmds.joint(n=new_joint_name, rad=0.3)
+                create_joint(new_joint_name, parent, radius=0.3)
 
-                cmds.matchTransform(new_joint_name, self.hierarchy[i])
+                match_world_matrix(new_joint_name, sk_jnt)
 
                 cmds.makeIdentity(new_joint_name, a=1, t=0, r=1, s=0)
 
-            cmds.select(cl=True)
-
-        ik_root = self.root_joint.replace(NameConvention.main, NameConvention.ik)
-        fk_root = self.root_joint.replace(NameConvention.main, NameConvention.fk)
+                parent = new_joint_name
 
-        cmds.parent(ik_root, self.root_parent)
-        cmds.parent(fk_root, self.root_parent)
+        roles = {f"sk.{role}": joint for role, joint in self.joint_roles.items()}
+        roles.update(self._joint_roles("fk"))
+        roles.update(self._joint_roles("ik"))
+        roles["switch"] = self.switch
+        self.manifest.update(roles)
 
     def pair_blend(self):
 
@@ -151,47 +172,118 @@ class LimbClass:
 
         ###################################
 
-        blend_jointsList: List[str] = [NameConvention.ik, NameConvention.fk]
-
         # We only process the first n elements, where n is `limb_joints`.
+        # All the nodes and connections are committed at once, as one undo entry
 
-        for sk_jnt in self.hierarchy[: self.limb_joint_number]:
+        self.names.check("pair_blend")
 
-            jnt = sk_jnt.replace(NameConvention.main, "")
-            ik_jnt = blend_jointsList[0] + jnt
-            fk_jnt = blend_jointsList[1] + jnt
+        if self.config.fkik_blend == "matrix":
+            self.matrix_blend()
+            return
 
-            # IK will be 1 and FK will be 2
-            cmds.shadingNode("pairBlend", au=1, n="pairBlend_" + jnt)
+        if self.config.fkik_blend == "solver":
+            self.solver_blend()
+            return
 
-            cmds.connectAttr(
-                (ik_jnt + ".translate"), ("pairBlend_" + jnt + ".inTranslate1"), f=1
-            )
-            cmds.connectAttr(
-                (ik_jnt + ".rotate"), ("pairBlend_" + jnt + ".inRotate1"), f=1
-            )
+        with edit_batch("pair_blend"):
 
-            cmds.connectAttr(
-                (fk_jnt + ".translate"), ("pairBlend_" + jnt + ".inTranslate2"), f=1
-            )
-            cmds.connectAttr(
-                (fk_jnt + ".rotate"), ("pairBlend_" + jnt + ".inRotate2"), f=1
-            )
+            pair_blends = {}
+            for sk_jnt in self.limb_joints:
 
-            cmds.connectAttr(
-                ("pairBlend_" + jnt + ".outTranslate"), (sk_jnt + ".translate"), f=1
-            )
-            cmds.connectAttr(
-                ("pairBlend_" + jnt + ".outRotate"), (sk_jnt + ".rotate"), f=1
-            )
+                names = self.names[sk_jnt]
+                ik_jnt = names["ik"]
+                fk_jnt = names["fk"]
 
-            cmds.connectAttr(
-                (self.switch + self.switch_attribute),
-                ("pairBlend_" + jnt + ".weight"),
-                f=1,
-            )
+                # IK will be 1 and FK will be 2
+                pair_blend = pair_blends[sk_jnt] = create_node("pairBlend", names["pair_blend"])
+
+                connect_attr(ik_jnt, "translate", pair_blend, "inTranslate1")
+                connect_attr(ik_jnt, "rotate", pair_blend, "inRotate1")
+
+                connect_attr(fk_jnt, "translate", pair_blend, "inTranslate2")
+                connect_attr(fk_jnt, "rotate", pair_blend, "inRotate2")
+
+                connect_attr(pair_blend, "outTranslate", sk_jnt, "translate")
+                connect_attr(pair_blend, "outRotate", sk_jnt, "rotate")
+
+                connect_attr(self.switch, self.switch_attribute[1:], pair_blend, "weight")
+
+            self.manifest.update(self._joint_roles("pair_blend", pair_blends))
+
+            self.lock_switch_transform()
+
+    def matrix_blend(self):
+
+        ###################################
+
+        # Inputs - self
+        # Returns - None
+
+        # Same blend as pair_blend with one blendMatrix per joint : the local
+        # matrices of the IK (input) and FK (target) joints are blended by the
+        # switch, fanned out to every envelope, into the offsetParentMatrix of
+        # the SK joint. 4 connections per joint instead of 7, and the IK
+        # stretch reaches the SK joints through the matrix.
+
+        ###################################
+
+        # The SK joints keep their rest pose in offsetParentMatrix, set before the batch
+        for sk_jnt in self.limb_joints:
+            bake_offset_parent_matrix(sk_jnt)
+
+        with edit_batch("pair_blend"):
+
+            blend_matrices = {}
+            for sk_jnt in self.limb_joints:
+
+                names = self.names[sk_jnt]
+
+                blend_matrix = blend_matrices[sk_jnt] = create_node("blendMatrix", names["blend_matrix"])
+
+                connect_attr(names["ik"], "matrix", blend_matrix, "inputMatrix")
+                connect_attr(names["fk"], "matrix", blend_matrix, "target[0].targetMatrix")
+                connect_attr(self.switch, self.switch_attribute[1:], blend_matrix, "envelope")
+
+                connect_attr(blend_matrix, "outputMatrix", sk_jnt, "offsetParentMatrix")
+
+            self.manifest.update(self._joint_roles("blend_matrix", blend_matrices))
+
+            self.lock_switch_transform()
+
+    def solver_blend(self):
+
+        ###################################
+
+        # Inputs - self
+        # Returns - None
+
+        # One limbSolver node (limb_solver.py) blends every IK / FK joint matrix
+        # by the switch into the offsetParentMatrix of the SK joints. The stretch
+        # stage then feeds it too, instead of building its own network.
+
+        ###################################
+
+        load_plugin()
+
+        for sk_jnt in self.limb_joints:
+            bake_offset_parent_matrix(sk_jnt)
+
+        with edit_batch("pair_blend"):
+
+            solver = create_node(SOLVER_NODE_TYPE, self.names.solver)
+            connect_attr(self.switch, self.switch_attribute[1:], solver, "blend")
+
+            for index, sk_jnt in enumerate(self.limb_joints):
+
+                names = self.names[sk_jnt]
+
+                connect_attr(names["ik"], "matrix", solver, f"ikMatrix[{index}]")
+                connect_attr(names["fk"], "matrix", solver, f"fkMatrix[{index}]")
+                connect_attr(solver, f"outMatrix[{index}]", sk_jnt, "offsetParentMatrix")
+
+            self.manifest.add("solver", solver)
 
-        self.lock_switch_transform()
+            self.lock_switch_transform()
 
     def lock_switch_transform(self):
 
@@ -210,7 +302,14 @@ class LimbClass:
 
         ###################################
 
-        rig_group = "grp_" + self.suffix_name
+        stages = ["biped_rig"]
+        if self.config.stretch:
+            stages.append("stretch")
+        if self.config.better_pole:
+            stages.append("unbreakable_knees")
+        self.names.check(*stages)
+
+        rig_group = self.names.rig_group
         cmds.group(n=rig_group, em=True, w=True)
 
     
@@ -222,14 +321,14 @@ class LimbClass:
         for i in range(self.limb_joint_number):
 
             # Creation of FK controllers
-            tempJoint = self.hierarchy[i].replace(NameConvention.main, "")
-            create_control_fk(self.hierarchy[i], self.side, self.scale)
-            tempctrl = parent_control_fk(self.hierarchy, i)
+            names = self.names[self.limb_joints[i]]
+            create_control_fk(self.limb_joints[i], self.side, self.scale)
+            tempctrl = parent_control_fk(self.limb_joints, i, self.names)
             if i == 0:
                 cmds.parent(tempctrl, rig_group)
             constraint(
-                (f"{NameConvention.controller}_{NameConvention.fk}" + tempJoint),
-                (self.hierarchy[i].replace(NameConvention.main, NameConvention.fk)),
+                names["fk_control"],
+                names["fk"],
                 translate_value=False,
                 maintain_offset_value=0,
             )  # orient constraint
@@ -238,8 +337,8 @@ class LimbClass:
         # Setup IK
 
         create_control_ik(
-            self.hierarchy,
-            self.hierarchy[2],
+            self.limb_joints,
+            self.end_joint,
             self.side,
             self.ik_control,
             self.pole_control,
@@ -252,8 +351,8 @@ class LimbClass:
         cmds.ikHandle(
             n=("IkHandle_" + self.suffix_name),
             sol="ikRPsolver",
-            sj=(self.hierarchy[0].replace(NameConvention.main, NameConvention.ik)),
-            ee=((self.hierarchy[2].replace(NameConvention.main, NameConvention.ik))),
+            sj=(self.root_joint.replace(NameConvention.main, NameConvention.ik)),
+            ee=((self.end_joint.replace(NameConvention.main, NameConvention.ik))),
         )
         set_attr("IkHandle_" + self.suffix_name, "visibility", 0)
 
@@ -266,7 +365,7 @@ class LimbClass:
 
         constraint(
             self.ik_control,
-            self.hierarchy[2].replace(NameConvention.main, NameConvention.ik),
+            self.end_joint.replace(NameConvention.main, NameConvention.ik),
             translate_value=False,
             orient_value=True,
             maintain_offset_value=0,
@@ -295,23 +394,43 @@ class LimbClass:
             f=1,
         )
 
-        if is_checked("ckb_limb_stretch"):
+        roles = {
+            "rig_group": rig_group,
+            "ik_control": self.ik_control,
+            "pole_control": self.pole_control,
+            "ik_handle": self.names.ik_handle,
+            "fkik_reverse": self.suffix_name + "_fkik_reverse",
+        }
+        roles.update(self._joint_roles("fk_control"))
+        self.manifest.update(roles)
+
+        if self.config.stretch:
             is_biped = True if self.limb_type == "biped" else False
-            stretch(
+            stretch_nodes = stretch(
                 self.root_joint,
-                self.hierarchy,
+                self.limb_joints,
                 self.suffix_name,
                 self.ik_control,
                 self.switch,
                 is_biped,
+                squash=self.config.squash,
+                volume=self.config.volume,
+                main_joints=self.config.fkik_blend == "pairBlend",
+                solver=self.names.solver if self.config.fkik_blend == "solver" else None,
             )
 
+            # The limb solver stretches by itself, it has no stretch nodes
+            self.manifest.update(stretch_nodes)
+
         # Adds the unbreakable knee setup
 
-        cmds.select(cl=1)
+        if self.config.better_pole:
+            add_unbreakable_knees(self.pole_control, self.limb_joints, self.root_parent, ik_control=self.manifest.get("ik_control", self.ik_control))
 
-        if is_checked("ckb_better_pole"):
-            add_unbreakable_knees(self.pole_control, self.hierarchy, self.root_parent)
+            knee_roles = ["knee.pole_group", "knee.group"]
+            for chain in ["top", "bot"]:
+                knee_roles += [f"knee.{chain}.{kind}" for kind in ("joint", "joint_end", "ik_handle", "flip_locator", "locator")]
+            self.manifest.update(dict(zip(knee_roles, self.names.stages["unbreakable_knees"])))
 
     def foot_roll(self):
 
@@ -324,9 +443,11 @@ class LimbClass:
 
         ###################################
 
-        heel_joint = get_loaded_text_field("txt_foot_root")
+        self.names.check("foot_roll")
+
+        heel_joint = self.config.foot_root
 
-        foot_hierarchy = get_hierachy(heel_joint)
+        foot_hierarchy = index_hierarchy(heel_joint).joints
 
         if len(foot_hierarchy) < 4:
             raise IndexError ("The reverse foot hierarchy must contain 4 joints : heel, toe, ball and ankle.")
@@ -334,39 +455,62 @@ class LimbClass:
         cmds.ikHandle(
             n=("IkHandle_ball_" + self.side),
             sol="ikSCsolver",
-            sj=(self.hierarchy[2].replace(NameConvention.main, NameConvention.ik)),
-            ee=((self.hierarchy[3].replace(NameConvention.main, NameConvention.ik))),
+            sj=(self.end_joint.replace(NameConvention.main, NameConvention.ik)),
+            ee=((self.index.role("ball").replace(NameConvention.main, NameConvention.ik))),
         )
         set_attr("IkHandle_ball_" + self.side, "visibility", 0)
 
         cmds.ikHandle(
             n=("IkHandle_toe_" + self.side),
             sol="ikSCsolver",
-            sj=(self.hierarchy[3].replace(NameConvention.main, NameConvention.ik)),
-            ee=((self.hierarchy[4].replace(NameConvention.main, NameConvention.ik))),
+            sj=(self.index.role("ball").replace(NameConvention.main, NameConvention.ik)),
+            ee=((self.index.role("toe").replace(NameConvention.main, NameConvention.ik))),
         )
         set_attr("IkHandle_toe_" + self.side, "visibility", 0)
 
         cmds.parent("IkHandle_ball_" + self.side, foot_hierarchy[2])
         cmds.parent("IkHandle_toe_" + self.side, foot_hierarchy[1])
 
-        cmds.parent("IkHandle_" + self.suffix_name, foot_hierarchy[-1])
+        # The limb IK handle and control are found through the manifest written by biped_rig
+        manifest = self.manifest
+        cmds.parent(manifest.get("ik_handle", self.names.ik_handle), foot_hierarchy[-1])
 
-        cmds.parent(heel_joint, self.ik_control)
+        cmds.parent(heel_joint, manifest.get("ik_control", self.ik_control))
+
+        manifest.update({
+            "ik_handle_ball": "IkHandle_ball_" + self.side,
+            "ik_handle_toe": "IkHandle_toe_" + self.side,
+            "foot_root": heel_joint,
+        })
 
 
 class HandClass:
 
-    def __init__(self):
+    FINGERS = ["index", "middle", "ring", "pinkie"]
+
+    def __init__(self, config: Optional[LimbConfig] = None):
+
+        if config is None:
+            config = LimbConfig.from_ui()
 
-        shoulder = get_loaded_text_field("txt_joint_root")
+        shoulder = config.root_joint
         self.side = shoulder[-1]
 
-        self.wrist_joint = NameConvention.main+ "_wrist_" + self.side
+        self.switch = config.switch
 
-        self.switch = get_loaded_text_field("txt_controller_switch")
+        # Shares the index of the limb, the fingers are found under its end joint
+        self.index = hierarchy_index(shoulder)
 
-        self.hierarchy = get_hierachy(self.wrist_joint)
+        self.wrist_joint = self.index.role("end")
+
+        self.hierarchy = self.index.descendants(self.wrist_joint)
+
+        fingers = {finger: self.index.fingers[finger] for finger in self.FINGERS + ["thumb"] if finger in self.index.fingers}
+        self.names = LimbNames([], "hand_" + self.side, self.side, fingers=fingers)
+
+    @property
+    def manifest(self):
+        return get_manifest(self.names.suffix_name)
 
     def add_custom_attributes(self):
 
@@ -379,7 +523,12 @@ class HandClass:
 
         ###################################
 
-        fingers_list = ["index", "middle", "ring", "pinkie"]
+        fingers_list = self.FINGERS
+
+        with edit_batch("finger_attributes"):
+            self._add_custom_attributes(fingers_list)
+
+    def _add_custom_attributes(self, fingers_list: List[str]):
 
         if not cmds.attributeQuery("FingersOptions", ex=True, n=self.switch):
             cmds.addAttr(
@@ -408,18 +557,12 @@ class HandClass:
                 self.switch, ln=curl_attr, at="float", min=-10, max=5, dv=0, k=True
             )
 
-            float_math_node = cmds.shadingNode(
-                "floatMath", n=f"floatMath_{finger}_curl", au=True
-            )
+            float_math_node = create_node("floatMath", self.names.float_maths[finger]["curl"])
 
             set_attr(float_math_node, "operation", 2)
 
-            float_math_node_spread = cmds.shadingNode(
-                "floatMath", n=f"floatMath_{finger}_spread", au=True
-            )
-            float_math_node_orient = cmds.shadingNode(
-                "floatMath", n=f"floatMath_{finger}_orient", au=True
-            )
+            float_math_node_spread = create_node("floatMath", self.names.float_maths[finger]["spread"])
+            float_math_node_orient = create_node("floatMath", self.names.float_maths[finger]["orient"])
 
             set_attr(float_math_node_spread, "operation", 2)
             set_attr(float_math_node_orient, "operation", 2)
@@ -436,26 +579,31 @@ class HandClass:
             set_attr(float_math_node_spread, "floatB", mult_value)
             set_attr(float_math_node_orient, "floatB", mult_value)
 
+            # update_values looks the floatMath nodes up by these manifest keys, their names
+            # carry the side (names.float_math_name)
+            self.manifest.update({
+                f"curl.{finger}": float_math_node,
+                f"spread.{finger}": float_math_node_spread,
+                f"orient.{finger}": float_math_node_orient,
+            })
+
+            # One input connection per node, fanned out to the phalanges
+            connect_attr(self.switch, curl_attr, float_math_node, "floatA")
+            connect_attr(self.switch, spread_attr, float_math_node_spread, "floatA")
+            connect_attr(self.switch, orient_attr, float_math_node_orient, "floatA")
+
             for i in range(1, 4):
 
                 grp_curl_spread = f"GRP1_{finger}_0{i}_{self.side}"
                 grp_orient = f"GRP2_{finger}_0{i}_{self.side}"
 
-                connect_attr(self.switch, curl_attr, float_math_node, "floatA")
                 connect_attr(float_math_node, "outFloat", grp_curl_spread, "rotateZ")
 
                 if i == 1:
 
-                    connect_attr(
-                        self.switch, spread_attr, float_math_node_spread, "floatA"
-                    )
                     connect_attr(
                         float_math_node_spread, "outFloat", grp_curl_spread, "rotateY"
                     )
-
-                    connect_attr(
-                        self.switch, orient_attr, float_math_node_orient, "floatA"
-                    )
                     connect_attr(
                         float_math_node_orient, "outFloat", grp_orient, "rotateZ"
                     )
@@ -466,11 +614,13 @@ class HandClass:
 
         curl_attr = f"Curl{finger.capitalize()}"
 
-        float_math_node = cmds.shadingNode(
-            "floatMath", n=f"floatMath_{finger}_curl", au=True
-        )
+        float_math_node = create_node("floatMath", self.names.float_maths[finger]["curl"])
         set_attr(float_math_node, "operation", 2)
 
+        self.manifest.add(f"curl.{finger}", float_math_node)
+
+        connect_attr(self.switch, curl_attr, float_math_node, "floatA")
+
         for i in range(0, 3):
 
             if i == 0:
@@ -478,7 +628,6 @@ class HandClass:
             else:
                 grp_curl_spread = f"GRP1_{finger}_0{i}_{self.side}"
 
-            connect_attr(self.switch, curl_attr, float_math_node, "floatA")
             connect_attr(float_math_node, "outFloat", grp_curl_spread, "rotateY")
 
     def update_values(self, changed_attr):
@@ -492,17 +641,19 @@ class HandClass:
 
         ###################################
 
-        for finger in ["index", "middle", "ring", "pinkie"]:
+        manifest = self.manifest
+
+        for finger in self.FINGERS:
+
+            # Rigs built before the manifests fall back to their names, without side
+            attr = manifest.get(f"{changed_attr}.{finger}", f"floatMath_{finger}_{changed_attr}")
 
             if changed_attr == "curl":
-                attr = f"floatMath_{finger}_curl"
                 mult = get_slider_field("sld_curl")
 
             elif changed_attr == "spread":
-                attr = f"floatMath_{finger}_spread"
                 mult = get_slider_field("sld_spread")
             else:
-                attr = f"floatMath_{finger}_orient"
                 mult = get_slider_field("sld_orient")
 
             if finger == "index":
@@ -518,7 +669,7 @@ class HandClass:
 
                 mult_value = 1
                 # Thumb Curl
-                set_attr(f"floatMath_thumb_curl", "floatB", mult * 0.5)
+                set_attr(manifest.get("curl.thumb", "floatMath_thumb_curl"), "floatB", mult * 0.5)
 
             set_attr(attr, "floatB", mult * mult_value)
 
@@ -533,78 +684,86 @@ class HandClass:
 
         ###################################
 
-        fingers_list = ["index", "middle", "ring", "pinkie"]
+        self.names.check("add_fingers_controls")
+
+        fingers_list = self.FINGERS
 
         root_phalanges = cmds.group(n="grp_rig_hand_" + self.side, em=1)
+        roles = {"hand_group": root_phalanges}
 
         # Parent Hand Group
         cmds.matchTransform(root_phalanges, self.wrist_joint, pos=True)
-        cmds.parentConstraint(
-            self.wrist_joint,
-            root_phalanges,
-            w=1,
-        )
+        constraint(self.wrist_joint, root_phalanges)
 
         for finger in fingers_list:
 
             for i in range(1, 4):
 
-                phalange = f"{NameConvention.main}_{finger}_0{i}_{self.side}"
+                phalange = self.index.finger(finger, i)
+                names = self.names[phalange]
 
-                ctrl = phalange.replace(NameConvention.main, NameConvention.controller + "_" + NameConvention.fk)
+                ctrl = names["fk_control"]
                 create_control_fk(phalange, self.side, 2)
 
                 # Creates group for customs attibutes
 
-                grp1 = cmds.group(ctrl, name=phalange.replace(NameConvention.main, "GRP1"))
-                grp2 = cmds.group(grp1, name=phalange.replace(NameConvention.main, "GRP2"))
+                grp1 = cmds.group(ctrl, name=names["grp1"])
+                grp2 = cmds.group(grp1, name=names["grp2"])
 
                 # Creation of Constraints
 
-                if "1" in phalange:
-                    cmds.parent(f"offset_{NameConvention.fk}_{finger}_0{i}_{self.side}", root_phalanges)
-                    cmds.parentConstraint(ctrl, phalange, w=1, mo=1)
+                if i == 1:
+                    cmds.parent(names["fk_offset"], root_phalanges)
+                    phalange_constraint = constraint(ctrl, phalange, maintain_offset_value=True)
                 else:
-                    cmds.orientConstraint(ctrl, phalange, w=1, mo=1)
-                    cmds.parent(f"offset_{NameConvention.fk}_{finger}_0{i}_{self.side}", previous_ctrl)
+                    phalange_constraint = constraint(ctrl, phalange, translate_value=False, maintain_offset_value=True)
+                    cmds.parent(names["fk_offset"], previous_ctrl)
 
                 previous_ctrl = ctrl
+                roles[f"fk_control.{finger}.{i}"] = ctrl
+                roles[f"constraint.{finger}.{i}"] = phalange_constraint if isinstance(phalange_constraint, str) else phalange_constraint[0]
 
         finger = "thumb"
 
         for i in range(0, 3):
 
-            if i == 0:
-                phalange = f"{NameConvention.main}_meta_{finger}_{self.side}"
-            else:
-                phalange = f"{NameConvention.main}_{finger}_0{i}_{self.side}"
+            phalange = self.index.finger(finger, i)
+            names = self.names[phalange]
 
-            ctrl = phalange.replace(NameConvention.main, f"{NameConvention.controller}_{NameConvention.fk}")
+            ctrl = names["fk_control"]
 
             create_control_fk(phalange, self.side, 2)
 
             # Creates group for customs attibutes
-            grp1 = cmds.group(ctrl, name=phalange.replace(NameConvention.main, "GRP1"))
-            grp2 = cmds.group(grp1, name=phalange.replace(NameConvention.main, "GRP2"))
+            grp1 = cmds.group(ctrl, name=names["grp1"])
+            grp2 = cmds.group(grp1, name=names["grp2"])
 
             # Creation of Constraints
             if i == 0:
-                cmds.parentConstraint(ctrl, phalange, w=1, mo=1)
-                cmds.parent(f"offset_{NameConvention.fk}_meta_{finger}_{self.side}", root_phalanges)
+                phalange_constraint = constraint(ctrl, phalange, maintain_offset_value=True)
+                cmds.parent(names["fk_offset"], root_phalanges)
             else:
-                cmds.orientConstraint(ctrl, phalange, w=1, mo=1)
-                cmds.parent(f"offset_{NameConvention.fk}_{finger}_0{i}_{self.side}", previous_ctrl)
+                phalange_constraint = constraint(ctrl, phalange, translate_value=False, maintain_offset_value=True)
+                cmds.parent(names["fk_offset"], previous_ctrl)
 
             previous_ctrl = ctrl
+            roles[f"fk_control.{finger}.{i}"] = ctrl
+            roles[f"constraint.{finger}.{i}"] = phalange_constraint if isinstance(phalange_constraint, str) else phalange_constraint[0]
+
+        self.manifest.update(roles)
 
         self.add_custom_attributes()
 
 
+@with_performance_mode("duplicate_hierarchies")
+@transactional("duplicate_hierarchies")
 def duplicate_hierarchies_callback(*args):
     getLimbObject().duplicate_hierarchy()
     getLimbObject().pair_blend()
 
 
+@with_performance_mode("add_controls")
+@transactional("add_controls")
 def add_controls_callback(*args):
 
     if getLimbObject().limb_type == "biped":
@@ -613,10 +772,14 @@ def add_controls_callback(*args):
         getLimbObject().biped_rig()
 
 
+@with_performance_mode("add_hand_controls")
+@transactional("add_hand_controls")
 def add_hand_controls_callback(*args):
     getHandObject().add_fingers_controls()
 
 
+@with_performance_mode("add_foot_roll")
+@transactional("add_foot_roll")
 def add_foot_roll_callback(*args):
     getLimbObject().foot_roll()
 
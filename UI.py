@@ -5,6 +5,9 @@ from typing import *
 from library import *
 from LimbClass import *
 from bendy_limbs import create_bendy_limb
+from config import LimbConfig
+from scheduler import BuildJob, active_job, run_deferred
+from rebuild import rebuild_limb
 
 
 def toggle_visibility_callback(child_layout: str, *args):
@@ -149,6 +152,8 @@ def add_ui(parent_layout: str):
     )
 
     cmds.checkBox("ckb_limb_stretch", l="Stretch System", parent=parent_layout)
+    cmds.checkBox("ckb_limb_squash", l="Stretch Squash", parent=parent_layout)
+    cmds.checkBox("ckb_limb_volume", l="Stretch Volume", parent=parent_layout)
 
     # Buttons Callbacks
 
@@ -218,6 +223,105 @@ def add_ui(parent_layout: str):
         en=True,
     )
 
+    # Full build, one step per idle event : the progress is shown and the build can be cancelled
+
+    cmds.separator(p=parent_layout)
+
+    build_options = "build_options_layout"
+    cmds.rowLayout(build_options, nc=2, ad2=2, parent=parent_layout)
+
+    cmds.checkBox("ckb_limb_hand", l="FK Hand", w=140, parent=build_options)
+    cmds.checkBox("ckb_limb_bendy", l="Ribbon", parent=build_options)
+
+    build_layout = "build_command_layout"
+    cmds.rowLayout(build_layout, nc=3, ad3=1, parent=parent_layout)
+
+    cmds.button(
+        "btn_limb_build",
+        l="Build Limb",
+        parent=build_layout,
+        command=build_limb_callback,
+    )
+    cmds.button(
+        "btn_limb_rebuild",
+        l="Rebuild",
+        parent=build_layout,
+        w=70,
+        command=rebuild_limb_callback,
+    )
+    cmds.button(
+        "btn_limb_build_cancel",
+        l="Cancel",
+        parent=build_layout,
+        w=70,
+        en=False,
+        command=cancel_build_callback,
+    )
+
+    cmds.progressBar("pb_limb_build", parent=parent_layout, maxValue=100)
+    cmds.text("txt_limb_build", p=parent_layout, l="", al="left")
+
+
+# Every button that builds, disabled while a build runs step by step
+BUILD_BUTTONS = (
+    "btn_limb_hierachy",
+    "btn_limb_controls",
+    "btn_limb_hand",
+    "btn_limb_foot_roll",
+    "btn_limb_ribbon",
+    "btn_limb_build",
+    "btn_limb_rebuild",
+)
+
+
+def set_build_buttons(enabled: bool):
+
+    for button in BUILD_BUTTONS:
+        cmds.button(button, e=True, en=enabled)
+    cmds.button("btn_limb_build_cancel", e=True, en=not enabled)
+
+
+def show_build_progress(job: BuildJob):
+
+    # Called between two steps only, the UI is redrawn while Maya is idle
+    cmds.progressBar("pb_limb_build", e=True, progress=int(job.progress * 100))
+
+    label = job.status if job.finished else job.next_step.replace("_", " ")
+    cmds.text("txt_limb_build", e=True, l=label)
+
+
+def build_finished_callback(job: BuildJob):
+
+    set_build_buttons(True)
+
+    if job.status == "done":
+        print(f"{job.name} : built in {job.report()['total']:.3f}s")
+    elif job.status == "cancelled":
+        cmds.warning(f"{job.name} was cancelled, the nodes it created were deleted.")
+
+
+def build_limb_callback(*args):
+
+    config = LimbConfig.from_ui()
+
+    set_build_buttons(False)
+
+    run_deferred(BuildJob(config, progress=show_build_progress), on_finished=build_finished_callback)
+
+
+def rebuild_limb_callback(*args):
+
+    # Applies only what changed since the limb was built (skeleton, options)
+    report = rebuild_limb(LimbConfig.from_ui())
+    print(f"{report['limb']} : {report['run']} step(s) run, {report['skipped']} already done, in {report['total']:.3f}s")
+
+
+def cancel_build_callback(*args):
+
+    job = active_job()
+    if job is not None:
+        job.cancel()
+
 
 def hand_attr_value_window(*args):
 
@@ -0,0 +1,142 @@
+import json
+import sys
+from typing import *
+
+from config import LimbConfig
+from modules import control_factory
+from performance import performance_mode
+from preflight import preflight_queue
+from scheduler import BuildJob, BuildCancelled
+
+
+def build_limb(config: LimbConfig, check: bool = True, progress: Optional[Callable] = None):
+
+    ###################################
+
+    # Inputs - config, LimbConfig; check, bool; progress, Callable
+    # Returns - dict
+
+    # Rigs one limb from data, without the LimbRiggingTool window.
+    # Runs the same stages as the UI buttons and returns the time
+    # spent in each of them (in seconds). Unless check is False, the
+    # preflight checks run first and nothing is built if they fail.
+    # The constraints are built in config.constraint_mode.
+    # The build is one transaction (transaction.py) : one undo chunk, and
+    # nothing is left in the scene if a stage raises. The nodes created by
+    # each stage are returned under "created". The builders never read the
+    # selection, and the selection is left as it was.
+    # The stages run as the steps of a scheduler.BuildJob : progress(job)
+    # is called after each of them, and job.cancel() stops the build and
+    # rolls it back.
+
+    ###################################
+
+    return BuildJob(config, check=check, progress=progress).run()
+
+
+def build_queue(configs: Iterable[LimbConfig], stop_on_error: bool = False, progress: Optional[Callable] = None):
+
+    ###################################
+
+    # Inputs - configs, Iterable[LimbConfig]; stop_on_error, bool; progress, Callable
+    # Returns - List[dict]
+
+    # Rigs every limb of the queue in the current scene and reports,
+    # per limb, its timings or the error that stopped it. progress(job)
+    # is called after every step of every limb (see build_limb).
+
+    ###################################
+
+    reports: List[Dict[str, Any]] = []
+
+    # Every limb is checked before the first one is built
+    configs = list(configs)
+    checks = preflight_queue(configs)
+
+    try:
+        with performance_mode("build_queue"):
+            for config, check in zip(configs, checks):
+
+                if not check.ok:
+                    if stop_on_error:
+                        raise ValueError(str(check))
+
+                    reports.append({
+                        "limb": check.limb,
+                        "root_joint": config.root_joint,
+                        "status": "error",
+                        "error": str(check),
+                        "preflight": check.to_dict(),
+                    })
+                    print(f"{check.limb} : preflight failed")
+                    continue
+
+                try:
+                    report = build_limb(config, check=False, progress=progress)
+                    report["status"] = "ok"
+
+                except Exception as error:
+                    if stop_on_error:
+                        raise
+
+                    # build_limb has rolled the limb back
+                    report = {
+                        "limb": config.limb_name + "_" + config.root_joint[-1:],
+                        "root_joint": config.root_joint,
+                        "status": "cancelled" if isinstance(error, BuildCancelled) else "error",
+                        "error": f"{type(error).__name__}: {error}",
+                        "rolled_back": True,
+                    }
+
+                reports.append(report)
+                print(f"{report['limb']} : {report['status']} ({report.get('total', 0.0):.3f}s)")
+
+                # A cancel stops the whole queue, the limbs already built are kept
+                if report["status"] == "cancelled":
+                    break
+
+    finally:
+        # The controls templates are shared by the whole queue, they are not part of the rig
+        control_factory.clear()
+
+    return reports
+
+
+def load_configs(path: str):
+
+    ###################################
+
+    # Inputs - path, str
+    # Returns - List[LimbConfig]
+
+    # Loads a JSON file holding a list of limb configs
+
+    ###################################
+
+    with open(path, "r") as file:
+        data = json.load(file)
+
+    return [LimbConfig.from_dict(entry) for entry in data]
+
+
+if __name__ == "__main__":
+
+    # mayapy batch.py <scene.ma> <configs.json> [<output_scene.ma>]
+
+    import maya.standalone
+    maya.standalone.initialize()
+
+    import maya.cmds as cmds
+
+    scene_path, configs_path = sys.argv[1], sys.argv[2]
+
+    cmds.file(scene_path, open=True, force=True)
+
+    queue_reports = build_queue(load_configs(configs_path))
+    print(json.dumps(queue_reports, indent=4))
+
+    if len(sys.argv) > 3:
+        cmds.file(rename=sys.argv[3])
+        cmds.file(save=True, force=True)
+
+    maya.standalone.uninitialize()
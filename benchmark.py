@@ -0,0 +1,704 @@
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import *
+
+from farm import install_backend
+
+
+###################################
+
+# Benchmark harness : builds synthetic skeletons of increasing size and
+# times every build stage, recording wall time, peak memory (tracemalloc)
+# and the number of cmds calls. Results are written as JSON so two tool
+# versions can be compared with compare_results().
+
+# python benchmark.py [<output.json>] [<backend>]     (default backend : scene_graph)
+# python benchmark.py controls [<backend>]             (cost per control, see benchmark_controls)
+# python benchmark.py blend [<backend>]                (FK / IK blend node counts, see blend_report)
+# python benchmark.py selection [<backend>]            (builds ignore the selection, see selection_check)
+# python benchmark.py constraints [<backend>]          (node count and playback per constraint mode, see constraint_report)
+
+###################################
+
+
+SIZES: Dict[str, Dict[str, Any]] = {
+    "small": {"sides": ("L",), "hands": False, "chains": 0, "chain_length": 0},
+    "medium": {"sides": ("L", "R"), "hands": True, "chains": 0, "chain_length": 0},
+    "large": {"sides": ("L", "R"), "hands": True, "chains": 4, "chain_length": 32},
+    "xlarge": {"sides": ("L", "R"), "hands": True, "chains": 16, "chain_length": 128},
+}
+
+STAGES = [
+    "duplicate_hierarchy",
+    "pair_blend",
+    "biped_rig",
+    "stretch",
+    "add_unbreakable_knees",
+    "foot_roll",
+    "add_fingers_controls",
+    "create_bendy_limb",
+]
+
+FINGERS = ["index", "middle", "ring", "pinkie"]
+
+
+class CallCounter:
+
+    ###################################
+
+    # Counts the calls made to every command of the cmds module while active
+
+    ###################################
+
+    def __init__(self, cmds_module):
+        self.cmds = cmds_module
+        self.counts: Dict[str, int] = {}
+        self.originals: Dict[str, Callable] = {}
+
+    def _wrap(self, name: str, function: Callable):
+        counts = self.counts
+
+        def counted(*args, **kwargs):
+            counts[name] = counts.get(name, 0) + 1
+            return function(*args, **kwargs)
+
+        return counted
+
+    def __enter__(self):
+        for name in dir(self.cmds):
+            function = getattr(self.cmds, name)
+            if not name.startswith("_") and callable(function):
+                self.originals[name] = function
+                setattr(self.cmds, name, self._wrap(name, function))
+        return self
+
+    def __exit__(self, type, value, traceback):
+        for name, function in self.originals.items():
+            setattr(self.cmds, name, function)
+        self.originals = {}
+
+    def reset(self):
+        self.counts.clear()
+
+
+# ------------------------------------------------------------------------
+# Synthetic skeletons
+
+
+def _chain(cmds, names: List[str], start: Sequence[float], step: Sequence[float], parent: Optional[str] = None):
+
+    # The middle joint is pushed back a little so that IK chains are never collinear
+    if parent:
+        cmds.select(parent)
+    else:
+        cmds.select(cl=True)
+
+    for i, name in enumerate(names):
+        bend = -1.0 if i == 1 else 0.0
+        cmds.joint(n=name, p=(start[0] + step[0] * i, start[1] + step[1] * i, start[2] + step[2] * i + bend))
+
+    cmds.select(cl=True)
+
+
+def create_skeleton(cmds, size: str):
+
+    ###################################
+
+    # Inputs - cmds, module; size, str
+    # Returns - List[dict]
+
+    # Creates a synthetic skeleton in the current scene and returns the
+    # limbs to rig, as {"kind": str, "config": LimbConfig}
+
+    ###################################
+
+    from config import LimbConfig
+
+    options = SIZES[size]
+    limbs: List[Dict[str, Any]] = []
+
+    for side in options["sides"]:
+
+        direction = 1 if side == "L" else -1
+
+        # Arm, optionally with a 5 fingers hand
+        _chain(cmds, [f"SK_shoulder_{side}", f"SK_elbow_{side}", f"SK_wrist_{side}"], (15 * direction, 140, 0), (25 * direction, 0, 0))
+
+        if options["hands"]:
+            for offset, finger in enumerate(FINGERS):
+                _chain(
+                    cmds,
+                    [f"SK_{finger}_0{i}_{side}" for i in range(1, 4)],
+                    (68 * direction, 140, 3 - offset * 2),
+                    (3 * direction, 0, 0),
+                    f"SK_wrist_{side}",
+                )
+            _chain(
+                cmds,
+                [f"SK_meta_thumb_{side}", f"SK_thumb_01_{side}", f"SK_thumb_02_{side}"],
+                (66 * direction, 139, 4),
+                (2 * direction, 0, 2),
+                f"SK_wrist_{side}",
+            )
+
+        cmds.circle(n=f"CTRL_switch_arm_{side}", ch=False)
+
+        limbs.append({
+            "kind": "arm",
+            "config": LimbConfig(f"SK_shoulder_{side}", f"CTRL_switch_arm_{side}", hand=options["hands"], bendy=True),
+        })
+
+        # Leg with a foot and its reverse foot
+        _chain(
+            cmds,
+            [f"SK_hip_{side}", f"SK_knee_{side}", f"SK_ankle_{side}", f"SK_ball_{side}", f"SK_toe_{side}"],
+            (10 * direction, 100, 0),
+            (0, -40, 1),
+        )
+        cmds.xform(f"SK_ball_{side}", t=(0, -8, 12))
+        cmds.xform(f"SK_toe_{side}", t=(0, 0, 8))
+
+        _chain(cmds, [f"RF_heel_{side}", f"RF_toe_{side}", f"RF_ball_{side}", f"RF_ankle_{side}"], (10 * direction, 0, -5), (0, 4, 6))
+        cmds.circle(n=f"CTRL_switch_leg_{side}", ch=False)
+
+        limbs.append({
+            "kind": "leg",
+            "config": LimbConfig(
+                f"SK_hip_{side}",
+                f"CTRL_switch_leg_{side}",
+                limb_name="leg",
+                foot_roll=True,
+                foot_root=f"RF_heel_{side}",
+                bendy=True,
+            ),
+        })
+
+    # Long N joints chains, rigged as 3 joints limbs
+    for index in range(options["chains"]):
+
+        names = [f"SK_chain{index}_{i:03d}_C" for i in range(options["chain_length"])]
+        _chain(cmds, names, (index * 5, 200, -50), (0, 2, 0))
+        cmds.circle(n=f"CTRL_switch_chain{index}_C", ch=False)
+
+        limbs.append({
+            "kind": "chain",
+            "config": LimbConfig(names[0], f"CTRL_switch_chain{index}_C", limb_name=f"chain{index}"),
+        })
+
+    return limbs
+
+
+# ------------------------------------------------------------------------
+# Stages
+
+
+def _limb_stages(kind: str, config):
+
+    from LimbClass import LimbClass, HandClass
+    from bendy_limbs import create_bendy_limb
+    from modules import stretch, add_unbreakable_knees
+
+    limb = LimbClass(config)
+
+    stages: List[Tuple[str, Callable[[], Any]]] = [
+        ("duplicate_hierarchy", limb.duplicate_hierarchy),
+        ("pair_blend", limb.pair_blend),
+        # Stretch and unbreakable knees are timed on their own below
+        ("biped_rig", limb.biped_rig),
+        ("stretch", lambda: stretch(limb.root_joint, limb.hierarchy, limb.suffix_name, limb.ik_control, limb.switch)),
+    ]
+
+    if kind == "leg":
+        stages.append(("add_unbreakable_knees", lambda: add_unbreakable_knees(limb.pole_control, limb.hierarchy, limb.root_parent)))
+        stages.append(("foot_roll", limb.foot_roll))
+
+    if kind == "arm" and config.hand:
+        stages.append(("add_fingers_controls", lambda: HandClass(config).add_fingers_controls()))
+
+    if config.bendy:
+        stages.append(("create_bendy_limb", lambda: create_bendy_limb(config=config)))
+
+    return stages
+
+
+def _run_stages(cmds, size: str, measure_memory: bool):
+
+    # Builds every limb of a synthetic skeleton in a new scene, stage by stage.
+    # tracemalloc slows every allocation down, so wall time and cmds calls are
+    # measured in one pass and peak memory in another.
+
+    cmds.file(new=True, force=True)
+    limbs = create_skeleton(cmds, size)
+    joints = len(cmds.ls(type="joint"))
+
+    results = {stage: {"wall": 0.0, "peak_memory": 0, "cmds_calls": 0} for stage in STAGES}
+
+    if measure_memory:
+        tracemalloc.start()
+
+    try:
+        with CallCounter(cmds) as counter:
+
+            for limb in limbs:
+
+                # The limb setup (hierarchy parsing, switch attribute) is part of the first stage
+                start = time.perf_counter()
+                stages = _limb_stages(limb["kind"], limb["config"])
+                setup_time = time.perf_counter() - start
+
+                for stage, function in stages:
+
+                    counter.reset()
+                    if measure_memory:
+                        tracemalloc.reset_peak()
+                        memory_start = tracemalloc.get_traced_memory()[0]
+
+                    start = time.perf_counter()
+                    function()
+                    wall = time.perf_counter() - start
+
+                    if stage == "duplicate_hierarchy":
+                        wall += setup_time
+
+                    if measure_memory:
+                        peak = tracemalloc.get_traced_memory()[1] - memory_start
+                        results[stage]["peak_memory"] = max(results[stage]["peak_memory"], peak)
+                    else:
+                        results[stage]["wall"] += wall
+                        results[stage]["cmds_calls"] += sum(counter.counts.values())
+    finally:
+        if measure_memory:
+            tracemalloc.stop()
+
+    return limbs, joints, results
+
+
+def run_size(cmds, size: str, measure_memory: bool = True):
+
+    ###################################
+
+    # Inputs - cmds, module; size, str; measure_memory, bool
+    # Returns - dict
+
+    # Builds every limb of a synthetic skeleton and returns the wall time,
+    # peak memory and cmds calls of each stage
+
+    ###################################
+
+    limbs, joints, results = _run_stages(cmds, size, measure_memory=False)
+    nodes = len(cmds.ls())
+
+    if measure_memory:
+        _, _, memory_results = _run_stages(cmds, size, measure_memory=True)
+        for stage, values in memory_results.items():
+            results[stage]["peak_memory"] = values["peak_memory"]
+
+    return {
+        "size": size,
+        "limbs": len(limbs),
+        "joints": joints,
+        "nodes": nodes,
+        "stages": results,
+        "total": sum(stage["wall"] for stage in results.values()),
+    }
+
+
+def run_benchmark(
+    sizes: Optional[Iterable[str]] = None,
+    output_path: Optional[str] = None,
+    backend: str = "scene_graph",
+    label: str = "",
+):
+
+    ###################################
+
+    # Inputs - sizes, Iterable[str]; output_path, str; backend, str; label, str
+    # Returns - dict
+
+    # Runs every size and writes the results as JSON to output_path
+
+    ###################################
+
+    install_backend(backend)
+
+    import maya.cmds as cmds
+
+    runs = []
+    for size in sizes or SIZES:
+        run = run_size(cmds, size)
+        runs.append(run)
+        print(f"{size:<8} {run['joints']:>5} joints {run['nodes']:>6} nodes {run['total']:.3f}s")
+
+    results = {
+        "label": label,
+        "backend": backend,
+        "python": platform.python_version(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "runs": runs,
+    }
+
+    if output_path:
+        with open(output_path, "w") as file:
+            json.dump(results, file, indent=4)
+
+    return results
+
+
+def _direct_control(cmds, name: str):
+
+    # A control built the way the tool did before templates
+    from modules import set_appearance, set_lineWidth
+
+    ctrl = cmds.circle(c=(0, 0, 0), nr=(1, 0, 0), sw=360, r=1.0, s=8, ch=False, n=name)
+    shape = cmds.listRelatives(ctrl, shapes=True)[0]
+    offset = cmds.group(ctrl, n="offset_" + name)
+    set_lineWidth(ctrl[0], 2)
+    set_appearance(shape, 0, 0, 1)
+    return offset
+
+
+def benchmark_controls(counts: Iterable[int] = (10, 100, 1000), backend: str = "scene_graph"):
+
+    ###################################
+
+    # Inputs - counts, Iterable[int]; backend, str
+    # Returns - List[dict]
+
+    # Times the creation of N FK controls built one by one and duplicated
+    # from the control factory templates, and returns the cost per control
+
+    ###################################
+
+    install_backend(backend)
+
+    import maya.cmds as cmds
+    from modules import control_factory
+
+    rows: List[Dict[str, Any]] = []
+
+    for count in counts:
+
+        row: Dict[str, Any] = {"controls": count}
+
+        for method in ("direct", "template"):
+
+            cmds.file(new=True, force=True)
+            control_factory.clear()
+
+            with CallCounter(cmds) as counter:
+                start = time.perf_counter()
+                for i in range(count):
+                    if method == "direct":
+                        _direct_control(cmds, f"CTRL_{i}")
+                    else:
+                        control_factory.create(f"CTRL_{i}", "circle", (0, 0, 1), 2, 1.0, f"offset_CTRL_{i}")
+                wall = time.perf_counter() - start
+
+            row[method] = {
+                "per_control": wall / count,
+                "cmds_calls_per_control": sum(counter.counts.values()) / count,
+            }
+
+        rows.append(row)
+        print(
+            f"{count:>6} controls  direct {row['direct']['per_control'] * 1e6:>8.1f}us"
+            f"  template {row['template']['per_control'] * 1e6:>8.1f}us"
+            f"  ({row['direct']['cmds_calls_per_control']:.1f} -> {row['template']['cmds_calls_per_control']:.1f} calls)"
+        )
+
+    return rows
+
+
+def _count_graph(cmds):
+
+    # Every connection is listed once, on the side of its destination
+    nodes = cmds.ls() or []
+    connections = (cmds.listConnections(nodes, s=True, d=False, p=True) or []) if nodes else []
+    return len(nodes), len(connections)
+
+
+def _blend_chain(cmds, kind: str, fkik_blend: str):
+
+    from config import LimbConfig
+
+    if kind == "arm":
+        _chain(cmds, ["SK_shoulder_L", "SK_elbow_L", "SK_wrist_L"], (15, 140, 0), (25, 0, 0))
+        return LimbConfig("SK_shoulder_L", "CTRL_switch_L", stretch=True, fkik_blend=fkik_blend)
+
+    if kind == "leg":
+        _chain(cmds, ["SK_hip_L", "SK_knee_L", "SK_ankle_L", "SK_ball_L", "SK_toe_L"], (10, 100, 0), (0, -40, 1))
+        cmds.xform("SK_ball_L", t=(0, -8, 12))
+        cmds.xform("SK_toe_L", t=(0, 0, 8))
+        return LimbConfig("SK_hip_L", "CTRL_switch_L", limb_name="leg", stretch=True, fkik_blend=fkik_blend)
+
+    # A finger rigged as a 3 joints limb
+    _chain(cmds, ["SK_index_01_L", "SK_index_02_L", "SK_index_03_L"], (68, 140, 3), (3, 0, 0))
+    return LimbConfig("SK_index_01_L", "CTRL_switch_L", limb_name="finger", stretch=True, fkik_blend=fkik_blend)
+
+
+def blend_report(backend: str = "scene_graph"):
+
+    ###################################
+
+    # Inputs - backend, str
+    # Returns - List[dict]
+
+    # Counts the nodes and connections the FK / IK blend and the whole limb
+    # (stretch included) add to an arm, a leg with a foot and a finger chain,
+    # for every LimbConfig.fkik_blend (pairBlend, blendMatrix, limbSolver)
+
+    ###################################
+
+    install_backend(backend)
+
+    import maya.cmds as cmds
+    from config import FKIK_BLENDS
+    from LimbClass import LimbClass
+    from modules import control_factory
+
+    rows: List[Dict[str, Any]] = []
+
+    for kind in ("arm", "leg", "finger"):
+
+        row: Dict[str, Any] = {"chain": kind}
+
+        for fkik_blend in FKIK_BLENDS:
+
+            cmds.file(new=True, force=True)
+            control_factory.clear()
+
+            config = _blend_chain(cmds, kind, fkik_blend)
+            cmds.circle(n=config.switch, ch=False)
+
+            limb = LimbClass(config)
+            limb.duplicate_hierarchy()
+
+            nodes, connections = _count_graph(cmds)
+            limb.pair_blend()
+            blend_nodes, blend_connections = _count_graph(cmds)
+            limb.biped_rig()
+            rig_nodes, rig_connections = _count_graph(cmds)
+
+            row["joints"] = limb.limb_joint_number
+            row[fkik_blend] = {
+                "blend_nodes": blend_nodes - nodes,
+                "blend_connections": blend_connections - connections,
+                "limb_nodes": rig_nodes - nodes,
+                "limb_connections": rig_connections - connections,
+            }
+
+        rows.append(row)
+        print(f"{kind:<8}{row['joints']:>3} joints      nodes / connections   blend       limb")
+        for fkik_blend in FKIK_BLENDS:
+            counts = row[fkik_blend]
+            print(
+                f"{'':<16}{fkik_blend:<26}"
+                f"{counts['blend_nodes']:>3} / {counts['blend_connections']:<5}"
+                f"{counts['limb_nodes']:>3} / {counts['limb_connections']}"
+            )
+
+    return rows
+
+
+def _playback(cmds, frames: int):
+
+    # Keys every control on two frames, then steps through the range :
+    # reading the SK joints world matrices makes Maya evaluate the rig
+    controls = cmds.ls("CTRL_*", type="transform") or []
+    joints = cmds.ls("SK_*", type="joint") or []
+
+    for control in controls:
+        for frame, value in ((1, 0.0), (frames, 30.0)):
+            if cmds.getAttr(control + ".rotateX", settable=True):
+                cmds.setKeyframe(control, attribute="rotateX", time=frame, value=value)
+
+    start = time.perf_counter()
+    for frame in range(1, frames + 1):
+        cmds.currentTime(frame, update=True)
+        for joint in joints:
+            cmds.getAttr(joint + ".worldMatrix[0]")
+    wall = time.perf_counter() - start
+
+    return frames / wall if wall > 0 else 0.0
+
+
+def constraint_report(size: str = "medium", backend: str = "scene_graph", frames: int = 100):
+
+    ###################################
+
+    # Inputs - size, str; backend, str; frames, int
+    # Returns - List[dict]
+
+    # Builds a synthetic skeleton (bendy limbs included) in every
+    # constraint mode and counts the nodes, the constraint and matrix
+    # nodes, and, in Maya, the frames per second of a playback with every
+    # control animated. The in-memory scene does not evaluate the graph,
+    # playback is only measured with the "maya" backend.
+
+    ###################################
+
+    install_backend(backend)
+
+    import maya.cmds as cmds
+    from batch import build_queue
+
+    rows: List[Dict[str, Any]] = []
+
+    for mode in ("constraint", "matrix"):
+
+        cmds.file(new=True, force=True)
+        limbs = create_skeleton(cmds, size)
+        before = set(cmds.ls() or [])
+
+        configs = [limb["config"] for limb in limbs]
+        for config in configs:
+            config.constraint_mode = mode
+            config.bendy = True
+        build_queue(configs, stop_on_error=True)
+
+        created = [node for node in cmds.ls() or [] if node not in before]
+        types: Dict[str, int] = {}
+        for node in created:
+            typ = cmds.nodeType(node)
+            if typ.endswith(("Constraint", "Matrix")):
+                types[typ] = types.get(typ, 0) + 1
+
+        row = {"mode": mode, "nodes": len(created), "types": types, "fps": None}
+        if backend == "maya":
+            row["fps"] = _playback(cmds, frames)
+
+        rows.append(row)
+        fps = f"{row['fps']:.1f} fps" if row["fps"] is not None else "playback needs the maya backend"
+        print(f"{mode:<12}{row['nodes']:>6} nodes   {fps}")
+        for typ, count in sorted(types.items()):
+            print(f"{'':<16}{typ:<24}{count:>4}")
+
+    return rows
+
+
+def _scene_state(cmds):
+
+    # Parent and world matrix of every transform, rounded to absorb float noise
+    state: Dict[str, Any] = {}
+    for node in cmds.ls(type=["transform", "joint"]) or []:
+        parent = cmds.listRelatives(node, parent=True)
+        matrix = cmds.xform(node, q=True, ws=True, m=True)
+        state[node] = (parent[0] if parent else None, [round(value, 6) for value in matrix])
+    return state
+
+
+def selection_check(size: str = "medium", backend: str = "scene_graph"):
+
+    ###################################
+
+    # Inputs - size, str; backend, str
+    # Returns - List[str]
+
+    # Builds a synthetic skeleton with nothing selected, then again with
+    # every SK joint selected, and lists the differences : the selection
+    # must be the same after the build and the rigs must be identical
+
+    ###################################
+
+    install_backend(backend)
+
+    import maya.cmds as cmds
+    from batch import build_queue
+
+    issues: List[str] = []
+    states: List[Dict[str, Any]] = []
+
+    for selected in (False, True):
+
+        cmds.file(new=True, force=True)
+        limbs = create_skeleton(cmds, size)
+
+        if selected:
+            cmds.select(cmds.ls("SK_*", type="joint"), replace=True)
+        else:
+            cmds.select(clear=True)
+
+        # Short names, the setup groups the root joints that have no parent
+        before = cmds.ls(selection=True)
+        reports = build_queue([limb["config"] for limb in limbs], stop_on_error=True)
+        after = cmds.ls(selection=True)
+
+        if after != before:
+            issues.append(f"selection changed by the build ({len(before)} nodes selected before, {len(after)} after)")
+
+        issues += [f"{report['limb']} : {report['error']}" for report in reports if report["status"] != "ok"]
+        states.append(_scene_state(cmds))
+
+    empty, selected = states
+    for node in sorted(set(empty) | set(selected)):
+        if node not in empty or node not in selected:
+            issues.append(f"{node} : only built with{'out' if node in empty else ''} a selection")
+        elif empty[node] != selected[node]:
+            issues.append(f"{node} : differs when built with a selection")
+
+    print("selection check : " + ("ok" if not issues else f"{len(issues)} issues"))
+    for issue in issues:
+        print("    " + issue)
+
+    return issues
+
+
+def compare_results(reference_path: str, new_path: str, tolerance: float = 1.2):
+
+    ###################################
+
+    # Inputs - reference_path, str; new_path, str; tolerance, float
+    # Returns - List[str]
+
+    # Compares two benchmark files and lists every stage that got slower
+    # than tolerance * reference, or that makes more cmds calls
+
+    ###################################
+
+    with open(reference_path, "r") as file:
+        reference = {run["size"]: run for run in json.load(file)["runs"]}
+    with open(new_path, "r") as file:
+        new = {run["size"]: run for run in json.load(file)["runs"]}
+
+    regressions: List[str] = []
+
+    for size, run in new.items():
+        if size not in reference:
+            continue
+        for stage, values in run["stages"].items():
+            old_values = reference[size]["stages"].get(stage)
+            if old_values is None:
+                continue
+            if old_values["wall"] > 0 and values["wall"] > old_values["wall"] * tolerance:
+                regressions.append(f"{size}/{stage} : {old_values['wall']:.4f}s -> {values['wall']:.4f}s")
+            if values["cmds_calls"] > old_values["cmds_calls"]:
+                regressions.append(f"{size}/{stage} : {old_values['cmds_calls']} -> {values['cmds_calls']} cmds calls")
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1 and sys.argv[1] == "controls":
+        benchmark_controls(backend=sys.argv[2] if len(sys.argv) > 2 else "scene_graph")
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "blend":
+        blend_report(backend=sys.argv[2] if len(sys.argv) > 2 else "scene_graph")
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "constraints":
+        constraint_report(backend=sys.argv[2] if len(sys.argv) > 2 else "scene_graph")
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "selection":
+        issues = selection_check(backend=sys.argv[2] if len(sys.argv) > 2 else "scene_graph")
+        sys.exit(1 if issues else 0)
+
+    run_benchmark(
+        output_path=sys.argv[1] if len(sys.argv) > 1 else "benchmark.json",
+        backend=sys.argv[2] if len(sys.argv) > 2 else "scene_graph",
+    )
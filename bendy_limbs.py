@@ -1,7 +1,17 @@
 import maya.cmds as cmds
 
+from typing import *
+
 from library import *
 from modules import *
+from config import LimbConfig
+from context import limb_context
+from hierarchy import hierarchy_index
+from manifest import get_manifest
+from names import check_names, bendy_names
+from snapshot import skeleton_snapshot
+from performance import with_performance_mode
+from transaction import transactional
 
 def create_follicules(nurbs_plane,limb_type, patches_number):
 
@@ -49,7 +59,7 @@ def create_follicules(nurbs_plane,limb_type, patches_number):
         cmds.connectAttr(fol_shape + ".outTranslate", fol_transform + ".translate", f=1)
         cmds.connectAttr(fol_shape + ".outRotate", fol_transform + ".rotate", f=1)
 
-        jnt = cmds.joint(n=  "_" + base_name + "_" + str(i + 1) + side, rad = 0.2)
+        jnt = create_joint("_" + base_name + "_" + str(i + 1) + side, fol_transform, radius=0.2)
         cmds.matchTransform(jnt, fol_transform, pos=1, rot=1, scl=1)
         follicles.append(fol_transform)
 
@@ -75,16 +85,13 @@ def add_attribute(switch):
     else:
         cmds.warning("Deforms Attributes already Exists. Creation is skipped.")
 
-def connect_attributes(blendshape, sine_handle, twist_handle):
+def connect_attributes(blendshape, sine_handle, twist_handle, config: LimbConfig):
 
-    switch = get_loaded_text_field("txt_controller_switch")
+    switch = config.switch
     
     side = switch[-1]
 
-    if radio_is_checked("rad_limb_biped_arm"):
-        limb_type = BipedLimb.Arm
-    else :
-        limb_type = BipedLimb.Leg
+    limb_type = ribbon_limb(config.limb_name)
 
     side = switch[-1]
 
@@ -112,64 +119,71 @@ def connect_attributes(blendshape, sine_handle, twist_handle):
 
     connect_attr(switch, "TwistOffset", twist_node, offset_attr)
 
-def create_blendshape(nurbs_limb, nurbs_sine, nurbs_twist):
+def create_blendshape(nurbs_limb, nurbs_sine, nurbs_twist, config: LimbConfig):
 
-    switch = get_loaded_text_field("txt_controller_switch")
+    switch = config.switch
     
     side = switch[-1]
 
-    if radio_is_checked("rad_limb_biped_arm"):
-        limb_type = BipedLimb.Arm
-    else :
-        limb_type = BipedLimb.Leg
+    limb_type = ribbon_limb(config.limb_name)
     
     base_name = f"{limb_type}_bendy"
 
-    cmds.select(nurbs_sine)
-    cmds.select(nurbs_twist, add=True)
-    cmds.select(nurbs_limb, add=True)
-
-    blendshape_node = cmds.blendShape(n=f"bs_{limb_type}_bendy_{nurbs_limb[-1]}")
+    # Targets first, base last
+    blendshape_node = cmds.blendShape(nurbs_sine, nurbs_twist, nurbs_limb, n=f"bs_{limb_type}_bendy_{nurbs_limb[-1]}")
 
-    cmds.select(nurbs_sine)
-    sine = cmds.nonLinear(n= f"sine_{limb_type}_bendy_{side}", typ= "sine")
-    cmds.rotate(90, z=True, os=True, r=True, fo=True)
+    # nonLinear returns [deformer, handle], the handles are rotated
+    sine = cmds.nonLinear(nurbs_sine, n= f"sine_{limb_type}_bendy_{side}", typ= "sine")
+    cmds.rotate(90, sine[1], z=True, os=True, r=True, fo=True)
     
-    cmds.select(nurbs_twist)
-    twist = cmds.nonLinear(n= f"twist_{limb_type}_bendy_{side}", typ= "twist")
-    cmds.rotate(90, z=True, os=True, r=True, fo=True)
+    twist = cmds.nonLinear(nurbs_twist, n= f"twist_{limb_type}_bendy_{side}", typ= "twist")
+    cmds.rotate(90, twist[1], z=True, os=True, r=True, fo=True)
 
     cmds.parent( sine, f"grp_deforms_{base_name}_{side}")
     cmds.parent( twist, f"grp_deforms_{base_name}_{side}")
 
     add_attribute(switch)
-    connect_attributes(blendshape_node[0], sine, twist)
 
-def create_bendy_limb(*args):
+    with edit_batch("bendy_attributes"):
+        connect_attributes(blendshape_node[0], sine, twist, config)
+
+@with_performance_mode("create_bendy_limb")
+@transactional("create_bendy_limb")
+def create_bendy_limb(*args, config: Optional[LimbConfig] = None):
 
     ##############
     # User Inputs
-    scale = get_float_field("ff_limb_scale")
-    root = get_loaded_text_field("txt_joint_root")
-    switch = get_loaded_text_field("txt_controller_switch")
+    if config is None:
+        config = LimbConfig.from_ui()
+        # From the UI, the limb context is dropped if the skeleton was edited since the limb was rigged
+        context = limb_context(config)
+        index = context.index
+        snapshot = context.snapshot
+    else:
+        index = hierarchy_index(config.root_joint)
+        snapshot = skeleton_snapshot(config.root_joint)
+
+    scale = config.scale
+    root = config.root_joint
+    switch = config.switch
 
     side = switch[-1]
 
-    hierarchy = get_hierachy(root)
+    hierarchy = index.chain
 
-    if radio_is_checked("rad_limb_biped_arm"):
-        limb_type = BipedLimb.Arm
-    else :
-        limb_type = BipedLimb.Leg
+    limb_type = ribbon_limb(config.limb_name)
 
     # Creates a Ribbon on the limb
 
     u_count = 8
     base_name = f"{limb_type}_bendy"
     
-    root_joint = hierarchy[0]
-    middle_joint = hierarchy[1]
-    end_joint = hierarchy[2]
+    root_joint = index.role("root")
+    middle_joint = index.role("mid")
+    end_joint = index.role("end")
+
+    # Maya would rename the nodes whose name is taken, nothing is built then
+    check_names(f"{config.limb_name}_{side}", bendy_names(limb_type, side))
 
     # Create the main ribbon and deformers ribbons
     nurbs_limb = cmds.nurbsPlane(n=f"nurbs_{limb_type}_{side}", u=u_count, lr = 0.16, w=u_count*1, ax= [0,0,1])
@@ -179,11 +193,10 @@ def create_bendy_limb(*args):
 
     if limb_type == BipedLimb.Leg:
 
-        cmds.select(nurbs_limb)
-        cmds.rotate(90, z=True,os=True, r=True, fo=True)
+        cmds.rotate(90, nurbs_transform, z=True,os=True, r=True, fo=True)
     
     # Get the middle joint position
-    middle_position = cmds.xform(middle_joint,ws=True,t=True, q=True)
+    middle_position = snapshot.position(middle_joint)
 
      # Move the main ribbon to the middle joint and freeze tranforms
     cmds.xform(nurbs_limb, t=[middle_position[0], middle_position[1], 0])
@@ -247,14 +260,9 @@ def create_bendy_limb(*args):
     set_attr(misc_group, "visibility", 0)
     set_attr(deforms_group, "visibility", 0)
 
-    create_blendshape(nurbs_limb, nurbs_sine, nurbs_twist)
+    create_blendshape(nurbs_limb, nurbs_sine, nurbs_twist, config)
 
-    cmds.select(cl=True)
-    for joint in bind_joints:
-        cmds.select(joint, add=True)
-
-    cmds.select(nurbs_transform, add=True)
-    cmds.skinCluster()
+    cmds.skinCluster(bind_joints, nurbs_transform, toSelectedBones=True)
 
     controls_group = cmds.group(em=True, n= f"GRP_{base_name}_{side}")
 
@@ -308,18 +316,17 @@ def create_bendy_limb(*args):
 
         if i%2 == 0:
 
-            constraint(hierarchy[i//2], offset_group, translate_value=True, orient_value=False, scale_value=False, maintain_offset_value=False)
-            constraint(hierarchy[i//2], offset_group, translate_value=False, orient_value=True, scale_value=False, maintain_offset_value=True)
+            point_orient_constraint(hierarchy[i//2], offset_group, translate_offset=False, orient_offset=True)
 
         elif i == 1:
             cmds.pointConstraint(bind_joints[0], bind_joints[2], offset_group, mo=False)
 
-            cmds.aimConstraint(bind_joints[2], joint.replace(NameConvention.joint, "aim_offset"), wuo = aim_point_root, aim= aim_vector)
+            aim_constraint(bind_joints[2], joint.replace(NameConvention.joint, "aim_offset"), aim_vector, world_up_object=aim_point_root)
 
         else : 
             cmds.pointConstraint(bind_joints[2], bind_joints[4], offset_group, mo=False)
 
-            cmds.aimConstraint(bind_joints[4], joint.replace(NameConvention.joint, "aim_offset"), wuo = aim_point_middle, aim= aim_vector)
+            aim_constraint(bind_joints[4], joint.replace(NameConvention.joint, "aim_offset"), aim_vector, world_up_object=aim_point_middle)
         
         set_attr(joint, "visibility", 0)
         cmds.parent(offset_group, controls_group, r=True)
@@ -327,4 +334,7 @@ def create_bendy_limb(*args):
     # Clean Up
 
     cmds.parent(nurbs_limb, misc_group)
-    connect_attr(switch, "ExtraControllers", controls_group, "visibility")
\ No newline at end of file
+    connect_attr(switch, "ExtraControllers", controls_group, "visibility")
+
+    # Every node of the ribbon is under these two groups
+    get_manifest(f"{config.limb_name}_{root[-1]}").update({"bendy.misc_group": misc_group, "bendy.controls_group": controls_group})
\ No newline at end of file
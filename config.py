@@ -0,0 +1,148 @@
+from typing import *
+
+from library import *
+
+
+# FK / IK blending of the SK joints : one pairBlend per joint driving its
+# channels, one blendMatrix per joint driving its offsetParentMatrix, or one
+# limbSolver node (limb_solver.py) for the whole limb, stretch included
+FKIK_BLENDS = ["pairBlend", "matrix", "solver"]
+
+
+class LimbConfig:
+
+    ###################################
+
+    # Holds every input a limb build needs, so the builders can run
+    # from data (batch, farm) as well as from the LimbRiggingTool window.
+
+    ###################################
+
+    root_joint: str
+    switch: str
+    scale: float
+
+    limb_type: str
+    limb_name: str
+
+    stretch: bool
+    squash: bool
+    volume: bool
+    better_pole: bool
+
+    foot_roll: bool
+    foot_root: str
+
+    hand: bool
+    bendy: bool
+
+    constraint_mode: str
+    fkik_blend: str
+
+    def __init__(
+        self,
+        root_joint: str,
+        switch: str,
+        scale: float = 1.0,
+        limb_type: str = "biped",
+        limb_name: str = BipedLimb.Arm,
+        stretch: bool = False,
+        squash: bool = False,
+        volume: bool = False,
+        better_pole: bool = False,
+        foot_roll: bool = False,
+        foot_root: str = "",
+        hand: bool = False,
+        bendy: bool = False,
+        constraint_mode: str = "constraint",
+        fkik_blend: str = "pairBlend",
+    ):
+        self.root_joint = root_joint
+        self.switch = switch
+        self.scale = float(scale)
+
+        self.limb_type = limb_type
+        self.limb_name = limb_name
+
+        self.stretch = bool(stretch)
+        # Stretch options (modules.stretch) : shrink below the rest length, keep the volume
+        self.squash = bool(squash)
+        self.volume = bool(volume)
+        self.better_pole = bool(better_pole)
+
+        self.foot_roll = bool(foot_roll)
+        self.foot_root = foot_root
+
+        self.hand = bool(hand)
+        self.bendy = bool(bendy)
+
+        # "constraint" (constraint nodes) or "matrix" (offsetParentMatrix), see library.set_constraint_mode
+        self.constraint_mode = constraint_mode
+        self.fkik_blend = fkik_blend
+
+    def __repr__(self):
+        return f"LimbConfig({self.root_joint!r}, {self.limb_name!r})"
+
+    @classmethod
+    def from_ui(cls):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - LimbConfig
+
+        # Reads the current state of the LimbRiggingTool window
+
+        ###################################
+
+        limb_type = "biped" if radio_is_checked("rad_limb_biped") else "quadruped"
+
+        if limb_type == "biped":
+            limb_name = BipedLimb.Arm if radio_is_checked("rad_limb_biped_arm") else BipedLimb.Leg
+        else:
+            limb_name = "front" if radio_is_checked("rad_limb_quadruped_front") else "rear"
+
+        foot_root = get_loaded_text_field("txt_foot_root")
+
+        return cls(
+            root_joint=get_loaded_text_field("txt_joint_root"),
+            switch=get_loaded_text_field("txt_controller_switch"),
+            scale=get_float_field("ff_limb_scale"),
+            limb_type=limb_type,
+            limb_name=limb_name,
+            stretch=is_checked("ckb_limb_stretch"),
+            squash=is_checked("ckb_limb_squash"),
+            volume=is_checked("ckb_limb_volume"),
+            better_pole=is_checked("ckb_better_pole"),
+            foot_roll=limb_name == BipedLimb.Leg and bool(foot_root),
+            foot_root=foot_root,
+            hand=limb_name == BipedLimb.Arm and is_checked("ckb_limb_hand"),
+            bendy=is_checked("ckb_limb_bendy"),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+
+        ###################################
+
+        # Inputs - data, dict
+        # Returns - LimbConfig
+
+        # Builds a config from a plain dictionary (e.g. one entry of a JSON queue)
+
+        ###################################
+
+        return cls(**data)
+
+    def to_dict(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - dict
+
+        # Returns the config as a plain, JSON serializable dictionary
+
+        ###################################
+
+        return dict(vars(self))
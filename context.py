@@ -0,0 +1,305 @@
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+from typing import *
+
+from hierarchy import hierarchy_index, index_hierarchy, invalidate_hierarchy_index
+from snapshot import has_snapshots, invalidate_joint_snapshots, invalidate_snapshot, skeleton_snapshot, take_snapshot
+from manifest import clear_manifests
+from transaction import active_transaction
+
+
+###################################
+
+# Limb contexts.
+# The objects the UI buttons work on (LimbClass, HandClass : parsed
+# hierarchy, name table, skeleton snapshot) are kept for the session, one
+# context per limb, keyed by root joint and switch controller. Rigging the
+# right arm after the left one gets its own context, and going back to the
+# left arm reuses the left one.
+
+# context = limb_context(LimbConfig.from_ui())
+# context.get("limb", LimbClass).foot_roll()
+# context.index, context.snapshot
+
+# OpenMaya callbacks drop a context when it could be stale :
+#   - new / opened scene : every context (and every index, snapshot, manifest)
+#   - a joint of the limb or the switch renamed, reparented or deleted (the
+#     skeleton snapshots holding the joint are dropped too). Inside a build
+#     transaction the names are only noted, and looked up once it ends.
+#   - a joint of the limb moved, outside of a build transaction
+# Every DAG change, rename and deletion of the scene calls back : nothing
+# is done while no context and no snapshot is cached.
+# Without OpenMaya messages (in-memory scene) nothing would invalidate them,
+# so a new context is made on every call.
+
+###################################
+
+
+# Transform attributes of the SK joints, a change means the skeleton was edited
+SKELETON_ATTRIBUTES = ("translate", "rotate", "scale", "jointOrient", "rotateAxis", "offsetParentMatrix")
+
+# Callbacks and contexts of a previous version of the module (importlib.reload in main.py)
+if "remove_callbacks" in globals():
+    remove_callbacks()
+
+_contexts: Dict[Tuple[str, str], "LimbContext"] = {}
+
+# Watched node name -> keys of the contexts that use it
+_watched: Dict[str, Set[Tuple[str, str]]] = {}
+
+_callback_ids: List[Any] = []
+
+# Nodes renamed, reparented or deleted in the open build transaction
+_pending: Set[str] = set()
+
+
+def callbacks_available():
+    return hasattr(om, "MSceneMessage")
+
+
+def context_key(config):
+    return (config.root_joint, config.switch)
+
+
+class LimbContext:
+
+    def __init__(self, config):
+        self.key = context_key(config)
+        self.config = config
+        self.root_joint = config.root_joint
+
+        self.objects: Dict[str, Any] = {}
+
+        self._index = None
+        self._snapshot = None
+
+        self.nodes: Set[str] = set()
+        self._callback_ids: List[Any] = []
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = index_hierarchy(self.root_joint)
+            self._watch(self._index.joints)
+        return self._index
+
+    @property
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = take_snapshot(self.root_joint, self.index.joints)
+        return self._snapshot
+
+    def get(self, kind: str, factory: Callable):
+
+        ###################################
+
+        # Inputs - kind, str; factory, Callable
+        # Returns - object
+
+        # Object of the limb built by factory(config) ("limb" : LimbClass,
+        # "hand" : HandClass), built once per context
+
+        ###################################
+
+        obj = self.objects.get(kind)
+        if obj is None:
+            obj = factory(self.config)
+            self.objects[kind] = obj
+
+            # The setup indexed the hierarchy and took the snapshot, they are shared
+            self._index = hierarchy_index(self.root_joint)
+            self._snapshot = skeleton_snapshot(self.root_joint)
+            self._watch(self._index.joints)
+
+        return obj
+
+    # --------------------------------------------------------------------
+    # Invalidation
+
+    def _watch(self, joints: List[str]):
+
+        if not callbacks_available():
+            return
+
+        names = [name for name in list(joints) + [self.config.switch] if name and name not in self.nodes]
+
+        for name in names:
+            _watched.setdefault(name, set()).add(self.key)
+            self.nodes.add(name)
+
+            if name == self.config.switch or not cmds.objExists(name):
+                continue
+
+            node = om.MSelectionList().add(name).getDependNode(0)
+            self._callback_ids.append(om.MNodeMessage.addAttributeChangedCallback(node, self._on_attribute_changed))
+
+    def _on_attribute_changed(self, message, plug, other_plug, *args):
+
+        # Builds edit the SK joints (offsetParentMatrix bake), the skeleton is not moved
+        if not message & om.MNodeMessage.kAttributeSet or active_transaction() is not None:
+            return
+
+        if plug.partialName(useLongNames=True).startswith(SKELETON_ATTRIBUTES):
+            invalidate_context(self.key)
+
+    def release(self):
+
+        for callback_id in self._callback_ids:
+            om.MMessage.removeCallback(callback_id)
+        self._callback_ids = []
+
+        for name in self.nodes:
+            keys = _watched.get(name)
+            if keys is None:
+                continue
+            keys.discard(self.key)
+            if not keys:
+                del _watched[name]
+        self.nodes = set()
+
+        invalidate_hierarchy_index(self.root_joint)
+        invalidate_snapshot(self.root_joint)
+
+
+def limb_context(config):
+
+    ###################################
+
+    # Inputs - config, LimbConfig
+    # Returns - LimbContext
+
+    # Context of the limb of config, reused while the scene does not change.
+    # Changing another option of the config (stretch, blend...) rebuilds its
+    # objects, not its index.
+
+    ###################################
+
+    if not callbacks_available():
+        return LimbContext(config)
+
+    install_callbacks()
+
+    key = context_key(config)
+    context = _contexts.get(key)
+
+    if context is None:
+        context = LimbContext(config)
+        _contexts[key] = context
+
+    elif context.config.to_dict() != config.to_dict():
+        context.config = config
+        context.objects = {}
+
+    return context
+
+
+def invalidate_context(key: Optional[Tuple[str, str]] = None):
+
+    ###################################
+
+    # Inputs - key, (root joint, switch), every context if None
+    # Returns - None
+
+    ###################################
+
+    keys = list(_contexts) if key is None else [key]
+
+    for key in keys:
+        context = _contexts.pop(key, None)
+        if context is not None:
+            context.release()
+
+
+def _invalidate_node(name: str):
+
+    # Nothing cached : most scene edits have nothing to drop
+    if not _watched and not has_snapshots():
+        return
+
+    # A build renames, reparents and deletes thousands of nodes, they are looked up once when it ends
+    transaction = active_transaction()
+    if transaction is not None:
+        if not _pending:
+            transaction.on_exit(_invalidate_pending)
+        _pending.add(name)
+        return
+
+    _invalidate_nodes([name])
+
+
+def _invalidate_pending():
+    names = list(_pending)
+    _pending.clear()
+    _invalidate_nodes(names)
+
+
+def _invalidate_nodes(names: List[str]):
+    for name in names:
+        for key in list(_watched.get(name, ())):
+            invalidate_context(key)
+
+    # Snapshots taken without a context (preflight...) hold the joints too
+    invalidate_joint_snapshots(*names)
+
+
+# ------------------------------------------------------------------------
+# Callbacks
+
+
+def _on_scene_changed(*args):
+    invalidate_context()
+    invalidate_hierarchy_index()
+    invalidate_snapshot()
+    clear_manifests()
+
+
+def _on_dag_changed(message, child, parent, *args):
+    _invalidate_node(child.partialPathName().split("|")[-1])
+
+
+def _on_name_changed(node, previous_name, *args):
+    _invalidate_node(previous_name)
+
+
+def _on_node_removed(node, *args):
+    _invalidate_node(om.MFnDependencyNode(node).name())
+
+
+def install_callbacks():
+
+    ###################################
+
+    # Inputs - None
+    # Returns - None
+
+    # Installs the scene, DAG, rename and node removed callbacks, once
+
+    ###################################
+
+    if _callback_ids or not callbacks_available():
+        return
+
+    for message in (om.MSceneMessage.kBeforeNew, om.MSceneMessage.kBeforeOpen):
+        _callback_ids.append(om.MSceneMessage.addCallback(message, _on_scene_changed))
+
+    _callback_ids.append(om.MDagMessage.addAllDagChangesCallback(_on_dag_changed))
+    _callback_ids.append(om.MNodeMessage.addNameChangedCallback(om.MObject.kNullObj, _on_name_changed))
+    _callback_ids.append(om.MDGMessage.addNodeRemovedCallback(_on_node_removed, "dependNode"))
+
+
+def remove_callbacks():
+
+    ###################################
+
+    # Inputs - None
+    # Returns - None
+
+    # Drops every context and removes the callbacks
+
+    ###################################
+
+    invalidate_context()
+
+    for callback_id in _callback_ids:
+        om.MMessage.removeCallback(callback_id)
+    _callback_ids.clear()
@@ -0,0 +1,351 @@
+import os
+from typing import *
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+
+
+###################################
+
+# Batched graph edits.
+# Inside an EditBatch, node creations, connections and attribute sets made
+# through library (create_node, connect_attr, set_attr, lock_transforms,
+# set_appearance) are queued on an MDagModifier / MDGModifier instead of
+# being sent one by one to cmds. They are committed all at once when the
+# batch closes, as a single undo entry.
+
+# with edit_batch("pair_blend"):
+#     node = create_node("pairBlend", "pairBlend_elbow_L")
+#     connect_attr("IK_elbow_L", "rotate", node, "inRotate1")
+
+# Queued edits are not visible to queries until the batch is committed,
+# so only wrap code that writes to the scene. create_node returns the
+# MObject of the queued node : Maya may give it another name than the one
+# asked for, node_name(node) gives its name once the batch is committed.
+
+###################################
+
+
+# This file is also a Maya plugin, it registers the command used to commit a batch as one undo entry
+maya_useNewAPI = True
+
+COMMIT_COMMAND = "limbRigCommitEdits"
+
+_active_batch = None
+_batching = True
+_pending_batch = None
+_command_available: Optional[bool] = None
+
+
+class EditBatch:
+
+    def __init__(self, name: str = "edits"):
+        self.name = name
+
+        self.dag_modifier = om.MDagModifier()
+        self.dg_modifier = om.MDGModifier()
+
+        # Queued nodes by the name asked for, and the callbacks run once the batch is committed
+        self.created: Dict[str, Any] = {}
+        self.committed: List[Callable[[], Any]] = []
+        self.flags: List[Tuple[Any, str, bool]] = []
+        self.previous_flags: List[Tuple[Any, str, bool]] = []
+
+        self.operations = 0
+
+    # --------------------------------------------------------------------
+    # Queuing
+
+    def _plug(self, obj: Any, attr: str):
+        if isinstance(obj, om.MObject):
+            return self._created_plug(obj, attr)
+        if obj in self.created:
+            return self._created_plug(self.created[obj], attr)
+        return om.MSelectionList().add(f"{obj}.{attr}").getPlug(0)
+
+    def _created_plug(self, node, attr: str):
+
+        # A queued node has no name in the scene yet, its plug is found on the MObject.
+        # Elements of multis are resolved too : "matrixIn[1]", "target[0].targetMatrix"
+        node_fn = om.MFnDependencyNode(node)
+        names = attr.split(".")
+
+        leaf, _, leaf_index = names[-1].partition("[")
+        plug = node_fn.findPlug(leaf, False)
+        if leaf_index:
+            plug = plug.elementByLogicalIndex(int(leaf_index[:-1]))
+
+        for name in names[:-1]:
+            array, _, index = name.partition("[")
+            if index:
+                plug.selectAncestorLogicalIndex(int(index[:-1]), node_fn.attribute(array))
+
+        return plug
+
+    def create_node(self, typ: str, name: str, parent: Optional[Any] = None):
+
+        ###################################
+
+        # Inputs - typ, str; name, str; parent, str or MObject
+        # Returns - MObject
+
+        # Queues a node creation, DAG nodes need a parent (or "" for the world).
+        # The MObject stays the node if Maya renames it on a name clash.
+
+        ###################################
+
+        if parent is None:
+            node = self.dg_modifier.createNode(typ)
+            self.dg_modifier.renameNode(node, name)
+        else:
+            parent_node = om.MObject.kNullObj
+            if isinstance(parent, om.MObject):
+                parent_node = parent
+            elif parent in self.created:
+                parent_node = self.created[parent]
+            elif parent:
+                parent_node = om.MSelectionList().add(parent).getDependNode(0)
+            node = self.dag_modifier.createNode(typ, parent_node)
+            self.dag_modifier.renameNode(node, name)
+
+        self.created[name] = node
+        self.operations += 1
+        return node
+
+    def connect(self, source_obj: Any, source_attr: str, destination_obj: Any, destination_attr: str):
+
+        source = self._plug(source_obj, source_attr)
+        destination = self._plug(destination_obj, destination_attr)
+
+        # Same as connectAttr -force
+        queued = isinstance(destination_obj, om.MObject) or destination_obj in self.created
+        if not queued and destination.isDestination:
+            self.dg_modifier.disconnect(destination.source(), destination)
+
+        self.dg_modifier.connect(source, destination)
+        self.operations += 1
+
+    def set(self, obj: Any, attr: str, *values, typ: Optional[str] = None):
+
+        plug = self._plug(obj, attr)
+
+        if typ == "string":
+            self.dg_modifier.newPlugValueString(plug, str(values[0]))
+        elif typ is not None:
+            raise ValueError(f"setAttr type '{typ}' cannot be queued in an edit batch.")
+        elif len(values) > 1:
+            for index, value in enumerate(values):
+                self._set_plug(plug.child(index), value)
+        else:
+            self._set_plug(plug, values[0])
+
+        self.operations += 1
+
+    def _set_plug(self, plug, value: Any):
+        if isinstance(value, bool):
+            self.dg_modifier.newPlugValueBool(plug, value)
+        elif isinstance(value, int):
+            self.dg_modifier.newPlugValueInt(plug, value)
+        elif isinstance(value, str):
+            self.dg_modifier.newPlugValueString(plug, value)
+        else:
+            self.dg_modifier.newPlugValueDouble(plug, float(value))
+
+    def set_flags(self, obj: Any, attr: str, lock: Optional[bool] = None, keyable: Optional[bool] = None):
+
+        # Lock and keyable states are not modifier operations, they are applied after the values
+        plug = self._plug(obj, attr)
+
+        if lock is not None:
+            self.flags.append((plug, "isLocked", lock))
+        if keyable is not None:
+            self.flags.append((plug, "isKeyable", keyable))
+
+        self.operations += 1
+
+    def after_commit(self, callback: Callable[[], Any]):
+
+        # Runs callback once the batch is committed (e.g. to read the names Maya gave), once per callback
+        if callback not in self.committed:
+            self.committed.append(callback)
+
+    # --------------------------------------------------------------------
+    # Commit
+
+    def doIt(self):
+        self.dag_modifier.doIt()
+        self.dg_modifier.doIt()
+
+        self.previous_flags = []
+        for plug, flag, value in self.flags:
+            self.previous_flags.append((plug, flag, getattr(plug, flag)))
+            setattr(plug, flag, value)
+
+    def undoIt(self):
+        for plug, flag, value in reversed(self.previous_flags):
+            setattr(plug, flag, value)
+
+        self.dg_modifier.undoIt()
+        self.dag_modifier.undoIt()
+
+    def commit(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - None
+
+        # Applies every queued edit. Goes through the plugin command when
+        # it can be loaded, so the whole batch is one undo entry. The
+        # after_commit callbacks run next.
+
+        ###################################
+
+        global _pending_batch
+
+        if self.operations == 0:
+            pass
+        elif _load_commit_command():
+            _pending_batch = self
+            try:
+                getattr(cmds, COMMIT_COMMAND)()
+            finally:
+                _pending_batch = None
+        else:
+            self.doIt()
+
+        for callback in self.committed:
+            callback()
+
+    def __enter__(self):
+        global _active_batch
+
+        if not _batching:
+            return self
+
+        if _active_batch is not None:
+            raise RuntimeError(f"Edit batch '{_active_batch.name}' is already open.")
+
+        _active_batch = self
+        return self
+
+    def __exit__(self, type, value, traceback):
+        global _active_batch
+
+        if _active_batch is not self:
+            return
+
+        _active_batch = None
+
+        # On error nothing is committed, the queued nodes never reach the scene
+        if type is None:
+            self.commit()
+
+
+def edit_batch(name: str = "edits"):
+    return EditBatch(name)
+
+
+def node_name(node: Any):
+
+    ###################################
+
+    # Inputs - node, str or MObject (create_node in an edit batch)
+    # Returns - str
+
+    # Name of the node in the scene, the one Maya gave once its batch is committed
+
+    ###################################
+
+    if isinstance(node, om.MObject):
+        return om.MFnDependencyNode(node).name()
+    return node
+
+
+def set_batching(enabled: bool):
+
+    ###################################
+
+    # Inputs - enabled, bool
+    # Returns - bool, the previous state
+
+    # With batching off, edit_batch() blocks queue nothing : library sends
+    # every edit straight to cmds (build plans record them, plan.py)
+
+    ###################################
+
+    global _batching
+
+    previous, _batching = _batching, enabled
+    return previous
+
+
+def active_edit_batch():
+
+    ###################################
+
+    # Inputs - None
+    # Returns - EditBatch or None
+
+    # Returns the open edit batch, if any
+
+    ###################################
+
+    return _active_batch
+
+
+def _load_commit_command():
+
+    global _command_available
+
+    if _command_available is None:
+        try:
+            plugin = os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+            if not cmds.pluginInfo(plugin, query=True, loaded=True):
+                cmds.loadPlugin(plugin, quiet=True)
+            _command_available = hasattr(cmds, COMMIT_COMMAND)
+        except (AttributeError, RuntimeError):
+            # Not in Maya (e.g. in-memory scene), batches are applied directly
+            _command_available = False
+
+    return _command_available
+
+
+# ------------------------------------------------------------------------
+# Plugin
+
+
+class CommitEditsCommand(om.MPxCommand if hasattr(om, "MPxCommand") else object):
+
+    def __init__(self):
+        super().__init__()
+        self.batch = None
+
+    @staticmethod
+    def creator():
+        return CommitEditsCommand()
+
+    def doIt(self, args):
+        # Maya may load the plugin as a separate module, the batch lives in the imported one
+        import edits
+        self.batch = edits._pending_batch
+        if self.batch is None:
+            raise RuntimeError(f"{COMMIT_COMMAND} commits edit batches, do not call it directly.")
+        self.batch.doIt()
+
+    def redoIt(self):
+        self.batch.doIt()
+
+    def undoIt(self):
+        self.batch.undoIt()
+
+    def isUndoable(self):
+        return True
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin, "LimbRiggingTool", "1.0").registerCommand(COMMIT_COMMAND, CommitEditsCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(COMMIT_COMMAND)
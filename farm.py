@@ -0,0 +1,156 @@
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from typing import *
+
+
+# Name of the cmds backend used by the current worker process
+_worker_backend: Optional[str] = None
+
+
+def install_backend(backend: str = "maya"):
+
+    ###################################
+
+    # Inputs - backend, str
+    # Returns - None
+
+    # Makes "maya.cmds" importable in the current process.
+    # "maya" starts a real Maya standalone session, any other value is
+    # the name of a module exposing an install() function that registers
+    # a stand-in for the maya modules (e.g. an in-memory scene graph).
+
+    ###################################
+
+    if backend == "maya":
+        import maya.standalone
+        maya.standalone.initialize()
+    else:
+        importlib.import_module(backend).install()
+
+
+def _init_worker(backend: str):
+
+    global _worker_backend
+
+    install_backend(backend)
+    _worker_backend = backend
+
+
+def _run_job(job: Dict[str, Any]):
+
+    ###################################
+
+    # Inputs - job, dict
+    # Returns - dict
+
+    # Worker side : opens the scene (a new one when the job has none),
+    # rigs every limb of the job and saves the result. Never raises,
+    # errors are returned in the report.
+
+    ###################################
+
+    report: Dict[str, Any] = {
+        "scene": job.get("scene"),
+        "output": job.get("output"),
+        "pid": os.getpid(),
+        "backend": _worker_backend,
+    }
+    start = time.perf_counter()
+
+    try:
+        import maya.cmds as cmds
+        from config import LimbConfig
+        from batch import build_queue
+
+        # A job without a scene starts from an empty one, not from what the previous job of the worker left
+        if job.get("scene"):
+            cmds.file(job["scene"], open=True, force=True)
+        else:
+            cmds.file(new=True, force=True)
+
+        configs = [LimbConfig.from_dict(limb) for limb in job.get("limbs", [])]
+        report["limbs"] = build_queue(configs)
+
+        if job.get("output"):
+            cmds.file(rename=job["output"])
+            cmds.file(save=True, force=True)
+
+        failed = [limb for limb in report["limbs"] if limb["status"] != "ok"]
+        report["status"] = "error" if failed else "ok"
+
+    except Exception as error:
+        report["status"] = "error"
+        report["error"] = f"{type(error).__name__}: {error}"
+        report["traceback"] = traceback.format_exc()
+
+    report["total"] = time.perf_counter() - start
+
+    return report
+
+
+def run_farm(
+    jobs: List[Dict[str, Any]],
+    workers: Optional[int] = None,
+    backend: str = "maya",
+    report_path: Optional[str] = None,
+):
+
+    ###################################
+
+    # Inputs - jobs, List[dict]; workers, int; backend, str; report_path, str
+    # Returns - dict
+
+    # Fans the jobs out to a pool of worker processes, one scene per job.
+    # A job is {"scene": path, "output": path, "limbs": [LimbConfig dicts]}.
+    # Every worker installs the cmds backend once, then builds its jobs.
+    # Results, errors and timings are gathered in one report, written as
+    # JSON to report_path if given.
+
+    ###################################
+
+    if workers is None:
+        workers = max(1, min(len(jobs), os.cpu_count() or 1))
+
+    start = time.perf_counter()
+
+    # Spawn gives every worker a clean interpreter, a forked Maya session is not safe
+    context = multiprocessing.get_context("spawn")
+
+    with context.Pool(workers, initializer=_init_worker, initargs=(backend,)) as pool:
+        job_reports = pool.map(_run_job, jobs, chunksize=1)
+
+    report = {
+        "backend": backend,
+        "workers": workers,
+        "jobs": job_reports,
+        "failed": sum(1 for job in job_reports if job["status"] != "ok"),
+        "total": time.perf_counter() - start,
+    }
+
+    if report_path:
+        with open(report_path, "w") as file:
+            json.dump(report, file, indent=4)
+
+    return report
+
+
+if __name__ == "__main__":
+
+    # mayapy farm.py <jobs.json> <report.json> [<workers>] [<backend>]
+
+    with open(sys.argv[1], "r") as file:
+        farm_jobs = json.load(file)
+
+    farm_report = run_farm(
+        farm_jobs,
+        workers=int(sys.argv[3]) if len(sys.argv) > 3 else None,
+        backend=sys.argv[4] if len(sys.argv) > 4 else "maya",
+        report_path=sys.argv[2],
+    )
+
+    print(f"{len(farm_jobs) - farm_report['failed']}/{len(farm_jobs)} scenes rigged in {farm_report['total']:.2f}s")
@@ -0,0 +1,229 @@
+import maya.cmds as cmds
+from typing import *
+
+
+###################################
+
+# Indexed joint hierarchy.
+# A HierarchyIndex is built from one listRelatives call under a root joint
+# and answers, without going back to the scene :
+#   - the joints in hierarchy order (same order as get_hierachy)
+#   - the parent, children and depth of a joint, the joints at a depth
+#   - the limb roles : root, mid, end, ball, toe
+#   - the fingers under the end joint : finger("index", 2), finger(0, 1)
+
+# index = hierarchy_index("SK_shoulder_L")
+# index.role("end")            -> "SK_wrist_L"
+# index.finger("thumb", 0)     -> "SK_meta_thumb_L"
+
+# Like the skeleton snapshots, the cached indexes are only rebuilt
+# explicitly (index_hierarchy / invalidate_hierarchy_index).
+
+###################################
+
+
+LIMB_ROLES = ["root", "mid", "end", "ball", "toe"]
+
+_indexes: Dict[str, "HierarchyIndex"] = {}
+
+
+class HierarchyIndex:
+
+    def __init__(self, root_joint: str):
+        self.root_joint = root_joint
+
+        self.parents: Dict[str, Optional[str]] = {root_joint: None}
+        self.children_map: Dict[str, List[str]] = {root_joint: []}
+        self.depths: Dict[str, int] = {root_joint: 0}
+
+        # One traversal : the full paths give the parent and the depth of every joint
+        paths: List[str] = cmds.listRelatives(root_joint, ad=True, f=True, type="joint") or []
+
+        # Deepest joints are listed first, parents must be indexed before their children
+        for path in reversed(paths):
+            names = path.split("|")
+            joint = names[-1]
+
+            parent = root_joint
+            for name in reversed(names[:-1]):
+                if name in self.parents:
+                    parent = name
+                    break
+
+            self.parents[joint] = parent
+            self.children_map[joint] = []
+            self.children_map[parent].append(joint)
+            self.depths[joint] = self.depths[parent] + 1
+
+        self.joints: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self._walk(root_joint)
+
+        self.by_depth: Dict[int, List[str]] = {}
+        for joint in self.joints:
+            self.by_depth.setdefault(self.depths[joint], []).append(joint)
+
+        # The limb chain follows the first child of every joint
+        self.chain: List[str] = [root_joint]
+        while self.children_map[self.chain[-1]]:
+            self.chain.append(self.children_map[self.chain[-1]][0])
+
+        self.roles: Dict[str, str] = dict(zip(LIMB_ROLES[:3], self.chain))
+
+        # A foot continues the chain after the end joint, a hand splits into fingers
+        if len(self.chain) > 3 and len(self.children_map[self.chain[2]]) == 1:
+            self.roles.update(zip(LIMB_ROLES[3:], self.chain[3:]))
+
+        self.fingers: Dict[str, List[str]] = self._find_fingers()
+
+    def _walk(self, root: str):
+        stack = [root]
+        while stack:
+            joint = stack.pop()
+            self.positions[joint] = len(self.joints)
+            self.joints.append(joint)
+            stack.extend(reversed(self.children_map[joint]))
+
+    def _find_fingers(self):
+
+        # Every chain starting under the end joint (wrist) is a finger,
+        # named after its first joint : SK_index_01_L -> index, SK_meta_thumb_L -> thumb
+        fingers: Dict[str, List[str]] = {}
+
+        end = self.roles.get("end")
+        if end is None:
+            return fingers
+
+        for start in self.children_map[end]:
+            phalanges = [start]
+            while self.children_map[phalanges[-1]]:
+                phalanges.append(self.children_map[phalanges[-1]][0])
+
+            # Without its namespace : agent_01:SK_index_01_L
+            parts = start.rpartition(":")[2].split("_")
+            tokens = [token for token in parts[1:-1] if token != "meta" and not token.isdigit()]
+            name = "_".join(tokens) or f"finger{len(fingers)}"
+
+            # Fingers without a metacarpal start at phalange 1
+            if "meta" not in parts:
+                phalanges.insert(0, "")
+
+            fingers[name] = phalanges
+
+        return fingers
+
+    def __contains__(self, joint: str):
+        return joint in self.parents
+
+    def __len__(self):
+        return len(self.joints)
+
+    def role(self, role: str):
+
+        ###################################
+
+        # Inputs - role, str (root, mid, end, ball, toe)
+        # Returns - str
+
+        ###################################
+
+        if role not in self.roles:
+            raise KeyError(f"'{self.root_joint}' hierarchy has no {role} joint.")
+        return self.roles[role]
+
+    def finger(self, finger: Union[str, int], phalange: int):
+
+        ###################################
+
+        # Inputs - finger, str (name) or int (order under the end joint); phalange, int
+        # Returns - str
+
+        # Phalange 0 is the metacarpal, when there is one
+
+        ###################################
+
+        if isinstance(finger, int):
+            finger = list(self.fingers)[finger]
+
+        phalanges = self.fingers.get(finger, [])
+        if phalange >= len(phalanges) or not phalanges[phalange]:
+            raise KeyError(f"'{self.root_joint}' hierarchy has no {finger} phalange {phalange}.")
+        return phalanges[phalange]
+
+    def parent(self, joint: str):
+        return self.parents[joint]
+
+    def children(self, joint: str):
+        return self.children_map[joint]
+
+    def depth(self, joint: str):
+        return self.depths[joint]
+
+    def at_depth(self, depth: int):
+        return self.by_depth.get(depth, [])
+
+    def descendants(self, joint: str):
+
+        ###################################
+
+        # Inputs - joint, str
+        # Returns - List[str], joint and its descendants in hierarchy order
+
+        ###################################
+
+        start = self.positions[joint]
+        depth = self.depths[joint]
+
+        end = start + 1
+        while end < len(self.joints) and self.depths[self.joints[end]] > depth:
+            end += 1
+
+        return self.joints[start:end]
+
+
+def index_hierarchy(root_joint: str):
+
+    ###################################
+
+    # Inputs - root_joint, str
+    # Returns - HierarchyIndex
+
+    # Indexes the hierarchy under root_joint and caches it, replacing any older index
+
+    ###################################
+
+    index = HierarchyIndex(root_joint)
+    _indexes[root_joint] = index
+    return index
+
+
+def hierarchy_index(root_joint: str):
+
+    ###################################
+
+    # Inputs - root_joint, str
+    # Returns - HierarchyIndex
+
+    # Returns the cached index of root_joint, building it if needed
+
+    ###################################
+
+    index = _indexes.get(root_joint)
+    if index is None:
+        index = index_hierarchy(root_joint)
+    return index
+
+
+def invalidate_hierarchy_index(root_joint: Optional[str] = None):
+
+    ###################################
+
+    # Inputs - root_joint, str, every index if None
+    # Returns - None
+
+    ###################################
+
+    if root_joint is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(root_joint, None)
@@ -1,8 +1,12 @@
 import maya.cmds as cmds
 import maya.api.OpenMaya as om
+import contextlib
 import functools
+import math
 from typing import *
 
+from edits import active_edit_batch, edit_batch, node_name
+
 
 controllers_library: Dict[str, List[Tuple[float, float, float]]] = {
     "square": [(1, 1, 0), (-1, 1, 0), (-1, -1, 0), (1, -1, 0), (1, 1, 0)],
@@ -208,6 +212,15 @@ class QuadrupedLimb:
     Forelimb = "forelimb"
     Hindlimb = "hindlimb"
 
+def ribbon_limb(limb_name: str):
+    ###################################
+    # Inputs - limb_name, str (LimbConfig.limb_name)
+    # Returns - str, BipedLimb.Arm or BipedLimb.Leg
+    # The bendy ribbon is laid out for an arm or for a leg, the limbs of a
+    # quadruped ("front", "rear") get the leg ribbon
+    ###################################
+    return BipedLimb.Arm if limb_name == BipedLimb.Arm else BipedLimb.Leg
+
 class WarningManager:
     def __init__(self):
         pass
@@ -241,6 +254,44 @@ def get_selection(typ: Optional[str] = None):
 
     return selection
 
+
+@contextlib.contextmanager
+def keep_selection():
+    ###################################
+    # Inputs - None
+    # Returns - context manager
+    # Restores the active selection on exit. The builders never read the selection,
+    # but creation commands (group, circle, duplicate...) still select what they create.
+    ###################################
+    selection: List[str] = cmds.ls(selection=True, long=True) or []
+    try:
+        yield selection
+    finally:
+        # Nodes deleted in the block (e.g. by a rollback) are left out
+        kept = cmds.ls(selection, long=True) if selection else []
+        if kept:
+            cmds.select(kept, replace=True)
+        else:
+            cmds.select(clear=True)
+
+
+def create_joint(name: str, parent: Optional[str] = None, radius: float = 1.0):
+    ###################################
+    # Inputs - name, str; parent, str; radius, float
+    # Returns - str
+    # Creates a joint under parent (world if None) without touching the selection,
+    # cmds.joint would parent it under the selected joint.
+    ###################################
+    joint = cmds.createNode("joint", n=name, p=parent, ss=True) if parent else cmds.createNode("joint", n=name, ss=True)
+    cmds.setAttr(joint + ".radius", radius)
+
+    # Connected by cmds.joint, so that the parent scale does not scale the joint
+    if parent and cmds.nodeType(parent) == "joint":
+        cmds.connectAttr(parent + ".scale", joint + ".inverseScale")
+
+    return joint
+
+
 def get_float_field(name:str):
     ###################################
 
@@ -313,13 +364,40 @@ def get_hierachy(root_joint: str):
     return joint_hierarchy
 
 
+def create_node(typ: str, name: str, parent: Optional[str] = None):
+    ###################################
+    # Inputs - typ, str; name, str; parent, str
+    # Returns - str, or the MObject of the queued node if an edit batch is open (edits.node_name)
+    # Creates a utility node (or a DAG node under parent), queued if an edit batch is open.
+    ###################################
+    batch = active_edit_batch()
+    if batch is not None:
+        return batch.create_node(typ, name, parent)
+
+    if parent is None:
+        return cmds.shadingNode(typ, n=name, au=True)
+    return cmds.createNode(typ, n=name, p=parent) if parent else cmds.createNode(typ, n=name)
+
+
 def set_attr(obj: str, attr: str, *values, **kwargs):
     ###################################
     # Inputs - obj, str; attr, str; values, variadic; kwargs, dict
     # Returns - None
-    # Sets the value of an attribute for a specified object.
+    # Sets the value of an attribute for a specified object, queued if an edit batch is open.
     ###################################
-    cmds.setAttr(f"{obj}.{attr}", *values, **kwargs)
+    batch = active_edit_batch()
+    if batch is not None:
+        flags = {key: kwargs.pop(key) for key in ("lock", "keyable") if key in kwargs}
+        typ = kwargs.pop("type", None)
+        if kwargs:
+            raise ValueError(f"set_attr : {', '.join(kwargs)} cannot be queued in an edit batch.")
+        if values:
+            batch.set(obj, attr, *values, typ=typ)
+        if flags:
+            batch.set_flags(obj, attr, **flags)
+        return
+
+    cmds.setAttr(f"{node_name(obj)}.{attr}", *values, **kwargs)
 
 
 def set_appearance(obj: str, red: float, green: float, blue: float):
@@ -340,11 +418,17 @@ def lock_transforms(object: str, to_lock:bool=True):
     # Locks or Unlocks(and makes keyable) the translate, rotate, and scale attributes.
     ###################################
 
+    batch = active_edit_batch()
+
     for attr in ['translate', 'rotate', 'scale']:
 
         for axis in 'XYZ':
 
-            attr_name = f"{object}.{attr}{axis}"
+            if batch is not None:
+                batch.set_flags(object, f"{attr}{axis}", lock=to_lock, keyable=not to_lock)
+                continue
+
+            attr_name = f"{node_name(object)}.{attr}{axis}"
 
             # Lock (or Unlock) the attribute
             cmds.setAttr(attr_name, lock=to_lock)
@@ -357,10 +441,15 @@ def connect_attr(input_obj: str, input_attr: str, output_obj: str, output_attr:
     ###################################
     # Inputs - input_obj, str; input_attr, str; output_obj, str; output_attr, str
     # Returns - None
-    # Connects an attribute from one object to another.
+    # Connects an attribute from one object to another, queued if an edit batch is open.
     ###################################
+    batch = active_edit_batch()
+    if batch is not None:
+        batch.connect(input_obj, input_attr, output_obj, output_attr)
+        return
+
     cmds.connectAttr(
-        f"{input_obj}.{input_attr}", f"{output_obj}.{output_attr}", force=1
+        f"{node_name(input_obj)}.{input_attr}", f"{node_name(output_obj)}.{output_attr}", force=1
     )
 
 
@@ -379,6 +468,45 @@ def set_lineWidth(curve: str, width: float = 2, isShape: Optional[bool] = False)
         cmds.setAttr(f"{curve}{shape}" + ".lineWidth", width, edit=True)
 
 
+CONSTRAINT_MODES = ["constraint", "matrix"]
+
+_constraint_mode = "constraint"
+
+
+def set_constraint_mode(mode: str):
+    ###################################
+    # Inputs - mode, str ("constraint" or "matrix")
+    # Returns - None
+    # Selects how constraint() and aim_constraint() drive their targets :
+    # with constraint nodes, or with matrix nodes (multMatrix, blendMatrix,
+    # aimMatrix) feeding offsetParentMatrix or the channels of joints.
+    ###################################
+    global _constraint_mode
+
+    if mode not in CONSTRAINT_MODES:
+        raise ValueError(f"Unknown constraint mode '{mode}', expected one of {CONSTRAINT_MODES}.")
+    _constraint_mode = mode
+
+
+def get_constraint_mode():
+    return _constraint_mode
+
+
+@contextlib.contextmanager
+def constraint_mode(mode: str):
+    ###################################
+    # Inputs - mode, str
+    # Returns - context manager
+    # Uses the given constraint mode for the duration of a build
+    ###################################
+    previous = _constraint_mode
+    set_constraint_mode(mode)
+    try:
+        yield
+    finally:
+        set_constraint_mode(previous)
+
+
 def constraint(
     parent_obj: str,
     constrained_obj: str,
@@ -393,8 +521,16 @@ def constraint(
     #          scale_value, bool; maintain_offset_value, bool
     # Returns - str or List[str]
     # Creates a constraint between two objects with specified options.
+    # In "matrix" mode (see set_constraint_mode), returns the matrix node driving the object.
     ###################################
 
+    if _constraint_mode == "matrix":
+        node = matrix_constraint(
+            parent_obj, constrained_obj, translate_value, orient_value, scale_value, maintain_offset_value
+        )
+        if node is not None:
+            return node
+
     constraint_name: str = None
 
     if translate_value and orient_value:
@@ -417,4 +553,260 @@ def constraint(
         )
         return [constraint_name, constraint_scale_name]
 
-    return constraint_name
\ No newline at end of file
+    return constraint_name
+
+
+def aim_constraint(
+    target_obj: str,
+    constrained_obj: str,
+    aim_vector: Sequence[float] = (1, 0, 0),
+    up_vector: Sequence[float] = (0, 1, 0),
+    world_up_vector: Sequence[float] = (0, 1, 0),
+    world_up_object: Optional[str] = None,
+):
+    ###################################
+    # Inputs - target_obj, str; constrained_obj, str; aim_vector, up_vector,
+    #          world_up_vector, (x, y, z); world_up_object, str
+    # Returns - str
+    # Aims constrained_obj at target_obj, the up axis aligned with world_up_vector.
+    # world_up_object is only passed to aimConstraint, which ignores it unless
+    # its world up type is changed, so both modes give the same result.
+    ###################################
+
+    if _constraint_mode != "matrix":
+        kwargs = {"wuo": world_up_object} if world_up_object else {}
+        return cmds.aimConstraint(target_obj, constrained_obj, aim=aim_vector, u=up_vector, wu=world_up_vector, **kwargs)
+
+    name = constrained_obj + "_aimMatrix"
+    aim = cmds.createNode("aimMatrix", n=name)
+
+    _matrix_input(constrained_obj, aim + ".inputMatrix")
+    cmds.connectAttr(target_obj + ".worldMatrix[0]", aim + ".primaryTargetMatrix", f=True)
+    cmds.setAttr(aim + ".primaryInputAxis", *aim_vector)
+
+    # Secondary axis aligned with a world vector, like aimConstraint's default "vector" world up type
+    cmds.setAttr(aim + ".secondaryMode", 2)
+    cmds.setAttr(aim + ".secondaryInputAxis", *up_vector)
+    cmds.setAttr(aim + ".secondaryTargetVector", *world_up_vector)
+
+    # Back to the local space of the object
+    cmds.connectAttr(constrained_obj + ".parentInverseMatrix[0]", aim + ".postSpaceMatrix", f=True)
+
+    _drive_offset_parent_matrix(constrained_obj, aim + ".outputMatrix")
+    return aim
+
+
+# ------------------------------------------------------------------------
+# Matrix constraints
+
+
+def euler_rotation(rotation: Sequence[float]):
+
+    ###################################
+
+    # Inputs - rotation, (x, y, z) in degrees
+    # Returns - Tuple[Tuple[float, float, float], ...], the 3 rows of the rotation
+
+    # XYZ rotation order, for row vectors (point * Rx * Ry * Rz) like Maya.
+    # Used by the matrix constraints and the control shapes (modules.py)
+
+    ###################################
+
+    x, y, z = (math.radians(angle) for angle in rotation)
+    cx, sx, cy, sy, cz, sz = math.cos(x), math.sin(x), math.cos(y), math.sin(y), math.cos(z), math.sin(z)
+
+    return (
+        (cy * cz, cy * sz, -sy),
+        (sx * sy * cz - cx * sz, sx * sy * sz + cx * cz, sx * cy),
+        (cx * sy * cz + sx * sz, cx * sy * sz - sx * cz, cx * cy),
+    )
+
+
+def _euler_matrix(rotation: Sequence[float]):
+    rows = euler_rotation(rotation)
+    return om.MMatrix([*rows[0], 0.0, *rows[1], 0.0, *rows[2], 0.0, 0.0, 0.0, 0.0, 1.0])
+
+
+def _world_matrix(obj: str):
+    return om.MMatrix(cmds.xform(obj, q=True, ws=True, m=True))
+
+
+def _local_matrix(obj: str):
+    return om.MMatrix(cmds.xform(obj, q=True, os=True, m=True))
+
+
+def _is_identity(matrix, tolerance: float = 1e-9):
+    identity = om.MMatrix()
+    return all(abs(a - b) <= tolerance for a, b in zip(matrix, identity))
+
+
+def _matrix_input(obj: str, destination: str):
+
+    # Connects the rest world matrix of obj (its parent matrix times its current
+    # local matrix) to destination, without reading obj's own world matrix
+    local = _local_matrix(obj)
+    if _is_identity(local):
+        cmds.connectAttr(obj + ".parentMatrix[0]", destination, f=True)
+        return
+
+    mult = cmds.createNode("multMatrix", n=obj + "_restMatrix")
+    cmds.setAttr(mult + ".matrixIn[0]", list(local), type="matrix")
+    cmds.connectAttr(obj + ".parentMatrix[0]", mult + ".matrixIn[1]", f=True)
+    cmds.connectAttr(mult + ".matrixSum", destination, f=True)
+
+
+def bake_offset_parent_matrix(obj: str):
+    ###################################
+    # Inputs - obj, str
+    # Returns - None
+    # Moves the local matrix of obj (joint orient included) into its
+    # offsetParentMatrix and zeroes its channels, obj does not move.
+    # A matrix network can then drive offsetParentMatrix.
+    ###################################
+
+    local = _local_matrix(obj)
+
+    cmds.setAttr(obj + ".offsetParentMatrix", list(local), type="matrix")
+    cmds.setAttr(obj + ".translate", 0, 0, 0)
+    cmds.setAttr(obj + ".rotate", 0, 0, 0)
+    cmds.setAttr(obj + ".scale", 1, 1, 1)
+
+    if cmds.nodeType(obj) == "joint":
+        cmds.setAttr(obj + ".jointOrient", 0, 0, 0)
+
+
+def _drive_offset_parent_matrix(obj: str, source: str):
+    bake_offset_parent_matrix(obj)
+    cmds.connectAttr(source, obj + ".offsetParentMatrix", f=True)
+
+
+def _parent_space_matrix(
+    parent_obj: str, constrained_obj: str, maintain_offset: bool, extra: Optional[Any] = None, offset: Optional[Any] = None
+):
+
+    # multMatrix giving parent_obj's world matrix in constrained_obj's parent space :
+    # [offset] * parent world * constrained parent inverse [* extra]
+    mult = cmds.createNode("multMatrix", n=f"{constrained_obj}_multMatrix")
+
+    if offset is None and maintain_offset:
+        offset = _world_matrix(constrained_obj) * _world_matrix(parent_obj).inverse()
+
+    index = 0
+    if offset is not None and not _is_identity(offset):
+        cmds.setAttr(f"{mult}.matrixIn[{index}]", list(offset), type="matrix")
+        index += 1
+
+    cmds.connectAttr(parent_obj + ".worldMatrix[0]", f"{mult}.matrixIn[{index}]", f=True)
+    cmds.connectAttr(constrained_obj + ".parentInverseMatrix[0]", f"{mult}.matrixIn[{index + 1}]", f=True)
+
+    if extra is not None:
+        cmds.setAttr(f"{mult}.matrixIn[{index + 2}]", list(extra), type="matrix")
+
+    return mult
+
+
+def matrix_constraint(
+    parent_obj: str,
+    constrained_obj: str,
+    translate_value: Optional[bool] = True,
+    orient_value: Optional[bool] = True,
+    scale_value: Optional[bool] = False,
+    maintain_offset_value: Optional[bool] = False,
+):
+    ###################################
+    # Inputs - same as constraint()
+    # Returns - str, the node driving constrained_obj, None if it can not be done with matrices
+    # Joints keep their channels (they are read by pairBlends and IK handles) :
+    # multMatrix -> decomposeMatrix -> translate / rotate / scale.
+    # Other transforms are driven through offsetParentMatrix : multMatrix, and a
+    # blendMatrix picking the channels when only some of them are constrained.
+    ###################################
+
+    if cmds.nodeType(constrained_obj) == "joint":
+
+        joint_orient = _euler_matrix(cmds.getAttr(constrained_obj + ".jointOrient")[0])
+        oriented = not _is_identity(joint_orient)
+
+        # Rotate is local rotation * inverse jointOrient, which moves the translation :
+        # both can not come out of the same matrix
+        if translate_value and orient_value and oriented:
+            return None
+
+        extra = joint_orient.inverse() if (orient_value and oriented) else None
+        mult = _parent_space_matrix(parent_obj, constrained_obj, maintain_offset_value, extra)
+
+        decompose = cmds.createNode("decomposeMatrix", n=f"{constrained_obj}_decomposeMatrix")
+        cmds.connectAttr(mult + ".matrixSum", decompose + ".inputMatrix", f=True)
+
+        if translate_value:
+            cmds.connectAttr(decompose + ".outputTranslate", constrained_obj + ".translate", f=True)
+        if orient_value:
+            cmds.connectAttr(decompose + ".outputRotate", constrained_obj + ".rotate", f=True)
+        if scale_value:
+            cmds.connectAttr(decompose + ".outputScale", constrained_obj + ".scale", f=True)
+
+        return decompose
+
+    mult = _parent_space_matrix(parent_obj, constrained_obj, maintain_offset_value)
+
+    if translate_value and orient_value and scale_value:
+        _drive_offset_parent_matrix(constrained_obj, mult + ".matrixSum")
+        return mult
+
+    return _blend_target(constrained_obj, mult, translate_value, orient_value, scale_value)
+
+
+def _blend_target(constrained_obj: str, mult: str, translate_value: bool, orient_value: bool, scale_value: bool):
+
+    # Only some channels : blended over the rest matrix, one target per constraint call
+    blends = cmds.listConnections(constrained_obj + ".offsetParentMatrix", s=True, d=False, type="blendMatrix")
+
+    if blends:
+        blend = blends[0]
+        index = len(cmds.listConnections(blend, s=True, d=False, type="multMatrix") or [])
+    else:
+        blend = cmds.createNode("blendMatrix", n=f"{constrained_obj}_blendMatrix")
+        cmds.setAttr(blend + ".inputMatrix", list(_local_matrix(constrained_obj)), type="matrix")
+        _drive_offset_parent_matrix(constrained_obj, blend + ".outputMatrix")
+        index = 0
+
+    target = f"{blend}.target[{index}]"
+    cmds.connectAttr(mult + ".matrixSum", target + ".targetMatrix", f=True)
+    cmds.setAttr(target + ".translateWeight", 1 if translate_value else 0)
+    cmds.setAttr(target + ".rotateWeight", 1 if orient_value else 0)
+    cmds.setAttr(target + ".scaleWeight", 1 if scale_value else 0)
+    cmds.setAttr(target + ".shearWeight", 0)
+
+    return blend
+
+
+def point_orient_constraint(
+    parent_obj: str, constrained_obj: str, translate_offset: bool = False, orient_offset: bool = False
+):
+    ###################################
+    # Inputs - parent_obj, str; constrained_obj, str;
+    #          translate_offset, bool; orient_offset, bool
+    # Returns - List[str]
+    # A point and an orient constraint from the same driver, each keeping
+    # its own offset or not. In "matrix" mode a transform gets one
+    # multMatrix holding both offsets and one blendMatrix target, instead
+    # of one target per channel.
+    ###################################
+
+    if _constraint_mode != "matrix" or cmds.nodeType(constrained_obj) == "joint":
+        return [
+            constraint(parent_obj, constrained_obj, translate_value=True, orient_value=False, maintain_offset_value=translate_offset),
+            constraint(parent_obj, constrained_obj, translate_value=False, orient_value=True, maintain_offset_value=orient_offset),
+        ]
+
+    # offset * parent world : the rotation rows of the orient offset, the translation row of the point offset
+    full = _world_matrix(constrained_obj) * _world_matrix(parent_obj).inverse()
+    values = list(om.MMatrix())
+    for row in range(4):
+        if (row < 3 and orient_offset) or (row == 3 and translate_offset):
+            for column in range(3):
+                values[row * 4 + column] = full.getElement(row, column)
+    offset = om.MMatrix(values)
+
+    mult = _parent_space_matrix(parent_obj, constrained_obj, False, offset=offset)
+    return [mult, _blend_target(constrained_obj, mult, True, True, False)]
@@ -0,0 +1,459 @@
+import os
+from typing import *
+
+try:
+    import maya.cmds as cmds
+    import maya.api.OpenMaya as om
+except ImportError:  # plain Python, only the solver math is available
+    cmds = None
+    om = None
+
+try:
+    import numpy as np
+except ImportError:  # the solver node needs numpy, the builders keep the other FK / IK blends
+    np = None
+
+
+###################################
+
+# Limb solver node.
+# One "limbSolver" node evaluates a whole limb in one compute : the local
+# matrices of the IK and FK joints are blended by the switch into the SK
+# joints matrices, and the stretch factor (distance from the root to the
+# IK control over the rest length, blended by the stretch attribute) is
+# given back to the IK joints. It replaces the pairBlends and the stretch
+# network (distanceBetween, floatMath, blendColors) of a limb.
+
+# The math is plain NumPy and does not need Maya :
+#   out, factor, volume = solve_limb(ik_matrices, fk_matrices, blend, root, parent, end, rest_length, stretch)
+
+# This file is also a Maya plugin, registering the node (see load_plugin).
+
+###################################
+
+
+maya_useNewAPI = True
+
+NODE_TYPE = "limbSolver"
+
+# Local, non distributed plugin id range (0x00000 - 0x7ffff)
+NODE_ID = 0x0007F3A0
+
+# Below this dot product, slerp instead of a normalized lerp
+SLERP_THRESHOLD = 0.9995
+
+_plugin_loaded: Optional[bool] = None
+
+
+# ------------------------------------------------------------------------
+# Solver math, row vectors like Maya : point * S * R * T
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("The limb solver needs NumPy.")
+
+
+def matrices_to_quaternions(rotations):
+
+    ###################################
+
+    # Inputs - rotations, (N, 3, 3) orthonormal rotation matrices (row vectors)
+    # Returns - (N, 4) quaternions (x, y, z, w)
+
+    ###################################
+
+    # Same matrices, column vector convention
+    m = np.transpose(rotations, (0, 2, 1))
+
+    trace = m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2]
+    quaternions = np.empty((len(m), 4))
+
+    # The largest of w, x, y, z is divided by, the 4 cases are computed at once and picked
+    cases = np.stack([trace, m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]], axis=1).argmax(axis=1)
+
+    w = cases == 0
+    s = np.sqrt(np.maximum(trace[w] + 1.0, 0.0)) * 2.0
+    quaternions[w] = np.stack([
+        (m[w, 2, 1] - m[w, 1, 2]) / s,
+        (m[w, 0, 2] - m[w, 2, 0]) / s,
+        (m[w, 1, 0] - m[w, 0, 1]) / s,
+        0.25 * s,
+    ], axis=1)
+
+    x = cases == 1
+    s = np.sqrt(np.maximum(1.0 + m[x, 0, 0] - m[x, 1, 1] - m[x, 2, 2], 0.0)) * 2.0
+    quaternions[x] = np.stack([
+        0.25 * s,
+        (m[x, 0, 1] + m[x, 1, 0]) / s,
+        (m[x, 0, 2] + m[x, 2, 0]) / s,
+        (m[x, 2, 1] - m[x, 1, 2]) / s,
+    ], axis=1)
+
+    y = cases == 2
+    s = np.sqrt(np.maximum(1.0 + m[y, 1, 1] - m[y, 0, 0] - m[y, 2, 2], 0.0)) * 2.0
+    quaternions[y] = np.stack([
+        (m[y, 0, 1] + m[y, 1, 0]) / s,
+        0.25 * s,
+        (m[y, 1, 2] + m[y, 2, 1]) / s,
+        (m[y, 0, 2] - m[y, 2, 0]) / s,
+    ], axis=1)
+
+    z = cases == 3
+    s = np.sqrt(np.maximum(1.0 + m[z, 2, 2] - m[z, 0, 0] - m[z, 1, 1], 0.0)) * 2.0
+    quaternions[z] = np.stack([
+        (m[z, 0, 2] + m[z, 2, 0]) / s,
+        (m[z, 1, 2] + m[z, 2, 1]) / s,
+        0.25 * s,
+        (m[z, 1, 0] - m[z, 0, 1]) / s,
+    ], axis=1)
+
+    return quaternions
+
+
+def quaternions_to_matrices(quaternions):
+
+    ###################################
+
+    # Inputs - quaternions, (N, 4) unit quaternions (x, y, z, w)
+    # Returns - (N, 3, 3) rotation matrices (row vectors)
+
+    ###################################
+
+    x, y, z, w = quaternions.T
+
+    m = np.empty((len(quaternions), 3, 3))
+    m[:, 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    m[:, 0, 1] = 2.0 * (x * y - z * w)
+    m[:, 0, 2] = 2.0 * (x * z + y * w)
+    m[:, 1, 0] = 2.0 * (x * y + z * w)
+    m[:, 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    m[:, 1, 2] = 2.0 * (y * z - x * w)
+    m[:, 2, 0] = 2.0 * (x * z - y * w)
+    m[:, 2, 1] = 2.0 * (y * z + x * w)
+    m[:, 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+
+    return np.transpose(m, (0, 2, 1))
+
+
+def slerp(q0, q1, weight: float):
+
+    ###################################
+
+    # Inputs - q0, q1, (N, 4) unit quaternions; weight, float
+    # Returns - (N, 4), shortest path interpolation from q0 (0) to q1 (1)
+
+    ###################################
+
+    dot = np.einsum("ij,ij->i", q0, q1)
+    q1 = np.where(dot[:, None] < 0.0, -q1, q1)
+    dot = np.abs(dot)
+
+    # Nearly identical rotations, a normalized lerp avoids dividing by sin(~0)
+    close = dot > SLERP_THRESHOLD
+    angle = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_angle = np.where(close, 1.0, np.sin(angle))
+
+    w0 = np.where(close, 1.0 - weight, np.sin((1.0 - weight) * angle) / sin_angle)
+    w1 = np.where(close, weight, np.sin(weight * angle) / sin_angle)
+
+    result = w0[:, None] * q0 + w1[:, None] * q1
+    return result / np.linalg.norm(result, axis=1, keepdims=True)
+
+
+def decompose_matrices(matrices):
+
+    ###################################
+
+    # Inputs - matrices, (N, 4, 4)
+    # Returns - translations (N, 3), quaternions (N, 4), scales (N, 3)
+
+    # Shear is not kept, like every matrix driven by the builders
+
+    ###################################
+
+    basis = matrices[:, :3, :3]
+    scales = np.linalg.norm(basis, axis=2)
+    rotations = basis / np.where(scales == 0.0, 1.0, scales)[:, :, None]
+    return matrices[:, 3, :3], matrices_to_quaternions(rotations), scales
+
+
+def compose_matrices(translations, quaternions, scales):
+
+    ###################################
+
+    # Inputs - translations (N, 3), quaternions (N, 4), scales (N, 3)
+    # Returns - (N, 4, 4)
+
+    ###################################
+
+    matrices = np.zeros((len(translations), 4, 4))
+    matrices[:, :3, :3] = quaternions_to_matrices(quaternions) * scales[:, :, None]
+    matrices[:, 3, :3] = translations
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+def blend_matrices(ik_matrices, fk_matrices, blend: float):
+
+    ###################################
+
+    # Inputs - ik_matrices, fk_matrices, (N, 4, 4) local matrices; blend, float
+    # Returns - (N, 4, 4)
+
+    # Blends every joint at once, IK at 0 and FK at 1 like the pairBlend weight :
+    # translate and scale linearly, rotation along the shortest arc
+
+    ###################################
+
+    _require_numpy()
+
+    ik_matrices = np.asarray(ik_matrices, dtype=np.float64).reshape(-1, 4, 4)
+    fk_matrices = np.asarray(fk_matrices, dtype=np.float64).reshape(-1, 4, 4)
+
+    if blend <= 0.0:
+        return ik_matrices.copy()
+    if blend >= 1.0:
+        return fk_matrices.copy()
+
+    ik_translate, ik_rotate, ik_scale = decompose_matrices(ik_matrices)
+    fk_translate, fk_rotate, fk_scale = decompose_matrices(fk_matrices)
+
+    return compose_matrices(
+        ik_translate + (fk_translate - ik_translate) * blend,
+        slerp(ik_rotate, fk_rotate, blend),
+        ik_scale + (fk_scale - ik_scale) * blend,
+    )
+
+
+def stretch_factor(
+    root_translate: Sequence[float],
+    root_parent_matrix,
+    end_matrix,
+    rest_length: float,
+    stretch: float,
+    squash: bool = False,
+):
+
+    ###################################
+
+    # Inputs - root_translate, (x, y, z); root_parent_matrix, end_matrix, 16 values or (4, 4);
+    #          rest_length, float; stretch, float; squash, bool
+    # Returns - (factor, volume), float
+
+    # Same result as the stretch network of modules.stretch : distance from the
+    # root to the end (IK control) over the rest length, never below 1 without
+    # squash, blended with 1 by stretch. volume is 1 / sqrt(factor).
+
+    ###################################
+
+    _require_numpy()
+
+    root_parent_matrix = np.asarray(root_parent_matrix, dtype=np.float64).reshape(4, 4)
+    end_matrix = np.asarray(end_matrix, dtype=np.float64).reshape(4, 4)
+
+    root = np.append(np.asarray(root_translate, dtype=np.float64), 1.0) @ root_parent_matrix
+    distance = float(np.linalg.norm(end_matrix[3, :3] - root[:3]))
+
+    ratio = distance / rest_length if rest_length > 0.0 else 1.0
+    if not squash:
+        ratio = max(ratio, 1.0)
+
+    factor = 1.0 + (ratio - 1.0) * stretch
+    volume = factor ** -0.5 if factor > 0.0 else 1.0
+
+    return factor, volume
+
+
+def solve_limb(
+    ik_matrices,
+    fk_matrices,
+    blend: float,
+    root_translate: Sequence[float],
+    root_parent_matrix,
+    end_matrix,
+    rest_length: float,
+    stretch: float,
+    squash: bool = False,
+):
+
+    ###################################
+
+    # Inputs - see blend_matrices and stretch_factor
+    # Returns - ((N, 4, 4) SK local matrices, stretch factor, volume factor)
+
+    # Everything the limbSolver node computes
+
+    ###################################
+
+    factor, volume = stretch_factor(root_translate, root_parent_matrix, end_matrix, rest_length, stretch, squash)
+    return blend_matrices(ik_matrices, fk_matrices, blend), factor, volume
+
+
+# ------------------------------------------------------------------------
+# Loading
+
+
+def load_plugin():
+
+    ###################################
+
+    # Inputs - None
+    # Returns - bool
+
+    # Loads this file as a plugin, False when not in Maya or without numpy
+    # (the in-memory scene creates the node without it)
+
+    ###################################
+
+    global _plugin_loaded
+
+    if _plugin_loaded is None:
+        try:
+            plugin = os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+            if np is not None and not cmds.pluginInfo(plugin, query=True, loaded=True):
+                cmds.loadPlugin(plugin, quiet=True)
+            _plugin_loaded = np is not None
+        except (AttributeError, RuntimeError):
+            _plugin_loaded = False
+
+    return _plugin_loaded
+
+
+# ------------------------------------------------------------------------
+# Plugin
+
+
+class LimbSolverNode(om.MPxNode if om is not None and hasattr(om, "MPxNode") else object):
+
+    # Inputs
+    ik_matrix = None
+    fk_matrix = None
+    blend = None
+    stretch = None
+    squash = None
+    root_translate = None
+    root_parent_matrix = None
+    end_matrix = None
+    rest_length = None
+
+    # Outputs
+    out_matrix = None
+    stretch_factor = None
+    volume_factor = None
+
+    @staticmethod
+    def creator():
+        return LimbSolverNode()
+
+    @staticmethod
+    def initialize():
+
+        matrix_fn = om.MFnMatrixAttribute()
+        numeric_fn = om.MFnNumericAttribute()
+        node = LimbSolverNode
+
+        def matrix_attribute(long_name: str, short_name: str, array: bool = False, output: bool = False):
+            attribute = matrix_fn.create(long_name, short_name, om.MFnMatrixAttribute.kDouble)
+            matrix_fn.array = array
+            matrix_fn.usesArrayDataBuilder = array
+            matrix_fn.writable = not output
+            matrix_fn.storable = not output
+            return attribute
+
+        def double_attribute(long_name: str, short_name: str, default: float, output: bool = False):
+            attribute = numeric_fn.create(long_name, short_name, om.MFnNumericData.kDouble, default)
+            numeric_fn.keyable = not output
+            numeric_fn.writable = not output
+            numeric_fn.storable = not output
+            return attribute
+
+        node.ik_matrix = matrix_attribute("ikMatrix", "ikm", array=True)
+        node.fk_matrix = matrix_attribute("fkMatrix", "fkm", array=True)
+        node.blend = double_attribute("blend", "bl", 0.0)
+        node.stretch = double_attribute("stretch", "st", 0.0)
+        node.squash = numeric_fn.create("squash", "sq", om.MFnNumericData.kBoolean, False)
+        node.root_translate = numeric_fn.createPoint("rootTranslate", "rt")
+        node.root_parent_matrix = matrix_attribute("rootParentMatrix", "rpm")
+        node.end_matrix = matrix_attribute("endMatrix", "em")
+        node.rest_length = double_attribute("restLength", "rl", 1.0)
+
+        node.out_matrix = matrix_attribute("outMatrix", "om", array=True, output=True)
+        node.stretch_factor = double_attribute("stretchFactor", "sf", 1.0, output=True)
+        node.volume_factor = double_attribute("volumeFactor", "vf", 1.0, output=True)
+
+        for attribute in (
+            node.ik_matrix, node.fk_matrix, node.blend, node.stretch, node.squash, node.root_translate,
+            node.root_parent_matrix, node.end_matrix, node.rest_length,
+            node.out_matrix, node.stretch_factor, node.volume_factor,
+        ):
+            om.MPxNode.addAttribute(attribute)
+
+        # The IK joints matrices depend on the stretch factor, the two outputs are
+        # kept apart so the IK joints scale does not make a cycle
+        for attribute in (node.ik_matrix, node.fk_matrix, node.blend):
+            om.MPxNode.attributeAffects(attribute, node.out_matrix)
+
+        for attribute in (node.stretch, node.squash, node.root_translate, node.root_parent_matrix, node.end_matrix, node.rest_length):
+            om.MPxNode.attributeAffects(attribute, node.stretch_factor)
+            om.MPxNode.attributeAffects(attribute, node.volume_factor)
+
+    @staticmethod
+    def _read_matrices(data, attribute):
+        handle = data.inputArrayValue(attribute)
+        matrices = []
+        for _ in range(len(handle)):
+            matrices.append(list(handle.inputValue().asMatrix()))
+            handle.next()
+        return matrices
+
+    def compute(self, plug, data):
+        node = LimbSolverNode
+        attribute = plug.attribute()
+
+        if attribute == node.out_matrix:
+
+            ik_matrices = self._read_matrices(data, node.ik_matrix)
+            fk_matrices = self._read_matrices(data, node.fk_matrix)
+            count = min(len(ik_matrices), len(fk_matrices))
+
+            out_handle = data.outputArrayValue(node.out_matrix)
+            builder = out_handle.builder()
+
+            if count:
+                blended = blend_matrices(ik_matrices[:count], fk_matrices[:count], data.inputValue(node.blend).asDouble())
+                for index, matrix in enumerate(blended):
+                    builder.addElement(index).setMMatrix(om.MMatrix(matrix.ravel().tolist()))
+
+            out_handle.set(builder)
+            out_handle.setAllClean()
+            data.setClean(plug)
+
+        elif attribute == node.stretch_factor or attribute == node.volume_factor:
+
+            factor, volume = stretch_factor(
+                data.inputValue(node.root_translate).asFloat3(),
+                list(data.inputValue(node.root_parent_matrix).asMatrix()),
+                list(data.inputValue(node.end_matrix).asMatrix()),
+                data.inputValue(node.rest_length).asDouble(),
+                data.inputValue(node.stretch).asDouble(),
+                data.inputValue(node.squash).asBool(),
+            )
+
+            data.outputValue(node.stretch_factor).setDouble(factor)
+            data.outputValue(node.volume_factor).setDouble(volume)
+            data.setClean(node.stretch_factor)
+            data.setClean(node.volume_factor)
+
+        else:
+            return None
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin, "LimbRiggingTool", "1.0").registerNode(
+        NODE_TYPE, om.MTypeId(NODE_ID), LimbSolverNode.creator, LimbSolverNode.initialize
+    )
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterNode(om.MTypeId(NODE_ID))
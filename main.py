@@ -9,14 +9,48 @@ import importlib
 
 import UI
 importlib.reload(UI)
+import edits
+importlib.reload(edits)
+import transaction
+importlib.reload(transaction)
+import performance
+importlib.reload(performance)
 import library
 importlib.reload(library)
+import manifest
+importlib.reload(manifest)
+import hierarchy
+importlib.reload(hierarchy)
+import snapshot
+importlib.reload(snapshot)
+import config
+importlib.reload(config)
+import context
+importlib.reload(context)
+import limb_solver
+importlib.reload(limb_solver)
 import LimbClass
 importlib.reload(LimbClass)
 import bendy_limbs
 importlib.reload(bendy_limbs)
 import modules
 importlib.reload(modules)
+import names
+importlib.reload(names)
+import preflight
+importlib.reload(preflight)
+import tracer
+importlib.reload(tracer)
+import scheduler
+importlib.reload(scheduler)
+import plan
+importlib.reload(plan)
+import rebuild
+importlib.reload(rebuild)
+import rig_cache
+importlib.reload(rig_cache)
+import batch
+importlib.reload(batch)
 
 
 from UI import load_ui
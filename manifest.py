@@ -0,0 +1,231 @@
+import json
+import maya.cmds as cmds
+from typing import *
+
+from edits import active_edit_batch, node_name
+from library import connect_attr, set_attr
+
+
+###################################
+
+# Rig manifest.
+# Every build records the nodes it makes by role ("ik_handle", "fk.mid",
+# "curl.index"...) on a network node : each node is connected by its
+# message attribute to one element of the "members" multi, and the
+# role -> element table is serialized in the "manifestTable" string. A role
+# is then resolved with one listConnections on one plug, and still resolves
+# after the node was renamed.
+
+# manifest = get_manifest("leg_L")
+# manifest.add("ik_handle", "IkHandle_leg_L")
+# manifest["ik_handle"]                 -> "IkHandle_leg_L"
+# find_manifests()                      -> ["arm_L", "hand_L", "leg_L"]
+
+# Tools outside of the build only need the limb name : the table is read
+# back from the network node.
+
+###################################
+
+
+MANIFEST_PREFIX = "manifest_"
+MEMBERS_ATTR = "members"
+TABLE_ATTR = "manifestTable"
+
+_manifests: Dict[str, "RigManifest"] = {}
+
+
+class RigManifest:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.node = MANIFEST_PREFIX + name
+
+        # role -> element of the members multi, and the name the node had when added
+        self.indices: Dict[str, int] = {}
+        self.names: Dict[str, str] = {}
+
+        self.table = ""
+
+    def __contains__(self, role: str):
+        return role in self.indices
+
+    def __getitem__(self, role: str):
+        return self.get(role)
+
+    def roles(self):
+        return list(self.indices)
+
+    # --------------------------------------------------------------------
+    # Scene
+
+    def _create_node(self):
+        if cmds.objExists(self.node):
+            return
+        cmds.createNode("network", n=self.node, ss=True)
+        cmds.addAttr(self.node, ln=MEMBERS_ATTR, at="message", multi=True)
+        cmds.addAttr(self.node, ln=TABLE_ATTR, dt="string")
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "roles": {role: [index, self.names[role]] for role, index in self.indices.items()},
+        }
+
+    def _write_table(self):
+        # Nodes created in an edit batch are recorded by MObject, named once it is committed
+        self.names = {role: node_name(node) for role, node in self.names.items()}
+        self.table = json.dumps(self.to_dict(), sort_keys=True)
+        set_attr(self.node, TABLE_ATTR, self.table, type="string")
+
+    def read_table(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - None
+
+        # Loads the role table from the network node
+
+        ###################################
+
+        self.table = cmds.getAttr(f"{self.node}.{TABLE_ATTR}") or ""
+        roles = json.loads(self.table)["roles"] if self.table else {}
+
+        self.indices = {role: index for role, (index, _) in roles.items()}
+        self.names = {role: name for role, (_, name) in roles.items()}
+
+    def add(self, role: str, node: str):
+
+        ###################################
+
+        # Inputs - role, str; node, str
+        # Returns - str
+
+        # Records node under role (replaces the node already recorded),
+        # the connection is queued if an edit batch is open
+
+        ###################################
+
+        return self.update({role: node})[role]
+
+    def update(self, roles: Dict[str, str]):
+
+        ###################################
+
+        # Inputs - roles, Dict[str, str]
+        # Returns - Dict[str, str]
+
+        # Records several roles at once, the table is written once. Nodes
+        # may be MObjects of an edit batch (create_node) : the table is then
+        # written once the batch is committed, with the names Maya gave.
+
+        ###################################
+
+        self._create_node()
+
+        for role, node in roles.items():
+            index = self.indices.get(role)
+            if index is None:
+                index = max(self.indices.values(), default=-1) + 1
+
+            connect_attr(node, "message", self.node, f"{MEMBERS_ATTR}[{index}]")
+
+            self.indices[role] = index
+            self.names[role] = node
+
+        batch = active_edit_batch()
+        if batch is not None:
+            batch.after_commit(self._write_table)
+        else:
+            self._write_table()
+        return roles
+
+    def get(self, role: str, default: Optional[str] = None):
+
+        ###################################
+
+        # Inputs - role, str; default, str
+        # Returns - str
+
+        # Current name of the node recorded under role, default if the role
+        # is not in the manifest
+
+        ###################################
+
+        index = self.indices.get(role)
+        if index is None:
+            return default
+
+        nodes = cmds.listConnections(f"{self.node}.{MEMBERS_ATTR}[{index}]", s=True, d=False)
+        if nodes:
+            return nodes[0]
+
+        # Still queued in an edit batch
+        return node_name(self.names[role])
+
+
+def get_manifest(name: str):
+
+    ###################################
+
+    # Inputs - name, str
+    # Returns - RigManifest
+
+    # Manifest of a limb ("arm_L", "hand_L"), read from the scene the first
+    # time and whenever its table changed there (undo, rollback)
+
+    ###################################
+
+    manifest = _manifests.get(name)
+    node = MANIFEST_PREFIX + name
+
+    if not cmds.objExists(node):
+        manifest = RigManifest(name)
+        _manifests[name] = manifest
+        return manifest
+
+    if manifest is None:
+        manifest = RigManifest(name)
+        _manifests[name] = manifest
+
+    if cmds.getAttr(f"{node}.{TABLE_ATTR}") != manifest.table:
+        manifest.read_table()
+
+    return manifest
+
+
+def rename_table(table: str, names: Dict[str, str]):
+
+    ###################################
+
+    # Inputs - table, str; names, Dict[str, str]
+    # Returns - str
+
+    # The table with its node names replaced by names, for a manifest
+    # replayed from a build plan where Maya named some nodes differently
+
+    ###################################
+
+    data = json.loads(table)
+    for role, (index, name) in data["roles"].items():
+        data["roles"][role] = [index, names.get(name, name).lstrip(":")]
+    return json.dumps(data, sort_keys=True)
+
+
+def find_manifests():
+
+    ###################################
+
+    # Inputs - None
+    # Returns - List[str]
+
+    # Names of every limb with a manifest in the scene
+
+    ###################################
+
+    nodes = cmds.ls(MANIFEST_PREFIX + "*", type="network") or []
+    return sorted(node[len(MANIFEST_PREFIX):] for node in nodes)
+
+
+def clear_manifests():
+    _manifests.clear()
@@ -1,8 +1,17 @@
 import maya.cmds as cmds
 import maya.api.OpenMaya as om
+import functools
+import math
 from library import *
+from snapshot import match_world_matrix, world_position
+from transaction import active_transaction
 from typing import *
 
+try:
+    import numpy as np
+except ImportError:  # mayapy without numpy, shapes fall back to plain tuples
+    np = None
+
 
 class NameConvention:
     joint = "JNT"
@@ -12,13 +21,186 @@ class NameConvention:
     fk = "FK"
     ik= "IK"
 
+# Compact, read-only copy of the controllers library
+if np is not None:
+    _shape_arrays = {name: np.array(points, dtype=np.float64) for name, points in controllers_library.items()}
+    for _array in _shape_arrays.values():
+        _array.flags.writeable = False
+else:
+    _shape_arrays = {name: tuple(tuple(map(float, point)) for point in points) for name, points in controllers_library.items()}
+
+SHAPE_CACHE_SIZE = 512
+
+
+@functools.lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _transformed_shape(
+    shape: str,
+    scale: float,
+    rotation: Tuple[float, float, float],
+    offset: Tuple[float, float, float],
+    mirror: str,
+):
+    points = _shape_arrays[shape]
+    matrix = euler_rotation(rotation) if any(rotation) else None
+    signs = tuple(-1.0 if axis in mirror else 1.0 for axis in "xyz")
+
+    if np is not None:
+        points = points * scale
+        if matrix is not None:
+            points = points @ np.array(matrix)
+        points = points * np.array(signs) + np.array(offset)
+        points = tuple(map(tuple, points.tolist()))
+    else:
+        if matrix is not None:
+            points = tuple(
+                tuple(sum(point[k] * scale * matrix[k][col] for k in range(3)) for col in range(3))
+                for point in points
+            )
+        else:
+            points = tuple(tuple(value * scale for value in point) for point in points)
+        points = tuple(
+            tuple(value * sign + shift for value, sign, shift in zip(point, signs, offset))
+            for point in points
+        )
+
+    knots = tuple(range(len(points)))
+
+    return points, knots
+
+
+def controller_shape(
+    shape: str,
+    scale: float = 1.0,
+    rotation: Sequence[float] = (0.0, 0.0, 0.0),
+    offset: Sequence[float] = (0.0, 0.0, 0.0),
+    mirror: str = "",
+):
+    ###################################
+
+    # Inputs - shape, str; scale, float; rotation, (x, y, z) degrees;
+    #          offset, (x, y, z); mirror, str of axes to flip (e.g. "x")
+    # Returns - (points, knots), tuples ready for cmds.curve(d=1, p=points, k=knots)
+
+    # Scales, rotates, mirrors then offsets a shape of the controllers library.
+    # Results are cached (LRU), so building many identical controls reuses them.
+
+    ###################################
+
+    if shape not in _shape_arrays:
+        raise KeyError(f"Unknown controller shape : {shape}")
+
+    return _transformed_shape(
+        shape,
+        float(scale),
+        tuple(float(value) for value in rotation),
+        tuple(float(value) for value in offset),
+        mirror.lower(),
+    )
+
+
 def scale_controller_shape(shape:str, scale:float=1.0):
 
-    scaled_positions:list[tuple[float,float,float]] = []
-    for coord in controllers_library[shape]:
-        scaled_positions.append((coord[0]*scale,coord[1]*scale,coord[2]*scale))
+    return list(controller_shape(shape, scale)[0])
+
+
+class ControlFactory:
+
+    ###################################
+
+    # Builds each (shape, size, color, line width) controller once per build,
+    # as a hidden template, then creates every other control by duplicating it.
+    # A duplicate keeps the CVs, color and line width of its template, so a
+    # control costs 2 cmds calls instead of a curve creation plus ~8 setAttr.
+    # The templates are deleted when the outermost BuildTransaction ends,
+    # they are never left in the rig.
+
+    ###################################
+
+    TEMPLATES_GROUP = "grp_controls_templates"
+
+    def __init__(self):
+        self.templates: Dict[Tuple[Any, ...], str] = {}
+
+    def _build_template(self, key: Tuple[Any, ...]):
+
+        shape, size, color, line_width = key
+        name = f"template_{shape}_{len(self.templates)}"
+
+        transaction = active_transaction()
+        if transaction is not None:
+            transaction.on_exit(self.clear)
+
+        if not cmds.objExists(self.TEMPLATES_GROUP):
+            cmds.group(n=self.TEMPLATES_GROUP, em=True, w=True)
+            cmds.setAttr(self.TEMPLATES_GROUP + ".visibility", 0)
+
+        if shape == "circle":
+            template = cmds.circle(c=(0, 0, 0), nr=(1, 0, 0), sw=360, r=size, s=8, ch=False, n=name)[0]
+        else:
+            points, knots = controller_shape(shape, size)
+            template = cmds.curve(d=1, p=points, k=knots, n=name)
+
+        template_shape = cmds.listRelatives(template, shapes=True)[0]
+        set_lineWidth(template_shape, line_width)
+        set_appearance(template_shape, color[0], color[1], color[2])
+
+        cmds.parent(template, self.TEMPLATES_GROUP)
+
+        self.templates[key] = template
+        return template
+
+    def create(
+        self,
+        name: str,
+        shape: str,
+        color: Sequence[float],
+        line_width: float = 2,
+        size: float = 1.0,
+        offset: Optional[str] = None,
+    ):
+
+        ###################################
+
+        # Inputs - name, str; shape, str ("circle" or a controllers library shape);
+        #          color, (r, g, b); line_width, float; size, float;
+        #          offset, str, name of an offset group to create above the control
+        # Returns - str, the control (and its offset group if requested)
+
+        ###################################
+
+        key = (shape, float(size), tuple(color), float(line_width))
+        template = self.templates.get(key) or self._build_template(key)
+
+        try:
+            ctrl = cmds.duplicate(template, n=name)[0]
+        except (ValueError, RuntimeError):
+            # The template was deleted (new scene, clean up), build it again
+            template = self._build_template(key)
+            ctrl = cmds.duplicate(template, n=name)[0]
+
+        if offset is None:
+            return cmds.parent(ctrl, w=True)[0]
+
+        return ctrl, cmds.group(ctrl, n=offset, w=True)
+
+    def clear(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - None
+
+        # Deletes the templates from the scene
+
+        ###################################
+
+        if cmds.objExists(self.TEMPLATES_GROUP):
+            cmds.delete(self.TEMPLATES_GROUP)
+        self.templates = {}
+
+
+control_factory = ControlFactory()
 
-    return scaled_positions
 
 def create_control_fk(jnt: str, side: str, radius: int = 8):
     """
@@ -31,30 +213,21 @@ def create_control_fk(jnt: str, side: str, radius: int = 8):
     @radius: (Optional) Radius of the FK control circle. Default is 8.
     """
 
-    ctrl = cmds.circle(
-        c=(0, 0, 0),
-        nr=(1, 0, 0),
-        sw=360,
-        r=radius,
-        s=8,
-        ch=False,
-        n=jnt.replace(NameConvention.main, NameConvention.controller + "_" + NameConvention.fk),
-    )
-    shape = cmds.listRelatives(ctrl, shapes=True)[0]
-
-    # Creation of offset group
-    offset = cmds.group(ctrl, n=jnt.replace(NameConvention.main, "offset_"+ NameConvention.fk))
-
-    # Modification of controlers appearance
-    set_lineWidth(ctrl[0], 2)
-
     colors = {"L": (0, 0, 1), "R": (1, 0, 0)}
     if side in colors:
         color = colors[side]
     else:
         color = (1, 1, 0)
 
-    set_appearance(shape, color[0], color[1], color[2])
+    # Control and offset group, duplicated from the session template
+    ctrl, offset = control_factory.create(
+        jnt.replace(NameConvention.main, NameConvention.controller + "_" + NameConvention.fk),
+        "circle",
+        color,
+        line_width=2,
+        size=radius,
+        offset=jnt.replace(NameConvention.main, "offset_"+ NameConvention.fk),
+    )
 
     cmds.matchTransform(offset, jnt)
 
@@ -73,9 +246,9 @@ def calculate_pole_vector_position(
     #   tuple: A 3D position in world-space (x, y, z) representing the calculated
     #          position for the pole vector.
 
-    shoulder_pos = om.MVector(cmds.xform(root_joint, q=True, ws=True, t=True))
-    elbow_pos = om.MVector(cmds.xform(middle_joint, q=True, ws=True, t=True))
-    wrist_pos = om.MVector(cmds.xform(end_joint, q=True, ws=True, t=True))
+    shoulder_pos = om.MVector(world_position(root_joint))
+    elbow_pos = om.MVector(world_position(middle_joint))
+    wrist_pos = om.MVector(world_position(end_joint))
 
     # Calculate midpoint
     midpoint = (shoulder_pos + wrist_pos) * 0.5
@@ -114,22 +287,6 @@ def create_control_ik(
 
     ###################################
 
-    end = cmds.curve(
-        d=1,
-        p=scale_controller_shape("box", scale),
-        k=list(range(len((controllers_library["box"])))),
-        n=end_control,
-    )
-    shape = cmds.listRelatives(end, shapes=True)[0]
-
-    pole = cmds.curve(
-        d=1,
-        p=scale_controller_shape("joint", scale),
-        k=list(range(len((controllers_library["joint"])))),
-        n=pole_control,
-    )
-    shape_pole = cmds.listRelatives(pole, shapes=True)[0]
-
     # Colors according to chart
     colors = {"L": (0, 0.6, 1), "R": (1, 0, 0)}
     if side in colors:
@@ -137,36 +294,28 @@ def create_control_ik(
     else:
         color = (1, 1, 0)
 
-    # Modification of controlers appearance
-    set_appearance(shape, color[0], color[1], color[2])
-    set_appearance(shape_pole, color[0], color[1], color[2])
-
-    set_lineWidth(shape, 1.5)
-    set_lineWidth(shape_pole, 1.5)
+    # Controls and offset groups, duplicated from the session templates
+    end, offset_end = control_factory.create(
+        end_control, "box", color, line_width=1.5, size=scale,
+        offset=end_control.replace(NameConvention.controller, "offset"),
+    )
+    pole, offset_pole = control_factory.create(
+        pole_control, "joint", color, line_width=1.5, size=scale,
+        offset=pole_control.replace(NameConvention.controller, "offset"),
+    )
 
     if is_quad:
 
         hock_joint = cmds.listRelatives(end_joint, p=True)
 
-        hock = cmds.curve(
-            d=1,
-            p=scale_controller_shape("box", scale),
-            k=list(range(len((controllers_library["box"])))),
-            n=hock_control,
+        hock, offset_hock = control_factory.create(
+            hock_control, "box", color, line_width=1.5, size=scale,
+            offset=hock_control.replace(NameConvention.controller, "offset"),
         )
-        shape_hock = cmds.listRelatives(hock, shapes=True)[0]
-
-        set_appearance(shape_hock, color[0], color[1], color[2])
-        set_lineWidth(shape_hock, 1.5)
-
-        offset_hock = cmds.group(hock, n=hock.replace(NameConvention.controller, "offset"))
         cmds.matchTransform(offset_hock, hock_joint, px=1, py=1, pz=1, rx=0, ry=0, rz=0)
 
-    # Creation of offset groups
-    offset_end = cmds.group(end, n=end_control.replace(NameConvention.controller, "offset"))
     cmds.matchTransform(offset_end, end_joint, pos=True, rot=False, piv=True)
 
-    offset_pole = cmds.group(pole, n=pole_control.replace(NameConvention.controller, "offset"))
     position = calculate_pole_vector_position(
         joint_hierarchy[0], joint_hierarchy[1], joint_hierarchy[2], 5*scale)
 
@@ -175,20 +324,36 @@ def create_control_ik(
     cmds.setAttr(offset_pole + ".translateZ", position[2])
 
 
-def parent_control_fk(joints_list: List[str], index: int):
+def parent_control_fk(joints_list: List[str], index: int, names: Optional[Mapping[str, Dict[str, str]]] = None):
 
     # Parents a controler's offset group to the correct controler
-    offset = joints_list[index].replace(NameConvention.main, "offset_" + NameConvention.fk)
+    # names, the limb name table (LimbNames), avoids deriving the names again
+    if names is not None:
+        offset = names[joints_list[index]]["fk_offset"]
+    else:
+        offset = joints_list[index].replace(NameConvention.main, "offset_" + NameConvention.fk)
     if index > 0:
-        offset = joints_list[index].replace(NameConvention.main, "offset_"+NameConvention.fk)
-        ctrl_parent = joints_list[index - 1].replace(NameConvention.main, NameConvention.controller+"_"+NameConvention.fk)
+        if names is not None:
+            ctrl_parent = names[joints_list[index - 1]]["fk_control"]
+        else:
+            ctrl_parent = joints_list[index - 1].replace(NameConvention.main, NameConvention.controller+"_"+NameConvention.fk)
         cmds.parent(offset, ctrl_parent)
     else:
         return offset
 
 
 def stretch(
-    joint_root, joint_hierarchy, suffix_name, ik_control, switch_ctrl, is_biped=True
+    joint_root,
+    joint_hierarchy,
+    suffix_name,
+    ik_control,
+    switch_ctrl,
+    is_biped=True,
+    end_index: Optional[int] = None,
+    squash: bool = False,
+    volume: bool = False,
+    main_joints: bool = True,
+    solver: Optional[str] = None,
 ):
     
      ###################################
@@ -197,156 +362,125 @@ def stretch(
     #   joint_root: Root joint of the chain for which the stretch functionality will be set up.
     #   joint_hierarchy: List of joints in the hierarchy for stretch functionality.
     #   suffix_name: Suffix to identify this stretch setup uniquely.
-    #   ik_control: Control object for the IK system (used for parenting locators).
+    #   ik_control: Control object for the IK system, the end of the measured distance.
     #   switch_ctrl: Control object with the stretch attribute to toggle/stretch blending.
     #   is_biped: (Optional) Boolean flag indicating if the setup is for a bipedal character.
     #             Defaults to True. Determines the last joint index for the hierarchy.
-
-    # Returns: None
+    #   end_index: (Optional) Index of the IK end joint in joint_hierarchy, for chains
+    #              of any length. Overrides is_biped.
+    #   squash: (Optional) Also shrinks the joints when the control comes closer than the rest length.
+    #   volume: (Optional) Scales Y and Z by 1 / sqrt(stretch) to keep the volume.
+    #   main_joints: (Optional) Also drives the SK joints. Off when the SK joints are blended
+    #                with matrices (LimbConfig.fkik_blend), the IK joints scale reaches them
+    #                through the blendMatrix and the length is measured from the IK root.
+    #   solver: (Optional) limbSolver node of the limb (limb_solver.py). It measures and
+    #           blends the stretch itself, only its inputs and outputs are connected.
+
+    # Returns: Dict[str, str], the stretch nodes by manifest role (stretch.distance, stretch.factor,
+    #          stretch.max, stretch.blend, stretch.volume), empty with a solver
 
     # Description:
-    #   Sets up a stretch functionality for a joint hierarchy. This includes creating
-    #   distance measurement nodes, locators, and utility nodes (like floatMath, condition,
-    #   and blendColors) to drive the joint scaling based on the stretch factor.
+    #   Sets up a stretch functionality for a joint hierarchy. The distance between
+    #   the root joint and the IK control is measured by a distanceBetween node fed
+    #   by their matrices, divided by the rest length and blended by the stretch
+    #   attribute before driving the joints scale. Every node is named explicitly,
+    #   nothing is selected and nothing is read back from the scene.
 
+    if end_index is None:
+        end_index = 2 if is_biped else 3
 
+    stretched_joints = joint_hierarchy[:end_index]
 
-    # Set up a measure distance node
-    # Start Point is the root joint, end point the third joint in the hierachy
-    start_point = cmds.xform(joint_root, query=True, translation=True, ws=True)
-    if is_biped:
-        last_joint_index = 2
-    else:
-        last_joint_index = 3
-
-    end_point = cmds.xform(
-        joint_hierarchy[last_joint_index], query=True, translation=True, ws=True
-    )
-    distance_node = cmds.distanceDimension(sp=start_point, ep=end_point)
+    # Rest length, measured on the skeleton snapshot
+    base_distance = math.dist(world_position(joint_root), world_position(joint_hierarchy[end_index]))
 
-    cmds.select(distance_node.replace("Shape", ""))
-    cmds.rename("distance_" + suffix_name)
-    distance_node = "distance_" + suffix_name
+    if not cmds.attributeQuery("stretch", ex=True, n=switch_ctrl):
 
-    cmds.select(cl=1)
-
-    # Rename the newly created locators and rename them
-    if cmds.objExists("locator1"):
-        set_attr("locator1", "visibility", 0)
-        if cmds.xform("locator1", query=True, translation=True, ws=True) == end_point:
-            # If the locator is on the end joint, parent it to the IK control
-            cmds.parent("locator1", ik_control)
-            cmds.select("locator1")
-            cmds.rename("loc_distance_end_" + suffix_name)
-
-        elif (
-            cmds.xform("locator1", query=True, translation=True, ws=True) == start_point
-        ):
-            # If the locator is on the root joint, constraint it to the root joint
-            constraint(joint_root, "locator1", orient_value=False)
-            cmds.select("locator1")
-            cmds.rename("loc_distance_start_" + suffix_name)
-
-    if cmds.objExists("locator2"):
-        set_attr("locator2", "visibility", 0)
-        if cmds.xform("locator2", query=True, translation=True, ws=True) == end_point:
-            # If the locator is on the end joint, parent it to the IK control
-            cmds.parent("locator2", ik_control)
-            cmds.select("locator2")
-            cmds.rename("loc_distance_end_" + suffix_name)
-
-        elif (
-            cmds.xform("locator2", query=True, translation=True, ws=True) == start_point
-        ):
-            # If the locator is on the root joint, constraint it to the root joint
-            constraint(joint_root, "locator2", orient_value=False)
-            cmds.select("locator2")
-            cmds.rename("loc_distance_start_" + suffix_name)
-
-    cmds.select(cl=1)
-
-    # Create a float Math Node, a condition Node and a blendColors Node
-
-    base_distance = cmds.getAttr(distance_node + ".distance")
-    condition_node = "condition_stretch_" + suffix_name
-    cmds.shadingNode("condition", n=condition_node, au=1)
+        cmds.warning("No Stretch Attribute found, creating one")
+        cmds.addAttr(switch_ctrl, ln="stretch", at="float", min=0, max=1, k=True)
 
+    distance_node = "distance_" + suffix_name
     floatMath_node = "floatMath_stretch_" + suffix_name
-    cmds.shadingNode("floatMath", n=floatMath_node, au=1)
-
+    max_node = "floatMath_stretch_max_" + suffix_name
     blendColors_node = "blendColors_stretch_" + suffix_name
-    cmds.shadingNode("blendColors", n=blendColors_node, au=1)
-
-    
-    with suppress_warnings():
-
-        # Float Math Node
-        cmds.connectAttr(
-            distance_node + ".distance",
-            floatMath_node + ".floatA",
-            f=1,
-        )
+    volume_node = "floatMath_stretch_volume_" + suffix_name
+
+    # A matrix blended SK root has no translate, its position is in offsetParentMatrix
+    measured_root = joint_root if main_joints else joint_root.replace(NameConvention.main, NameConvention.ik)
+
+    if solver is not None:
+        with edit_batch("stretch"):
+            connect_attr(measured_root, "translate", solver, "rootTranslate")
+            connect_attr(measured_root, "parentMatrix[0]", solver, "rootParentMatrix")
+            connect_attr(ik_control, "worldMatrix[0]", solver, "endMatrix")
+            connect_attr(switch_ctrl, "stretch", solver, "stretch")
+            set_attr(solver, "restLength", base_distance)
+            set_attr(solver, "squash", squash)
+
+            for jnt in stretched_joints:
+                ik_jnt = jnt.replace(NameConvention.main, NameConvention.ik)
+                connect_attr(solver, "stretchFactor", ik_jnt, "scaleX")
+                if volume:
+                    connect_attr(solver, "volumeFactor", ik_jnt, "scaleY")
+                    connect_attr(solver, "volumeFactor", ik_jnt, "scaleZ")
+        return {}
+
+    nodes = {}
+
+    with edit_batch("stretch"):
+
+        # Root position from its translate and parent matrix : the root own scale
+        # is driven by the stretch, its world matrix would make a cycle
+        distance_node = nodes["stretch.distance"] = create_node("distanceBetween", distance_node)
+        connect_attr(measured_root, "translate", distance_node, "point1")
+        connect_attr(measured_root, "parentMatrix[0]", distance_node, "inMatrix1")
+        connect_attr(ik_control, "worldMatrix[0]", distance_node, "inMatrix2")
+
+        # Stretch factor : distance / rest length
+        floatMath_node = nodes["stretch.factor"] = create_node("floatMath", floatMath_node)
         set_attr(floatMath_node, "operation", 3)
         set_attr(floatMath_node, "floatB", base_distance)
-
-        # Condition Node
-        cmds.connectAttr(
-            distance_node + ".distance",
-            condition_node + ".firstTerm",
-            f=1,
-        )
-
-        cmds.connectAttr(
-            floatMath_node + ".outFloat",
-            condition_node + ".colorIfTrue.colorIfTrueR",
-            f=1
-        )
-
-        set_attr(condition_node, "operation", 2)
-        set_attr(condition_node, "secondTerm", base_distance)
-
-        # BlendColors Node
-        cmds.connectAttr(
-            condition_node + ".outColor.outColorR",
-            "blendColors_stretch_" + suffix_name + ".color1.color1R",
-            f=1,
-        )
-
-    if not cmds.attributeQuery("stretch", ex=True, n=switch_ctrl):
-
-        cmds.warning("No Stretch Attribute found, creating one")
-        cmds.addAttr(switch_ctrl, ln="stretch", at="float", min=0, max=1, k=True)
-
-    cmds.connectAttr(
-        switch_ctrl + ".stretch",
-        "blendColors_stretch_" + suffix_name + ".blender",
-        f=1,
-    )
-    set_attr("blendColors_stretch_" + suffix_name, "color2.color2R", 1)
-
-    # Connect the final output to scale X of the SK skeleton (except the last joint)
-
-    for jnt in joint_hierarchy:
-
-        if not jnt == joint_hierarchy[last_joint_index]:
-            cmds.connectAttr(
-                "blendColors_stretch_" + suffix_name + ".output.outputR",
-                jnt + ".scaleX",
-                f=1
-            )
-            cmds.connectAttr(
-                "blendColors_stretch_" + suffix_name + ".output.outputR",
-                jnt.replace(NameConvention.main, NameConvention.ik) + ".scaleX",
-                f=1
-            )
-        else:
-            break
-
-    set_attr(distance_node, "visibility", 0)
+        connect_attr(distance_node, "distance", floatMath_node, "floatA")
+
+        stretch_output = (floatMath_node, "outFloat")
+
+        # Without squash, never below 1
+        if not squash:
+            max_node = nodes["stretch.max"] = create_node("floatMath", max_node)
+            set_attr(max_node, "operation", 5)
+            set_attr(max_node, "floatB", 1.0)
+            connect_attr(floatMath_node, "outFloat", max_node, "floatA")
+            stretch_output = (max_node, "outFloat")
+
+        # Blended with 1 by the stretch attribute
+        blendColors_node = nodes["stretch.blend"] = create_node("blendColors", blendColors_node)
+        connect_attr(*stretch_output, blendColors_node, "color1R")
+        set_attr(blendColors_node, "color2R", 1.0)
+        connect_attr(switch_ctrl, "stretch", blendColors_node, "blender")
+
+        if volume:
+            volume_node = nodes["stretch.volume"] = create_node("floatMath", volume_node)
+            set_attr(volume_node, "operation", 6)
+            set_attr(volume_node, "floatB", -0.5)
+            connect_attr(blendColors_node, "outputR", volume_node, "floatA")
+
+        # Connect the final output to the scale of the SK and IK joints (except the last joint)
+        for jnt in stretched_joints:
+            driven_joints = [jnt.replace(NameConvention.main, NameConvention.ik)]
+            if main_joints:
+                driven_joints.insert(0, jnt)
+            for driven in driven_joints:
+                connect_attr(blendColors_node, "outputR", driven, "scaleX")
+                if volume:
+                    connect_attr(volume_node, "outFloat", driven, "scaleY")
+                    connect_attr(volume_node, "outFloat", driven, "scaleZ")
+
+    # The names Maya gave, once the batch is committed
+    return {role: node_name(node) for role, node in nodes.items()}
 
 
 def add_unbreakable_knees(
-    pole_vector_ctrl: str, hierarchy: List[str], root_parent: str
+    pole_vector_ctrl: str, hierarchy: List[str], root_parent: str, ik_control: Optional[str] = None
 ):
     
     ###################################
@@ -355,6 +489,8 @@ def add_unbreakable_knees(
     #   pole_vector_ctrl: The pole vector control for the IK setup.
     #   hierarchy: List of joints in the hierarchy (e.g., leg chain: hip, knee, ankle).
     #   root_parent: Name of the parent node for the setup (e.g., pelvis or root).
+    #   ik_control: (Optional) IK control of the leg, from the limb manifest. Defaults to
+    #               the default name of the leg IK control.
 
     # Returns: None
 
@@ -367,7 +503,7 @@ def add_unbreakable_knees(
 
     pole_grp = cmds.group(pole_vector_ctrl, n=f"grp_pole_flip_{side}")
 
-    ankle_ctrl = f"{NameConvention.controller}_{NameConvention.ik}_leg_" + side
+    ankle_ctrl = ik_control or f"{NameConvention.controller}_{NameConvention.ik}_leg_" + side
 
     for chain in ["top", "bot"]:
 
@@ -377,8 +513,8 @@ def add_unbreakable_knees(
         new_child_joint_name = f"{NameConvention.joint}_{chain}_knee_flip_end_{side}"
         ik_handle = f"ikHandle_{chain}_knee_flip_{side}"
 
-        cmds.joint(n=new_root_joint_name, rad=0.3)
-        cmds.joint(n=new_child_joint_name, rad=0.3)
+        create_joint(new_root_joint_name, radius=0.3)
+        create_joint(new_child_joint_name, new_root_joint_name, radius=0.3)
 
         root_index, child_index = 0, 2
 
@@ -388,10 +524,10 @@ def add_unbreakable_knees(
                 0,
             )  # Switch the root joint of created chain to reverse the direction
 
-        cmds.matchTransform(new_root_joint_name, hierarchy[root_index])
+        match_world_matrix(new_root_joint_name, hierarchy[root_index])
         cmds.makeIdentity(new_root_joint_name, a=1, t=0, r=1, s=0)
 
-        cmds.matchTransform(new_child_joint_name, hierarchy[child_index])
+        match_world_matrix(new_child_joint_name, hierarchy[child_index])
         cmds.makeIdentity(new_child_joint_name, a=1, t=0, r=1, s=0)
 
         # Joints Locators Creation
@@ -0,0 +1,293 @@
+import maya.cmds as cmds
+from typing import *
+
+from library import ribbon_limb
+from modules import NameConvention
+from transaction import active_transaction
+
+
+###################################
+
+# Name table of a limb.
+# Every name a limb build creates (FK / IK joints, controls, offsets,
+# pairBlends, handles, utility nodes...) is derived once from the SK joints
+# and stored per SK joint and per build stage. The whole set is checked
+# against the scene with one ls before building : Maya renames a node whose
+# name is taken, which would leave a half built rig behind.
+
+# names = LimbNames(["SK_shoulder_L", "SK_elbow_L", "SK_wrist_L"], "arm_L", "L")
+# names["SK_elbow_L"]["fk_control"]    -> "CTRL_FK_elbow_L"
+# names.check("duplicate_hierarchy", "pair_blend")
+
+# A stage is checked once per build transaction : outside of a build, or
+# in the next one, the ls runs again.
+
+###################################
+
+
+STAGES = [
+    "duplicate_hierarchy",
+    "pair_blend",
+    "biped_rig",
+    "stretch",
+    "unbreakable_knees",
+    "foot_roll",
+    "add_fingers_controls",
+    "create_bendy_limb",
+]
+
+FINGER_ATTRIBUTES = {"index": ("curl", "spread", "orient"), "middle": ("curl", "spread", "orient"),
+                     "ring": ("curl", "spread", "orient"), "pinkie": ("curl", "spread", "orient"), "thumb": ("curl",)}
+
+# Follicles along a bendy ribbon (8 patches)
+BENDY_FOLLICLES = 9
+BENDY_PARTS = ["root", "upper", "middle", "lower", "end"]
+
+
+def joint_names(sk_joint: str):
+
+    ###################################
+
+    # Inputs - sk_joint, str
+    # Returns - Dict[str, str]
+
+    # Every name derived from one SK joint
+
+    ###################################
+
+    fk = NameConvention.fk
+    controller = NameConvention.controller
+
+    return {
+        "fk": sk_joint.replace(NameConvention.main, fk),
+        "ik": sk_joint.replace(NameConvention.main, NameConvention.ik),
+        "fk_control": sk_joint.replace(NameConvention.main, f"{controller}_{fk}"),
+        "fk_offset": sk_joint.replace(NameConvention.main, "offset_" + fk),
+        "pair_blend": "pairBlend_" + sk_joint.replace(NameConvention.main, ""),
+        "blend_matrix": "blendMatrix_" + sk_joint.replace(NameConvention.main, ""),
+        "grp1": sk_joint.replace(NameConvention.main, "GRP1"),
+        "grp2": sk_joint.replace(NameConvention.main, "GRP2"),
+    }
+
+
+def float_math_name(finger: str, attribute: str, side: str):
+    # floatMath_index_curl_L, drives one finger attribute of the switch
+    return f"floatMath_{finger}_{attribute}_{side}"
+
+
+def bendy_names(limb_name: str, side: str):
+
+    ###################################
+
+    # Inputs - limb_name, str, BipedLimb.Arm or BipedLimb.Leg (library.ribbon_limb); side, str
+    # Returns - List[str]
+
+    # Every name bendy_limbs.create_bendy_limb gives, for the ribbon of
+    # limb_name on side
+
+    ###################################
+
+    base_name = f"{limb_name}_bendy"
+    names = [
+        f"nurbs_{limb_name}_{side}",
+        f"nurbs_{limb_name}_sine_{side}",
+        f"nurbs_{limb_name}_twist_{side}",
+        f"bs_{base_name}_{side}",
+        f"sine_{base_name}_{side}",
+        f"twist_{base_name}_{side}",
+        f"grp_fol_bendy_{limb_name}_{side}",
+        f"grp_misc_{base_name}_{side}",
+        f"grp_deforms_{base_name}_{side}",
+        f"GRP_{base_name}_{side}",
+    ]
+
+    for i in range(1, BENDY_FOLLICLES + 1):
+        names += [
+            f"fol_bendy_{limb_name}_{i}_{side}",
+            f"fol_shape_bendy_{limb_name}_{i}_{side}",
+            f"_bendy_{limb_name}_{i}_{side}",
+        ]
+
+    for i, part in enumerate(BENDY_PARTS):
+        joint = f"{NameConvention.joint}_{part}_{base_name}_{side}"
+        names += [joint, joint.replace(NameConvention.joint, "offset")]
+        if 0 < i < 4:
+            names.append(joint.replace(NameConvention.joint, NameConvention.controller))
+        names.append(joint.replace(NameConvention.joint, "aim_point" if i in (0, 2) else "aim_offset"))
+
+    # The end joint has no aim group
+    names.remove(f"aim_offset_end_{base_name}_{side}")
+    return names
+
+
+def check_names(owner: str, names: List[str]):
+
+    ###################################
+
+    # Inputs - owner, str, limb the names are for; names, List[str]
+    # Returns - None
+
+    # Raises if one of names is already used in the scene, with one ls
+
+    ###################################
+
+    taken = (cmds.ls(names) or []) if names else []
+    if taken:
+        raise ValueError(f"{owner} : these names are already used in the scene : {', '.join(taken)}")
+
+
+class LimbNames:
+
+    def __init__(
+        self,
+        limb_joints: List[str],
+        suffix_name: str,
+        side: str,
+        fingers: Optional[Dict[str, List[str]]] = None,
+        fkik_blend: str = "pairBlend",
+    ):
+        self.suffix_name = suffix_name
+        self.side = side
+        self.fkik_blend = fkik_blend
+
+        self.joints: Dict[str, Dict[str, str]] = {}
+        self.stages: Dict[str, List[str]] = {stage: [] for stage in STAGES}
+        self.float_maths: Dict[str, Dict[str, str]] = {}
+
+        # Every stage checked, and the stages checked in the current build transaction
+        self.checked: Set[str] = set()
+        self._checked_in: Set[str] = set()
+        self._transaction = None
+
+        for sk_joint in limb_joints:
+            self.joints[sk_joint] = joint_names(sk_joint)
+
+        controller, ik = NameConvention.controller, NameConvention.ik
+
+        self.ik_control = f"{controller}_{ik}_{suffix_name}"
+        self.pole_control = f"{controller}_pole_{suffix_name}"
+        self.ik_handle = "IkHandle_" + suffix_name
+        self.rig_group = "grp_" + suffix_name
+        self.solver = "limbSolver_" + suffix_name
+
+        if limb_joints:
+            self._limb_stages(limb_joints)
+
+        if fingers:
+            self._fingers_stage(fingers)
+
+    def _limb_stages(self, limb_joints: List[str]):
+
+        suffix_name, side = self.suffix_name, self.side
+        joints = [self.joints[sk_joint] for sk_joint in limb_joints]
+
+        self.stages["duplicate_hierarchy"] = [names["fk"] for names in joints] + [names["ik"] for names in joints]
+
+        if self.fkik_blend == "solver":
+            self.stages["pair_blend"] = [self.solver]
+        else:
+            blend = "blend_matrix" if self.fkik_blend == "matrix" else "pair_blend"
+            self.stages["pair_blend"] = [names[blend] for names in joints]
+
+        self.stages["biped_rig"] = (
+            [self.rig_group, self.ik_handle, suffix_name + "_fkik_reverse"]
+            + [names["fk_control"] for names in joints]
+            + [names["fk_offset"] for names in joints]
+            + [self.ik_control, self.pole_control]
+            + [name.replace(NameConvention.controller, "offset") for name in (self.ik_control, self.pole_control)]
+        )
+
+        # The limb solver computes the stretch itself
+        if self.fkik_blend != "solver":
+            self.stages["stretch"] = [
+                "distance_" + suffix_name,
+                "floatMath_stretch_" + suffix_name,
+                "floatMath_stretch_max_" + suffix_name,
+                "floatMath_stretch_volume_" + suffix_name,
+                "blendColors_stretch_" + suffix_name,
+            ]
+
+        self.stages["unbreakable_knees"] = [f"grp_pole_flip_{side}", f"grp_knee_{side}"]
+        for chain in ["top", "bot"]:
+            self.stages["unbreakable_knees"] += [
+                f"{NameConvention.joint}_{chain}_knee_flip_{side}",
+                f"{NameConvention.joint}_{chain}_knee_flip_end_{side}",
+                f"ikHandle_{chain}_knee_flip_{side}",
+                f"loc_{chain}_knee_flip_{side}",
+                f"loc_{chain}_knee_{side}",
+            ]
+
+        self.stages["foot_roll"] = ["IkHandle_ball_" + side, "IkHandle_toe_" + side]
+
+        self.stages["create_bendy_limb"] = bendy_names(ribbon_limb(suffix_name.rpartition("_")[0]), side)
+
+    def _fingers_stage(self, fingers: Dict[str, List[str]]):
+
+        names = ["grp_rig_hand_" + self.side]
+
+        # The switch attributes drive every finger, found in the skeleton or not
+        for finger, attributes in FINGER_ATTRIBUTES.items():
+            self.float_maths[finger] = {attribute: float_math_name(finger, attribute, self.side) for attribute in attributes}
+            names += self.float_maths[finger].values()
+
+        for finger, phalanges in fingers.items():
+
+            for phalange in phalanges:
+                if not phalange:
+                    continue
+                self.joints[phalange] = joint_names(phalange)
+                names += [self.joints[phalange][kind] for kind in ("fk_control", "fk_offset", "grp1", "grp2")]
+
+        self.stages["add_fingers_controls"] = names
+
+    def __getitem__(self, sk_joint: str):
+        return self.joints[sk_joint]
+
+    def __contains__(self, sk_joint: str):
+        return sk_joint in self.joints
+
+    def collisions(self, *stages: str):
+
+        ###################################
+
+        # Inputs - stages, str, every stage if none given
+        # Returns - List[str]
+
+        # Names of the given stages that are already taken in the scene, with one ls
+
+        ###################################
+
+        names = [name for stage in (stages or STAGES) for name in self.stages[stage]]
+        if not names:
+            return []
+
+        return cmds.ls(names) or []
+
+    def check(self, *stages: str):
+
+        ###################################
+
+        # Inputs - stages, str, every stage if none given
+        # Returns - None
+
+        # Raises before anything is built if a name of the given stages is
+        # taken. Stages already checked in the same build transaction are
+        # not checked again.
+
+        ###################################
+
+        transaction = active_transaction()
+        transaction = transaction.outermost if transaction is not None else None
+        if transaction is None or transaction is not self._transaction:
+            self._transaction = transaction
+            self._checked_in = set()
+
+        stages = tuple(stage for stage in (stages or STAGES) if stage not in self._checked_in)
+        if not stages:
+            return
+
+        check_names(self.suffix_name, [name for stage in stages for name in self.stages[stage]])
+
+        self.checked.update(stages)
+        if transaction is not None:
+            self._checked_in.update(stages)
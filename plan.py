@@ -0,0 +1,763 @@
+import difflib
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+from typing import *
+
+import scene_graph
+from config import LimbConfig
+from edits import set_batching
+from library import keep_selection
+from manifest import TABLE_ATTR, rename_table
+from limb_solver import NODE_TYPE as SOLVER_NODE_TYPE, load_plugin
+from modules import control_factory
+from performance import performance_mode
+from preflight import preflight
+from scheduler import BuildJob
+from transaction import BuildTransaction
+
+
+###################################
+
+# Build plans.
+# A limb is first compiled into a plan : the ordered list of every scene
+# edit its build makes (node creations, parenting, connections, attribute
+# values...), stored as compact PlanStep records. The executor then applies
+# the plan to the scene, without any of the planning work (hierarchy
+# parsing, names, snapshot, preflight).
+
+# plan = compile_plan(config)
+# plan.save("arm_L.plan")
+# execute_plan(load_plan("arm_L.plan"))      -> same rig as build_limb(config)
+# plan.diff(other_plan)                      -> the steps that changed
+
+# The plan is compiled by running the builders on an in-memory copy of the
+# skeleton (scene_graph.py), with their cmds recorded : the builders stay
+# the single description of the rig. The names Maya gives at replay (e.g.
+# unnamed nodes) are mapped onto the recorded ones.
+
+# The in-memory scene is the compile backend. In Maya, record_plan records
+# the cmds of a real build instead, and validate_plan checks a compiled
+# plan against it : validate_plan(config) -> [] when both are the same.
+
+###################################
+
+
+PLAN_VERSION = 1
+
+# Commands that do not change the scene, or only the session (selection, undo, refresh)
+READ_COMMANDS = {
+    "about", "attributeQuery", "evalDeferred", "evaluationManager", "getAttr", "isConnected", "listAttr",
+    "listConnections", "listRelatives", "ls", "nodeType", "objExists", "objectType", "pluginInfo", "refresh",
+    "scriptEditorInfo", "select", "undoInfo", "warning",
+}
+
+# User attributes copied with their value, string and enum attributes aside
+NUMBER_TYPES = ("bool", "byte", "char", "short", "long", "float", "double", "doubleAngle", "doubleLinear", "time")
+
+# Modules of the tool keeping maya.cmds while compiling, limb_solver loads its plugin in Maya
+NOT_COMPILED = ("limb_solver", "plan", "rebuild", "scene_graph", "tracer")
+
+TOOL_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class PlanStep:
+
+    __slots__ = ("command", "args", "kwargs", "result", "stage")
+
+    def __init__(self, command: str, args: Tuple[Any, ...], kwargs: Tuple[Tuple[str, Any], ...], result: Any, stage: str):
+        self.command = command
+        self.args = args
+        self.kwargs = kwargs
+        self.result = result
+        self.stage = stage
+
+    def key(self):
+        return (self.command, self.args, self.kwargs)
+
+    def to_list(self):
+        return [self.command, self.args, self.kwargs, self.result, self.stage]
+
+    @classmethod
+    def from_list(cls, data: List[Any]):
+        command, args, kwargs, result, stage = data
+        return cls(command, _plain(args), tuple((key, _plain(value)) for key, value in kwargs), _plain(result), stage)
+
+    def __repr__(self):
+        arguments = [repr(arg) for arg in self.args] + [f"{key}={value!r}" for key, value in self.kwargs]
+        return f"{self.command}({', '.join(arguments)})"
+
+
+def _plain(value: Any):
+
+    # Hashable, JSON friendly values : lists (and MMatrix, MVector...) become tuples
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value
+    if isinstance(value, (list, tuple)) or hasattr(value, "__iter__"):
+        return tuple(_plain(item) for item in value)
+    return float(value)
+
+
+class BuildPlan:
+
+    def __init__(self, name: str, config: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.config = config or {}
+        self.steps: List[PlanStep] = []
+
+        # Nodes the plan leaves in the scene, and the names the builders check before building (names.py)
+        self.created: List[str] = []
+        self.reserved: List[str] = []
+
+        # Every name the plan gives a node, temporary nodes included
+        self.nodes: List[str] = []
+
+        self._digest: Optional[str] = None
+
+    def __len__(self):
+        return len(self.steps)
+
+    def stages(self):
+        return list(dict.fromkeys(step.stage for step in self.steps))
+
+    def uses_node_type(self, typ: str):
+        return any(step.command in ("createNode", "shadingNode") and step.args[:1] == (typ,) for step in self.steps)
+
+    @property
+    def digest(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - str
+
+        # Hash of every step, two plans building the same rig have the same digest
+
+        ###################################
+
+        if self._digest is None:
+            data = json.dumps([step.key() for step in self.steps], separators=(",", ":"))
+            self._digest = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        return self._digest
+
+    # --------------------------------------------------------------------
+    # Diff
+
+    def diff(self, other: "BuildPlan"):
+
+        ###################################
+
+        # Inputs - other, BuildPlan
+        # Returns - List[Tuple[str, List[PlanStep], List[PlanStep]]]
+
+        # Steps of this plan replaced, deleted or inserted in other :
+        # ("replace" / "delete" / "insert", steps of this plan, steps of other).
+        # Empty when both plans are the same.
+
+        ###################################
+
+        if self.digest == other.digest:
+            return []
+
+        # Steps are compared by the hash of their key
+        matcher = difflib.SequenceMatcher(
+            None, [hash(step.key()) for step in self.steps], [hash(step.key()) for step in other.steps], autojunk=False
+        )
+
+        return [
+            (tag, self.steps[i1:i2], other.steps[j1:j2])
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+            if tag != "equal"
+        ]
+
+    def print_diff(self, other: "BuildPlan"):
+        for tag, old_steps, new_steps in self.diff(other):
+            for step in old_steps:
+                print(f"- [{step.stage}] {step!r}")
+            for step in new_steps:
+                print(f"+ [{step.stage}] {step!r}")
+
+    # --------------------------------------------------------------------
+    # File
+
+    def to_dict(self):
+        return {
+            "version": PLAN_VERSION,
+            "name": self.name,
+            "config": self.config,
+            "created": self.created,
+            "reserved": self.reserved,
+            "nodes": self.nodes,
+            "steps": [step.to_list() for step in self.steps],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Unsupported build plan version : {data.get('version')}")
+
+        plan = cls(data["name"], data["config"])
+        plan.created = list(data["created"])
+        plan.reserved = list(data["reserved"])
+        plan.nodes = list(data.get("nodes", data["created"]))
+        plan.steps = [PlanStep.from_list(step) for step in data["steps"]]
+        return plan
+
+    def save(self, path: str):
+
+        ###################################
+
+        # Inputs - path, str
+        # Returns - None
+
+        # Writes the plan as gzipped JSON
+
+        ###################################
+
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, separators=(",", ":"))
+
+
+def load_plan(path: str):
+
+    ###################################
+
+    # Inputs - path, str
+    # Returns - BuildPlan
+
+    ###################################
+
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        return BuildPlan.from_dict(json.load(file))
+
+
+# ------------------------------------------------------------------------
+# Compiler
+
+
+class _RecordingCmds:
+
+    # Proxy standing for maya.cmds on the in-memory scene, records every command that edits it
+
+    def __init__(self, cmds_module, plan: BuildPlan):
+        self._cmds = cmds_module
+        self._plan = plan
+        self.stage = ""
+
+    def __getattr__(self, name: str):
+        function = getattr(self._cmds, name)
+        if not callable(function) or name in READ_COMMANDS:
+            return function
+
+        plan = self._plan
+
+        def recorded(*args, **kwargs):
+            result = function(*args, **kwargs)
+            if not kwargs.get("query", kwargs.get("q", False)):
+                plan.steps.append(PlanStep(
+                    name, _plain(args), tuple((key, _plain(value)) for key, value in kwargs.items()), _plain(result), self.stage
+                ))
+            return result
+
+        setattr(self, name, recorded)
+        return recorded
+
+
+def _seed_nodes(config: LimbConfig):
+
+    # Nodes of the scene the builders read : the skeleton and its parent, the reverse foot, the switch.
+    # Returns (name, parent in the copy, True if its parent is not copied), parents first
+    names: List[str] = cmds.listRelatives(config.root_joint, p=True) or []
+
+    roots = [config.root_joint]
+    if config.foot_roll and config.foot_root:
+        roots.append(config.foot_root)
+
+    for root in roots:
+        names.append(root)
+        names += reversed(cmds.listRelatives(root, ad=True, type=["joint", "transform"]) or [])
+
+    names.append(config.switch)
+    names = list(dict.fromkeys(names))
+
+    seeded = set(names)
+    nodes: List[Tuple[str, Optional[str], bool]] = []
+
+    for name in names:
+        parent = (cmds.listRelatives(name, p=True) or [None])[0]
+        nodes.append((name, parent if parent in seeded else None, parent is not None and parent not in seeded))
+
+    return nodes
+
+
+def read_seeds(config: LimbConfig, attributes: bool = True):
+
+    ###################################
+
+    # Inputs - config, LimbConfig; attributes, bool
+    # Returns - List[dict]
+
+    # The seed nodes as JSON friendly records : name, type, parent, user
+    # attributes, and local channels, or the world matrix when the parent
+    # is not copied. Without attributes, the user attributes are left out,
+    # as they were before the first build. User attributes are recorded
+    # with their type ({"type", "value"}, and "enum" names for enums) ;
+    # compound, message and data attributes other than strings are not
+    # copied, the builders do not read them.
+
+    ###################################
+
+    seeds: List[Dict[str, Any]] = []
+    for name, parent, world in _seed_nodes(config):
+
+        typ = cmds.nodeType(name)
+        if typ not in ("joint", "transform"):
+            typ = "transform"
+
+        seed: Dict[str, Any] = {"name": name, "type": typ, "parent": parent, "attrs": {}}
+        for attr in (cmds.listAttr(name, ud=True) if attributes else None) or []:
+            plug = f"{name}.{attr}"
+            attr_type = cmds.getAttr(plug, type=True)
+            if attr_type not in NUMBER_TYPES and attr_type not in ("enum", "string"):
+                continue
+
+            seed["attrs"][attr] = {"type": attr_type, "value": cmds.getAttr(plug)}
+            if attr_type == "enum":
+                seed["attrs"][attr]["enum"] = cmds.attributeQuery(attr, node=name, listEnum=True)[0]
+
+        if world:
+            seed["world"] = list(cmds.xform(name, q=True, ws=True, m=True))
+        else:
+            channels = ["translate", "rotate", "scale"] + (["jointOrient"] if typ == "joint" else [])
+            seed["channels"] = {channel: list(cmds.getAttr(f"{name}.{channel}")[0]) for channel in channels}
+            seed["offsetParentMatrix"] = list(cmds.getAttr(f"{name}.offsetParentMatrix"))
+
+        seeds.append(seed)
+
+    return seeds
+
+
+def _seed_scene(scene_cmds, seeds: List[Dict[str, Any]]):
+
+    # Copies the seed nodes into the in-memory scene
+    for seed in seeds:
+        name, parent = seed["name"], seed["parent"]
+        if parent:
+            scene_cmds.createNode(seed["type"], n=name, p=parent, ss=True)
+        else:
+            scene_cmds.createNode(seed["type"], n=name, ss=True)
+
+        for attr, data in seed["attrs"].items():
+            if data["type"] == "string":
+                scene_cmds.addAttr(name, ln=attr, dt="string")
+                if data["value"] is not None:
+                    scene_cmds.setAttr(f"{name}.{attr}", data["value"], type="string")
+            elif data["type"] == "enum":
+                scene_cmds.addAttr(name, ln=attr, at="enum", en=data["enum"], dv=data["value"])
+            else:
+                scene_cmds.addAttr(name, ln=attr, at=data["type"], dv=data["value"])
+
+        if "world" in seed:
+            scene_cmds.xform(name, ws=True, m=seed["world"])
+            continue
+
+        for channel, values in seed["channels"].items():
+            scene_cmds.setAttr(f"{name}.{channel}", *values)
+        scene_cmds.setAttr(f"{name}.offsetParentMatrix", seed["offsetParentMatrix"], type="matrix")
+
+
+def _compiled_modules():
+
+    # The loaded modules of the tool calling maya.cmds, run on the in-memory scene while compiling.
+    # Found when compiling : a new module is compiled without being listed anywhere
+    modules = []
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name in NOT_COMPILED or not path or os.path.dirname(os.path.abspath(path)) != TOOL_DIRECTORY:
+            continue
+        if getattr(module, "cmds", None) is cmds and module not in modules:
+            modules.append(module)
+    return modules
+
+
+def _session_caches():
+
+    # Caches filled by a build, the compile must not leave its in-memory scene in them
+    hierarchy = importlib.import_module("hierarchy")
+    snapshot = importlib.import_module("snapshot")
+    manifest = importlib.import_module("manifest")
+    return [hierarchy._indexes, snapshot._snapshots, snapshot._joint_snapshots, manifest._manifests, control_factory.templates]
+
+
+def compile_plan(config: LimbConfig, check: bool = True):
+
+    ###################################
+
+    # Inputs - config, LimbConfig; check, bool
+    # Returns - BuildPlan
+
+    # Compiles the build of the limb of config, the scene is not changed.
+    # Unless check is False, the preflight checks run first on the scene.
+
+    ###################################
+
+    return compile_with_scene(config, check)[0]
+
+
+def compile_with_scene(
+    config: LimbConfig, check: bool = True, attributes: bool = True, seeds: Optional[List[Dict[str, Any]]] = None
+):
+
+    ###################################
+
+    # Inputs - config, LimbConfig; check, bool; attributes, bool; seeds, List[dict]
+    # Returns - (BuildPlan, scene_graph.Scene)
+
+    # Same as compile_plan, with the in-memory scene the plan was compiled
+    # on : the state the rig should have (rebuild.py). Without attributes,
+    # the user attributes of the skeleton and the switch are not copied,
+    # for a limb already built (the build adds its own). Given seeds
+    # (read_seeds) are used instead of the scene, the names of config
+    # must match them (rig_cache.py).
+
+    ###################################
+
+    if check:
+        report = preflight(config)
+        if not report.ok:
+            raise ValueError(str(report))
+
+    plan = BuildPlan("build_" + config.limb_name + "_" + config.root_joint[-1:], config.to_dict())
+
+    scene = scene_graph.Scene()
+    scene_cmds = scene_graph.scene_commands(scene)
+    _seed_scene(scene_cmds, read_seeds(config, attributes) if seeds is None else seeds)
+    seeded = set(scene.nodes)
+
+    recorder = _RecordingCmds(scene_cmds, plan)
+
+    caches = [(cache, dict(cache)) for cache in _session_caches()]
+    previous_scene = scene_graph.scene
+
+    try:
+        scene_graph.scene = scene
+        for cache, _ in caches:
+            cache.clear()
+
+        job = _record_build(config, recorder, scene_graph.OpenMaya)
+
+    finally:
+        scene_graph.scene = previous_scene
+        for cache, saved in caches:
+            cache.clear()
+            cache.update(saved)
+
+    plan.created = [name for name in scene.nodes if name not in seeded]
+    plan.nodes = sorted(scene.given_names - seeded)
+    plan.reserved = _reserved_names(job)
+
+    return plan, scene
+
+
+def _record_build(config: LimbConfig, recorder: _RecordingCmds, om_module: Any = None):
+
+    # Runs the build of config stage by stage, the tool modules calling recorder instead of maya.cmds
+    # (and om_module instead of OpenMaya when given). Every edit goes through cmds : no edit batches
+    originals: List[Tuple[Any, Any, Any]] = []
+    previous_batching = set_batching(False)
+
+    try:
+        for module in _compiled_modules():
+            originals.append((module, module.cmds, getattr(module, "om", None)))
+            module.cmds = recorder
+            if om_module is not None and hasattr(module, "om"):
+                module.om = om_module
+
+        job = BuildJob(LimbConfig.from_dict(config.to_dict()), check=False)
+        job.start()
+        while not job.finished:
+            recorder.stage = job.next_step
+            job.step()
+
+        # The controls templates are not part of the rig (batch.build_queue)
+        recorder.stage = "cleanup"
+        control_factory.clear()
+
+    finally:
+        for module, cmds_module, om_original in originals:
+            module.cmds = cmds_module
+            if om_original is not None:
+                module.om = om_original
+
+        set_batching(previous_batching)
+
+    return job
+
+
+def _reserved_names(job: BuildJob):
+
+    # The names the builders of the job checked before building (names.py)
+    reserved: List[str] = []
+    for limb_names in [job.limb.names] + ([job.hand.names] if job.hand else []):
+        reserved += [name for stage in sorted(limb_names.checked) for name in limb_names.stages[stage]]
+    return reserved
+
+
+def record_plan(config: LimbConfig, check: bool = True):
+
+    ###################################
+
+    # Inputs - config, LimbConfig; check, bool
+    # Returns - BuildPlan
+
+    # Builds the limb of config in the scene, like build_limb, and returns
+    # the plan of the build : the cmds the builders called on Maya itself,
+    # recorded. The rig stays in the scene.
+
+    ###################################
+
+    if check:
+        report = preflight(config)
+        if not report.ok:
+            raise ValueError(str(report))
+
+    plan = BuildPlan("build_" + config.limb_name + "_" + config.root_joint[-1:], config.to_dict())
+
+    with performance_mode(plan.name):
+        job = _record_build(config, _RecordingCmds(cmds, plan))
+
+    # The controls templates are deleted by the end of the build
+    plan.created = [name for name in job.nodes if cmds.objExists(name)]
+    plan.nodes = list(job.nodes)
+    plan.reserved = _reserved_names(job)
+
+    return plan
+
+
+def validate_plan(config: LimbConfig, plan: Optional[BuildPlan] = None, check: bool = True):
+
+    ###################################
+
+    # Inputs - config, LimbConfig; plan, BuildPlan; check, bool
+    # Returns - List[Tuple[str, List[PlanStep], List[PlanStep]]]
+
+    # Checks a plan compiled on the in-memory scene against a real build :
+    # the limb is built in the scene with its cmds recorded (record_plan),
+    # then rolled back. Returns plan.diff of the two plans, empty when the
+    # compiled plan makes the same edits. plan is compiled when not given.
+
+    ###################################
+
+    if plan is None:
+        plan = compile_plan(config, check)
+    elif check:
+        report = preflight(config)
+        if not report.ok:
+            raise ValueError(str(report))
+
+    # The real build must not leave its nodes in the session caches either
+    caches = [(cache, dict(cache)) for cache in _session_caches()]
+
+    try:
+        with keep_selection():
+            with BuildTransaction("validate_" + plan.name) as transaction:
+                recorded = record_plan(config, check=False)
+            transaction.rollback()
+
+    finally:
+        for cache, saved in caches:
+            cache.clear()
+            cache.update(saved)
+
+    return plan.diff(recorded)
+
+
+# ------------------------------------------------------------------------
+# Executor
+
+
+def rename_recorded(value: Any, names: Dict[str, str]):
+
+    ###################################
+
+    # Inputs - value, recorded argument; names, Dict[str, str]
+    # Returns - value with the recorded names (and plugs) replaced by the names given at replay
+
+    ###################################
+
+    if isinstance(value, str):
+        if value in names:
+            return names[value]
+        node, dot, attr = value.partition(".")
+        if dot and node in names:
+            return names[node] + dot + attr
+        return value
+    if isinstance(value, tuple):
+        return [rename_recorded(item, names) for item in value]
+    return value
+
+
+def map_recorded_names(recorded: Any, result: Any, names: Dict[str, str]):
+
+    ###################################
+
+    # Inputs - recorded, recorded result; result, result at replay; names, Dict[str, str]
+    # Returns - None
+
+    # Adds the names Maya gave differently to names
+
+    ###################################
+
+    if isinstance(recorded, str):
+        if isinstance(result, str) and result != recorded:
+            names[recorded] = result
+    elif isinstance(recorded, tuple) and isinstance(result, (list, tuple)):
+        for recorded_item, item in zip(recorded, result):
+            map_recorded_names(recorded_item, item, names)
+
+
+def _translation_matrix(point: Sequence[float]):
+    values = list(om.MMatrix())
+    values[12:15] = [float(value) for value in point]
+    return om.MMatrix(values)
+
+
+def _under_world(nodes: List[Any]):
+
+    # True when none of the nodes has a parent : their local values are world values
+    for node in nodes:
+        if isinstance(node, list):
+            if not _under_world(node):
+                return False
+        elif cmds.listRelatives(node, p=True):
+            return False
+    return True
+
+
+def place_step(command: str, args: List[Any], kwargs: Dict[str, Any], placement: "om.MMatrix"):
+
+    ###################################
+
+    # Inputs - command, str; args, List; kwargs, dict; placement, om.MMatrix
+    # Returns - (str, List, dict), the step moved by placement
+
+    # Moves the world space values of a step : the matrices and the
+    # translations xform sets in world space (or on nodes under the world),
+    # and the translate of the nodes under the world. The other steps are
+    # relative to nodes the placement moves too.
+
+    ###################################
+
+    if command == "xform":
+        matrix_flag = next((flag for flag in ("m", "matrix") if flag in kwargs), None)
+        translation_flag = next((flag for flag in ("t", "translation") if flag in kwargs), None)
+        if matrix_flag is None and translation_flag is None:
+            return command, args, kwargs
+        if not kwargs.get("ws", kwargs.get("worldSpace", False)) and not _under_world(args):
+            return command, args, kwargs
+
+        kwargs = dict(kwargs)
+        if matrix_flag is not None:
+            kwargs[matrix_flag] = list(om.MMatrix(kwargs[matrix_flag]) * placement)
+        if translation_flag is not None:
+            kwargs[translation_flag] = list(_translation_matrix(kwargs[translation_flag]) * placement)[12:15]
+        return command, args, kwargs
+
+    if command == "setAttr" and len(args) > 1 and isinstance(args[0], str):
+        node, _, attr = args[0].rpartition(".")
+        if attr not in ("translate", "translateX", "translateY", "translateZ") or not _under_world([node]):
+            return command, args, kwargs
+
+        # One channel : the other two are kept where the placement put them
+        if attr == "translate":
+            translate = list(args[1:4])
+        else:
+            translate = list(_translation_matrix(cmds.getAttr(node + ".translate")[0]) * placement.inverse())[12:15]
+            translate["XYZ".index(attr[-1])] = args[1]
+
+        return command, [node + ".translate"] + list(_translation_matrix(translate) * placement)[12:15], kwargs
+
+    return command, args, kwargs
+
+
+def execute_plan(
+    plan: BuildPlan,
+    check: bool = True,
+    names: Optional[Dict[str, str]] = None,
+    namespace: Optional[str] = None,
+    placement: Optional[Sequence[float]] = None,
+):
+
+    ###################################
+
+    # Inputs - plan, BuildPlan; check, bool; names, Dict[str, str]; namespace, str; placement, List[float]
+    # Returns - dict
+
+    # Applies the plan to the scene in one transaction (rolled back if a
+    # step fails). Unless check is False, nothing is built if a name the
+    # build checks is already taken, like build_limb. names maps recorded
+    # names onto other nodes of the scene (e.g. another skeleton), the
+    # nodes the plan creates go in namespace when given. A plan compiled
+    # with the skeleton at the origin is built where placement (a world
+    # matrix) puts it (place_step).
+
+    ###################################
+
+    start = time.perf_counter()
+
+    if placement is not None:
+        placement = None if list(placement) == list(om.MMatrix()) else om.MMatrix(placement)
+
+    names = dict(names or {})
+    if namespace:
+        names.update({name: f":{namespace}:{name}" for name in plan.nodes if name not in names})
+
+    if check:
+        taken = cmds.ls([rename_recorded(name, names) for name in plan.reserved]) or []
+        if taken:
+            raise ValueError(f"{plan.name} : these names are already used in the scene : {', '.join(taken)}")
+
+    if plan.uses_node_type(SOLVER_NODE_TYPE):
+        load_plugin()
+
+    with performance_mode("replay_" + plan.name), keep_selection(), BuildTransaction(plan.name) as transaction:
+
+        # The unnamed nodes (shapes, history...) go in the namespace too
+        previous_namespace = cmds.namespaceInfo(cur=True, an=True) if namespace else None
+        if namespace:
+            if not cmds.namespace(exists=":" + namespace):
+                cmds.namespace(add=":" + namespace)
+            cmds.namespace(set=":" + namespace)
+
+        try:
+            for step in plan.steps:
+                args = rename_recorded(step.args, names)
+                kwargs = {key: rename_recorded(value, names) for key, value in step.kwargs}
+                if step.command == "setAttr" and args[0].endswith("." + TABLE_ATTR):
+                    # The manifest table holds node names in its JSON
+                    args[1] = rename_table(args[1], names)
+                command = step.command
+                if placement is not None:
+                    command, args, kwargs = place_step(command, args, kwargs, placement)
+                result = getattr(cmds, command)(*args, **kwargs)
+                if step.result is not None:
+                    map_recorded_names(step.result, result, names)
+        finally:
+            if previous_namespace is not None:
+                cmds.namespace(set=previous_namespace)
+
+    return {
+        "limb": plan.name,
+        "steps": len(plan.steps),
+        "created": transaction.created,
+        "renamed": names,
+        "total": time.perf_counter() - start,
+    }
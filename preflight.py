@@ -0,0 +1,324 @@
+import math
+import time
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+from typing import *
+
+from library import BipedLimb, CONSTRAINT_MODES
+from config import FKIK_BLENDS, LimbConfig
+from hierarchy import index_hierarchy
+from names import LimbNames
+from snapshot import take_snapshot
+
+try:
+    import numpy as np
+except ImportError:  # mayapy without numpy, chains are checked one by one
+    np = None
+
+
+###################################
+
+# Preflight checks.
+# Before anything is written to the scene, checks in one batch everything
+# a requested build needs :
+#   - config : known constraint mode and FK / IK blend, squash and volume only with the stretch
+#   - nodes : root joint, switch, reverse foot, limb joints, foot joints, phalanges
+#   - names : nothing the build creates already exists, or is created twice by the queue
+#   - attributes : the SK channels driven by the rig are not locked
+#   - chains : IK chains are not collinear (the pole vector would be undefined)
+#              and have no zero length bone
+
+# reports = preflight_queue(configs)
+# for report in reports:
+#     if not report.ok:
+#         print(report)
+
+###################################
+
+
+# Below this sine of the angle between the two bones, an IK chain is considered straight
+COLLINEAR_TOLERANCE = 1e-3
+
+HAND_FINGERS = {"index": (1, 2, 3), "middle": (1, 2, 3), "ring": (1, 2, 3), "pinkie": (1, 2, 3), "thumb": (0, 1, 2)}
+
+DRIVEN_CHANNELS = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ"]
+
+# Zeroed when the rest pose of a matrix or solver blended SK joint moves to its offsetParentMatrix
+BAKED_CHANNELS = ["scaleX", "scaleY", "scaleZ", "jointOrientX", "jointOrientY", "jointOrientZ"]
+
+
+class PreflightIssue:
+
+    __slots__ = ("check", "node", "message")
+
+    def __init__(self, check: str, node: str, message: str):
+        self.check = check
+        self.node = node
+        self.message = message
+
+    def to_dict(self):
+        return {"check": self.check, "node": self.node, "message": self.message}
+
+
+class PreflightReport:
+
+    ###################################
+
+    # Issues found for one limb, the limb can be built if there are none
+
+    ###################################
+
+    def __init__(self, limb: str, config: LimbConfig):
+        self.limb = limb
+        self.config = config
+        self.issues: List[PreflightIssue] = []
+        self.duration = 0.0
+
+    @property
+    def ok(self):
+        return not self.issues
+
+    def add(self, check: str, node: str, message: str):
+        self.issues.append(PreflightIssue(check, node, message))
+
+    def to_dict(self):
+        return {
+            "limb": self.limb,
+            "root_joint": self.config.root_joint,
+            "ok": self.ok,
+            "issues": [issue.to_dict() for issue in self.issues],
+            "duration": self.duration,
+        }
+
+    def __str__(self):
+        if self.ok:
+            return f"{self.limb} : ok"
+        lines = [f"{self.limb} : {len(self.issues)} issue(s)"]
+        lines += [f"    [{issue.check}] {issue.node} : {issue.message}" for issue in self.issues]
+        return "\n".join(lines)
+
+
+def _limb_joint_number(config: LimbConfig, roles: Dict[str, str]):
+
+    # Same rule as LimbClass
+    number = 3 if config.limb_type == "biped" else 4
+    if config.limb_name == BipedLimb.Leg and "toe" in roles:
+        number = 5
+    return number
+
+
+def _planned_stages(config: LimbConfig):
+    stages = ["duplicate_hierarchy", "pair_blend", "biped_rig"]
+    if config.stretch:
+        stages.append("stretch")
+    if config.better_pole:
+        stages.append("unbreakable_knees")
+    if config.foot_roll:
+        stages.append("foot_roll")
+    if config.bendy:
+        stages.append("create_bendy_limb")
+    return stages
+
+
+def _bad_chains(chains: List[List[List[float]]]):
+
+    ###################################
+
+    # Inputs - chains, [[root, mid, end] positions] per chain
+    # Returns - List[str], per chain "" or the reason it can not be solved
+
+    ###################################
+
+    if not chains:
+        return []
+
+    if np is None:
+        reasons = []
+        for root, mid, end in chains:
+            upper = [mid[i] - root[i] for i in range(3)]
+            lower = [end[i] - mid[i] for i in range(3)]
+            whole = [end[i] - root[i] for i in range(3)]
+            cross = [
+                upper[1] * whole[2] - upper[2] * whole[1],
+                upper[2] * whole[0] - upper[0] * whole[2],
+                upper[0] * whole[1] - upper[1] * whole[0],
+            ]
+            lengths = math.sqrt(sum(v * v for v in upper)), math.sqrt(sum(v * v for v in lower))
+            if min(lengths) == 0.0:
+                reasons.append("zero length bone")
+            elif math.sqrt(sum(v * v for v in cross)) <= COLLINEAR_TOLERANCE * lengths[0] * math.sqrt(sum(v * v for v in whole)):
+                reasons.append("collinear chain, the pole vector can not be placed")
+            else:
+                reasons.append("")
+        return reasons
+
+    positions = np.asarray(chains, dtype=np.float64)            # (N, 3 joints, xyz)
+    upper = positions[:, 1] - positions[:, 0]
+    lower = positions[:, 2] - positions[:, 1]
+    whole = positions[:, 2] - positions[:, 0]
+
+    upper_length = np.linalg.norm(upper, axis=1)
+    lower_length = np.linalg.norm(lower, axis=1)
+    area = np.linalg.norm(np.cross(upper, whole), axis=1)
+
+    zero = (upper_length == 0.0) | (lower_length == 0.0)
+    collinear = ~zero & (area <= COLLINEAR_TOLERANCE * upper_length * np.linalg.norm(whole, axis=1))
+
+    return [
+        "zero length bone" if is_zero else "collinear chain, the pole vector can not be placed" if is_collinear else ""
+        for is_zero, is_collinear in zip(zero.tolist(), collinear.tolist())
+    ]
+
+
+def preflight_queue(configs: Iterable[LimbConfig]):
+
+    ###################################
+
+    # Inputs - configs, Iterable[LimbConfig]
+    # Returns - List[PreflightReport]
+
+    # Checks every limb of a queue in one batch, without writing to the scene
+
+    ###################################
+
+    start = time.perf_counter()
+
+    configs = list(configs)
+    reports = [PreflightReport(config.limb_name + "_" + config.root_joint[-1:], config) for config in configs]
+
+    # ------------------------------------------------------------------------
+    # Input nodes, one ls
+
+    inputs = {config.root_joint for config in configs} | {config.switch for config in configs}
+    inputs |= {config.foot_root for config in configs if config.foot_roll}
+    inputs.discard("")
+
+    existing = set(cmds.ls(list(inputs)) or [])
+    joints = set(cmds.ls(list(existing), type="joint") or []) if existing else set()
+
+    plans: List[Tuple[PreflightReport, List[str], LimbNames, List[str]]] = []
+
+    for report, config in zip(reports, configs):
+
+        if config.constraint_mode not in CONSTRAINT_MODES:
+            report.add("config", config.root_joint, f"unknown constraint mode '{config.constraint_mode}'")
+        if config.fkik_blend not in FKIK_BLENDS:
+            report.add("config", config.root_joint, f"unknown FK / IK blend '{config.fkik_blend}'")
+        elif config.fkik_blend == "solver" and np is None:
+            report.add("config", config.root_joint, "the limb solver needs NumPy")
+        if (config.squash or config.volume) and not config.stretch:
+            report.add("config", config.root_joint, "squash and volume need the stretch")
+
+        if not config.switch or config.switch not in existing:
+            report.add("nodes", config.switch, "switch controller not found")
+
+        if not config.root_joint or config.root_joint not in existing:
+            report.add("nodes", config.root_joint, "root joint not found")
+            continue
+        if config.root_joint not in joints:
+            report.add("nodes", config.root_joint, "root is not a joint")
+            continue
+
+        index = index_hierarchy(config.root_joint)
+
+        joint_number = _limb_joint_number(config, index.roles)
+        limb_joints = index.chain[:joint_number]
+        if len(limb_joints) < joint_number:
+            report.add("nodes", config.root_joint, f"the limb needs {joint_number} chained joints, found {len(limb_joints)}")
+            continue
+
+        if config.foot_roll:
+            if "toe" not in index.roles:
+                report.add("nodes", limb_joints[-1], "foot roll needs a ball and a toe joint under the ankle")
+            if config.foot_root not in joints:
+                report.add("nodes", config.foot_root or "<foot root>", "reverse foot root joint not found")
+            elif len(index_hierarchy(config.foot_root).joints) < 4:
+                report.add("nodes", config.foot_root, "the reverse foot hierarchy must contain 4 joints : heel, toe, ball and ankle")
+
+        fingers = None
+        if config.hand:
+            fingers = {}
+            for finger, phalanges in HAND_FINGERS.items():
+                for phalange in phalanges:
+                    try:
+                        index.finger(finger, phalange)
+                    except (KeyError, IndexError):
+                        report.add("nodes", index.roles.get("end", config.root_joint), f"{finger} phalange {phalange} not found")
+                if finger in index.fingers:
+                    fingers[finger] = index.fingers[finger]
+
+        names = LimbNames(
+            limb_joints, config.limb_name + "_" + config.root_joint[-1], config.root_joint[-1], fingers=fingers, fkik_blend=config.fkik_blend
+        )
+        plans.append((report, limb_joints, names, _planned_stages(config) + (["add_fingers_controls"] if config.hand else [])))
+
+    # ------------------------------------------------------------------------
+    # Names, one ls for the whole queue
+
+    owners: Dict[str, List[PreflightReport]] = {}
+    for report, _, names, stages in plans:
+        duplicates: Dict[str, List[str]] = {}
+        for stage in stages:
+            for name in names.stages[stage]:
+                if name in owners and owners[name][0] is not report:
+                    duplicates.setdefault(owners[name][0].limb, []).append(name)
+                owners.setdefault(name, []).append(report)
+        for limb, duplicated in duplicates.items():
+            report.add("names", duplicated[0], f"{len(duplicated)} name(s) also created by {limb} : {', '.join(duplicated)}")
+
+    taken: Dict[PreflightReport, List[str]] = {}
+    for name in (cmds.ls(list(owners)) or []) if owners else []:
+        for report in dict.fromkeys(owners[name]):
+            taken.setdefault(report, []).append(name)
+    for report, names_taken in taken.items():
+        report.add("names", names_taken[0], f"{len(names_taken)} name(s) already used in the scene : {', '.join(names_taken)}")
+
+    # ------------------------------------------------------------------------
+    # Attributes, one selection list of plugs
+
+    plugs: List[Tuple[PreflightReport, str]] = []
+    for report, limb_joints, _, _ in plans:
+        channels = DRIVEN_CHANNELS
+        if report.config.stretch:
+            channels = channels + (["scaleX", "scaleY", "scaleZ"] if report.config.volume else ["scaleX"])
+        if report.config.fkik_blend != "pairBlend":
+            channels = DRIVEN_CHANNELS + BAKED_CHANNELS
+        plugs += [(report, f"{joint}.{channel}") for joint in limb_joints for channel in channels]
+
+    if plugs:
+        selection = om.MSelectionList()
+        for _, plug in plugs:
+            selection.add(plug)
+        for i, (report, plug) in enumerate(plugs):
+            if selection.getPlug(i).isLocked:
+                report.add("attributes", plug, "locked, the rig can not drive it")
+
+    # ------------------------------------------------------------------------
+    # Chains, vectorized on the snapshots of the skeletons
+
+    chains = []
+    for report, limb_joints, _, _ in plans:
+        snapshot = take_snapshot(report.config.root_joint)
+        chains.append([snapshot.position(joint) for joint in limb_joints[:3]])
+
+    for (report, limb_joints, _, _), reason in zip(plans, _bad_chains(chains)):
+        if reason:
+            report.add("chains", limb_joints[1], reason)
+
+    duration = time.perf_counter() - start
+    for report in reports:
+        report.duration = duration
+
+    return reports
+
+
+def preflight(config: LimbConfig):
+
+    ###################################
+
+    # Inputs - config, LimbConfig
+    # Returns - PreflightReport
+
+    ###################################
+
+    return preflight_queue([config])[0]
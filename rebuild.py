@@ -0,0 +1,571 @@
+import json
+import math
+import time
+import maya.cmds as cmds
+from typing import *
+
+from config import LimbConfig
+from hierarchy import hierarchy_index
+from library import keep_selection
+from LimbClass import HandClass
+from limb_solver import NODE_TYPE as SOLVER_NODE_TYPE, load_plugin
+from manifest import MANIFEST_PREFIX, TABLE_ATTR, get_manifest
+from performance import performance_mode
+from plan import compile_with_scene, map_recorded_names, rename_recorded
+from transaction import BuildTransaction
+
+
+###################################
+
+# Incremental rebuild.
+# After a skeleton tweak (a knee moved) or an option toggled (stretch,
+# better pole, bendy, hand), the limb is not deleted and built again : the
+# build is compiled on an in-memory copy of the skeleton (plan.py), which
+# gives the state the rig should have, and only the difference with the
+# rig in the scene is applied.
+
+# report = rebuild_limb(config)
+# report["run"], report["skipped"]      -> plan steps applied / already satisfied
+
+# The passes, in one transaction :
+#   - nodes under another parent than the desired one are reparented
+#   - nodes recorded in the manifests under a role the limb no longer has
+#     (stretch, unbreakable knees, ribbon, hand...) are deleted, and so are
+#     the switch attributes of the options turned off
+#   - the transform channels of the rig nodes are set to the desired ones,
+#     the nodes that moved are kept
+#   - connections between utility nodes of the rig that the desired rig
+#     does not have are broken
+#   - the plan is replayed, every step already satisfied in the scene is
+#     skipped : existing nodes, equal attribute values, existing connections.
+#     Nodes whose creation depends on positions (IK handles, constraints
+#     keeping an offset, skinClusters...) are made again if a node they use
+#     moved, and so is the whole ribbon.
+
+###################################
+
+
+# Creations baking the position of the nodes they use
+GEOMETRY_COMMANDS = {"ikHandle", "skinCluster", "nonLinear", "nurbsPlane"}
+OFFSET_CONSTRAINTS = {"parentConstraint", "pointConstraint", "orientConstraint", "scaleConstraint", "aimConstraint"}
+
+# Commands that edit nodes instead of creating them
+EDIT_COMMANDS = {
+    "addAttr", "connectAttr", "delete", "disconnectAttr", "loadPlugin", "makeIdentity", "matchTransform", "move",
+    "parent", "rename", "rotate", "scale", "setAttr", "xform",
+}
+
+# Stages rebuilt as a whole when one of their nodes is missing or moved
+WHOLE_STAGES = ["create_bendy_limb"]
+
+# Manifest roles of the nodes of the user (skeleton, switch, reverse foot), never deleted
+USER_ROLES = ("sk.", "switch", "foot_root")
+
+CHANNELS = ["translate", "rotate", "scale"]
+
+TOLERANCE = 1e-4
+
+
+def _values(value: Any):
+    if isinstance(value, (list, tuple)):
+        return [item for element in value for item in _values(element)]
+    return [value]
+
+
+def _same(a: Any, b: Any):
+
+    # Attribute values, compared with a tolerance
+    a, b = _values(a), _values(b)
+    if len(a) != len(b):
+        return False
+
+    for x, y in zip(a, b):
+        if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+            if not math.isclose(x, y, rel_tol=TOLERANCE, abs_tol=TOLERANCE):
+                return False
+        elif x != y:
+            return False
+    return True
+
+
+def _strings(value: Any):
+    return [item for item in _values(value) if isinstance(item, str)]
+
+
+class LimbRebuild:
+
+    def __init__(self, config: LimbConfig):
+        self.config = config
+        self.name = "rebuild_" + config.limb_name + "_" + config.root_joint[-1:]
+
+        self.plan, self.scene = compile_with_scene(config, check=False, attributes=False)
+
+        # Desired state : the in-memory scene, queried like the scene
+        self.desired = self.scene.nodes
+        self.created = set(self.plan.created)
+        self.seeded = self.desired.keys() - self.created
+
+        # Nodes named by Maya (effector1, skinCluster1, constraints), their name in the
+        # scene can be anything : they are found through the manifests or their connections
+        self.anonymous = {name for name in self.created if name[-1].isdigit()}
+
+        # Every node name of the plan, temporary nodes included
+        self.known = self.desired.keys() | {name for step in self.plan.steps for name in _strings(step.result)}
+
+        # Desired name -> name in the scene, when they differ
+        self.names: Dict[str, str] = {}
+
+        # Desired names of the nodes made by this rebuild, and of the nodes that moved
+        self.fresh: Set[str] = set()
+        self.moved: Set[str] = set()
+
+        # Stages made again as a whole, temporary nodes to make again
+        self.redo: Set[str] = set()
+        self.temporaries: Set[str] = set()
+
+        # Desired name -> incoming connections in the scene (destination plug, source plug)
+        self.inputs: Dict[str, List[Tuple[str, str]]] = {}
+
+        self.counts: Dict[str, int] = {"run": 0, "skipped": 0, "reparented": 0, "deleted": 0, "settled": 0, "disconnected": 0}
+
+    def scene_name(self, name: str):
+        return rename_recorded(name, self.names)
+
+    def exists(self, name: str):
+        if name in self.anonymous and name not in self.names:
+            return False
+        return cmds.objExists(self.scene_name(name))
+
+    # --------------------------------------------------------------------
+    # Desired state
+
+    def _desired_parent(self, name: str):
+        parent = self.desired[name].parent
+        return parent.name if parent is not None else None
+
+    def _desired_attr(self, plug: str, **kwargs):
+        return self.scene.getAttr(plug, **kwargs)
+
+    def _desired_inputs(self, name: str):
+        pairs = self.scene.listConnections(name, s=True, d=False, c=True, p=True) or []
+        return set(zip(pairs[0::2], pairs[1::2]))
+
+    def _manifest_tables(self):
+
+        # Manifests of the desired rig : limb name -> {role: name}
+        tables: Dict[str, Dict[str, str]] = {}
+        for node in self.scene.ls(MANIFEST_PREFIX + "*", type="network") or []:
+            table = json.loads(self.scene.getAttr(f"{node}.{TABLE_ATTR}") or "{}")
+            tables[node[len(MANIFEST_PREFIX):]] = {role: name for role, (_, name) in table.get("roles", {}).items()}
+        return tables
+
+    # --------------------------------------------------------------------
+    # Passes
+
+    def _map_manifest_names(self, tables: Dict[str, Dict[str, str]]):
+
+        # The manifests resolve the nodes of the scene named differently (numbered by Maya)
+        for limb, roles in tables.items():
+            if not cmds.objExists(MANIFEST_PREFIX + limb):
+                continue
+            manifest = get_manifest(limb)
+            for role, name in roles.items():
+                if role in manifest:
+                    scene_name = manifest.get(role)
+                    if cmds.objExists(scene_name):
+                        self.names[name] = scene_name
+
+    def _map_anonymous_names(self):
+
+        # A node named by Maya is the source of a connection to a node already found, in both rigs
+        claimed = set(self.names.values())
+        pending = [name for name in self.scene.ls() if name in self.anonymous and name not in self.names]
+
+        found = True
+        while pending and found:
+            found = False
+            for name in list(pending):
+                pairs = self.scene.listConnections(name, s=False, d=True, c=True, p=True) or []
+                for destination in pairs[1::2]:
+                    node, _, attr = destination.partition(".")
+                    if node in pending or not self.exists(node):
+                        continue
+
+                    sources = cmds.listConnections(f"{self.scene_name(node)}.{attr}", s=True, d=False, scn=True) or []
+                    if len(sources) == 1 and sources[0] not in claimed:
+                        self.names[name] = sources[0]
+                        claimed.add(sources[0])
+                        pending.remove(name)
+                        found = True
+                        break
+
+    def _existing(self):
+        names = [node.name for node in self.scene.order if node.name not in self.anonymous or node.name in self.names]
+        existing = set(cmds.ls([self.scene_name(name) for name in names]) or [])
+        return [name for name in names if self.scene_name(name) in existing]
+
+    def _reparent(self, existing: List[str]):
+
+        # Parents first, every node keeps its world position until it is settled
+        for name in existing:
+            parent = self._desired_parent(name)
+
+            # The skeleton is only moved when the build parents it (reverse foot)
+            if name in self.seeded and parent is None or not self.desired[name].is_transform:
+                continue
+            scene_parent = (cmds.listRelatives(self.scene_name(name), p=True) or [None])[0]
+
+            if parent is None and scene_parent is not None:
+                cmds.parent(self.scene_name(name), w=True)
+            elif parent is not None and scene_parent != self.scene_name(parent) and self.exists(parent):
+                cmds.parent(self.scene_name(name), self.scene_name(parent))
+            else:
+                continue
+
+            self.moved.add(name)
+            self.counts["reparented"] += 1
+
+    def _delete_removed(self, tables: Dict[str, Dict[str, str]]):
+
+        # The hand manifest of the side belongs to the limb with the fingers
+        limbs = [self.config.limb_name + "_" + self.config.root_joint[-1:]]
+        if self._owns_hand():
+            limbs.append("hand_" + self.config.root_joint[-1:])
+        protected = {self.scene_name(name) for name in self.seeded}
+
+        for limb in limbs:
+            node = MANIFEST_PREFIX + limb
+            if not cmds.objExists(node):
+                continue
+
+            manifest = get_manifest(limb)
+            roles = tables.get(limb, {})
+            removed = [manifest.get(role) for role in manifest.roles() if role not in roles and not role.startswith(USER_ROLES)]
+
+            nodes = [name for name in removed if name not in protected]
+            if limb not in tables:
+                nodes.append(node)
+
+            for name in nodes:
+                # Children of a node already deleted are gone
+                if cmds.objExists(name):
+                    cmds.delete(name)
+                    self.counts["deleted"] += 1
+
+    def _owns_hand(self):
+        return any(finger in hierarchy_index(self.config.root_joint).fingers for finger in HandClass.FINGERS + ["thumb"])
+
+    def _delete_attributes(self):
+
+        # Attributes the builders add to the skeleton and the switch with every option on, that this build does not add
+        options = dict(self.config.to_dict(), stretch=True, bendy=True, hand=self._owns_hand())
+        plan = self.plan
+        if options != self.config.to_dict():
+            plan = compile_with_scene(LimbConfig.from_dict(options), check=False, attributes=False)[0]
+
+        def added(plan):
+            return {
+                (step.args[0], dict(step.kwargs).get("ln", dict(step.kwargs).get("longName")))
+                for step in plan.steps if step.command == "addAttr" and step.args[0] in self.seeded
+            }
+
+        for node, attr in sorted(added(plan) - added(self.plan)):
+            if cmds.objExists(self.scene_name(node)) and cmds.attributeQuery(attr, n=self.scene_name(node), ex=True):
+                cmds.deleteAttr(f"{self.scene_name(node)}.{attr}")
+                self.counts["deleted"] += 1
+
+    def _read_inputs(self, name: str):
+        inputs = self.inputs.get(name)
+        if inputs is None:
+            pairs = cmds.listConnections(self.scene_name(name), s=True, d=False, c=True, p=True, scn=True) or []
+            inputs = list(zip(pairs[0::2], pairs[1::2]))
+            self.inputs[name] = inputs
+        return inputs
+
+    def _settle(self, existing: List[str]):
+
+        # Transform channels of the rig nodes
+        for name in existing:
+            node = self.desired[name]
+            parent = self._desired_parent(name)
+
+            # The skeleton is left as it is, unless the build parents it under the rig (reverse foot)
+            if name in self.seeded and (parent is None or parent in self.seeded) or not node.is_transform:
+                continue
+
+            # Local channels only mean the same under the same parent
+            scene_name = self.scene_name(name)
+            if (cmds.listRelatives(scene_name, p=True) or [None])[0] != (self.scene_name(parent) if parent else None):
+                continue
+
+            driven = {plug.partition(".")[2] for plug, _ in self._read_inputs(name)}
+
+            channels = CHANNELS + (["jointOrient"] if node.type == "joint" else [])
+            for channel in channels:
+                if channel in driven or any(channel + axis in driven for axis in "XYZ"):
+                    continue
+
+                value = self._desired_attr(f"{name}.{channel}")[0]
+                if _same(cmds.getAttr(f"{scene_name}.{channel}")[0], value):
+                    continue
+
+                self._set_unlocked(f"{scene_name}.{channel}", [f"{scene_name}.{channel}{axis}" for axis in "XYZ"], *value)
+                self.moved.add(name)
+                self.counts["settled"] += 1
+
+            if "offsetParentMatrix" not in driven:
+                value = self._desired_attr(f"{name}.offsetParentMatrix")
+                if not _same(cmds.getAttr(f"{scene_name}.offsetParentMatrix"), value):
+                    cmds.setAttr(f"{scene_name}.offsetParentMatrix", value, type="matrix")
+                    self.moved.add(name)
+                    self.counts["settled"] += 1
+
+        # A moved node moves its children
+        for name in list(self.moved):
+            self.moved.update(self.scene.listRelatives(name, ad=True) or [])
+
+    def _set_unlocked(self, plug: str, locked_plugs: List[str], *values, **kwargs):
+
+        # Sets a plug even if it (or its children) is locked, the locks are kept
+        locked = [item for item in [plug] + locked_plugs if cmds.getAttr(item, lock=True)]
+        for item in locked:
+            cmds.setAttr(item, lock=False)
+        cmds.setAttr(plug, *values, **kwargs)
+        for item in locked:
+            cmds.setAttr(item, lock=True)
+
+    def _disconnect_extra(self, existing: List[str]):
+
+        # Connections to the utility nodes the builders made (createNode), from rig nodes, that the desired rig lacks
+        utilities = {
+            result
+            for step in self.plan.steps if step.command in ("createNode", "shadingNode")
+            for result in _strings(step.result)
+        }
+        owned = self.created | self.seeded
+
+        scene_names = {self.scene_name(name): name for name in existing}
+
+        for name in existing:
+            if name not in utilities:
+                continue
+
+            desired_inputs = self._desired_inputs(name)
+
+            for destination, source in self._read_inputs(name):
+                source_name = scene_names.get(source.partition(".")[0])
+                if source_name is None or source_name not in owned:
+                    continue
+
+                desired_pair = (name + "." + destination.partition(".")[2], source_name + "." + source.partition(".")[2])
+                if desired_pair in desired_inputs:
+                    continue
+
+                cmds.disconnectAttr(source, destination)
+                self.counts["disconnected"] += 1
+
+    def _whole_stages(self, existing: List[str]):
+
+        # A stage rebuilt as a whole is deleted, all its steps then run again
+        present = set(existing)
+
+        for stage in WHOLE_STAGES:
+            nodes = [
+                name
+                for step in self.plan.steps if step.stage == stage and step.command not in EDIT_COMMANDS
+                for name in _strings(step.result) if name in self.created
+            ]
+            missing = [name for name in nodes if name not in present and name not in self.anonymous]
+            if not nodes or not missing and not present.intersection(nodes) & self.moved:
+                continue
+
+            self.redo.add(stage)
+            for name in nodes:
+                if name in present and cmds.objExists(self.scene_name(name)):
+                    cmds.delete(self.scene_name(name))
+                    self.counts["deleted"] += 1
+                self.names.pop(name, None)
+
+    # --------------------------------------------------------------------
+    # Steps
+
+    def _references(self, step):
+
+        # Nodes of the plan a step uses (names, plugs), not the other strings (types, values)
+        names = _strings(step.args) + [name for _, value in step.kwargs for name in _strings(value)]
+        return {name.partition(".")[0] for name in names} & self.known
+
+    def _run(self, step):
+        kwargs = {key: rename_recorded(value, self.names) for key, value in step.kwargs}
+        result = getattr(cmds, step.command)(*rename_recorded(step.args, self.names), **kwargs)
+        if step.result is not None:
+            map_recorded_names(step.result, result, self.names)
+        self.counts["run"] += 1
+        return result
+
+    def _creation_needed(self, step, references: Set[str]):
+
+        results = _strings(step.result)
+        main = results[0]
+        fresh = (references - set(results)) & self.fresh
+
+        if not self.exists(main):
+            # A temporary node (controls templates) is only made again for the steps to run
+            return main in self.desired or main in self.temporaries or bool(fresh)
+
+        kwargs = dict(step.kwargs)
+        stale = bool(fresh & self.created)
+
+        if step.command in GEOMETRY_COMMANDS or step.command in OFFSET_CONSTRAINTS and kwargs.get("mo", kwargs.get("maintainOffset")):
+            stale = stale or bool(references & self.moved) or main in self.moved
+
+        if stale:
+            for name in results:
+                if self.exists(name):
+                    cmds.delete(self.scene_name(name))
+                self.names.pop(name, None)
+        return stale
+
+    def _edit_needed(self, step, references: Set[str]):
+
+        # New nodes are set up, existing nodes are only edited for the new nodes they use (not for temporary ones)
+        persistent = references & self.desired.keys()
+        if persistent & self.fresh or references & self.fresh and not persistent:
+            return True
+
+        command, args, kwargs = step.command, step.args, dict(step.kwargs)
+
+        # Temporary nodes (controls templates) are set up when they are made again, shapes included
+        plugs = [str(plug).partition(".")[0] for plug in (args[:2] if command == "connectAttr" else args[:1])]
+        temporary = [node for node in plugs if node not in self.desired]
+        if temporary:
+            return all(node in self.fresh or node.endswith("Shape") and node[:-5] in self.fresh for node in temporary)
+
+        if command == "setAttr":
+            plug = args[0]
+            scene_plug = self.scene_name(plug)
+
+            flags = [flag for flag in ("lock", "l", "keyable", "k") if flag in kwargs]
+            if flags and len(args) == 1:
+                return any(
+                    cmds.getAttr(scene_plug, **{flag: True}) != self._desired_attr(plug, **{flag: True})
+                    for flag in flags
+                )
+
+            # Values of driven plugs are not owned, a plug the plan connects later is set first (e.g. a bake)
+            if self.scene.listConnections(plug, s=True, d=False) and cmds.listConnections(scene_plug, s=True, d=False):
+                return False
+            try:
+                return not _same(cmds.getAttr(scene_plug), self._desired_attr(plug))
+            except (RuntimeError, ValueError):
+                return True
+
+        if command == "connectAttr":
+            return not cmds.isConnected(self.scene_name(args[0]), self.scene_name(args[1]), ignoreUnitConversion=True)
+
+        if command == "addAttr":
+            name = kwargs.get("ln", kwargs.get("longName"))
+            return not cmds.attributeQuery(name, n=self.scene_name(args[0]), ex=True)
+
+        # Transforms and parents of existing nodes were settled
+        return False
+
+    def _find_temporaries(self):
+
+        # Temporary nodes used by the steps making missing nodes, and the temporary nodes those need
+        temporaries: Set[str] = set()
+        for step in self.plan.steps:
+            results = _strings(step.result)
+            if step.stage in self.redo or step.command not in EDIT_COMMANDS and results and results[0] in self.desired and not self.exists(results[0]):
+                temporaries.update(self._references(step) - self.desired.keys())
+
+        grown = True
+        while grown:
+            grown = False
+            for step in self.plan.steps:
+                names = (self._references(step) | set(_strings(step.result))) - self.desired.keys()
+                if names & temporaries and not names <= temporaries:
+                    temporaries.update(names)
+                    grown = True
+
+        self.temporaries = temporaries
+
+    def _apply_steps(self):
+
+        for step in self.plan.steps:
+            references = self._references(step)
+
+            if step.stage in self.redo and step.command != "addAttr":
+                needed = True
+            elif step.command not in EDIT_COMMANDS and _strings(step.result):
+                needed = self._creation_needed(step, references)
+            else:
+                needed = self._edit_needed(step, references)
+
+            if not needed:
+                self.counts["skipped"] += 1
+                continue
+
+            if step.command == "setAttr" and len(step.args) > 1 and not references & self.fresh:
+                plug = self.scene_name(step.args[0])
+                self._set_unlocked(plug, [], *rename_recorded(step.args[1:], self.names), **dict(step.kwargs))
+                self.counts["run"] += 1
+            else:
+                self._run(step)
+
+            if step.command not in EDIT_COMMANDS:
+                self.fresh.update(_strings(step.result))
+
+    def run(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - dict
+
+        ###################################
+
+        start = time.perf_counter()
+
+        if self.plan.uses_node_type(SOLVER_NODE_TYPE):
+            load_plugin()
+
+        with performance_mode(self.name), keep_selection(), BuildTransaction(self.name) as transaction:
+
+            tables = self._manifest_tables()
+            self._map_manifest_names(tables)
+            self._map_anonymous_names()
+
+            self._reparent(self._existing())
+            self._delete_removed(tables)
+            self._delete_attributes()
+
+            existing = self._existing()
+            self._settle(existing)
+            self._disconnect_extra(existing)
+            self._whole_stages(existing)
+
+            self._find_temporaries()
+            self._apply_steps()
+
+        report = {"limb": self.plan.name, "steps": len(self.plan.steps), "created": transaction.created}
+        report.update(self.counts)
+        report["total"] = time.perf_counter() - start
+        return report
+
+
+def rebuild_limb(config: LimbConfig):
+
+    ###################################
+
+    # Inputs - config, LimbConfig
+    # Returns - dict
+
+    # Brings the rig of the limb of config up to date with its skeleton and
+    # options, changing only what differs (see above). A limb never built is
+    # simply built. The report counts the plan steps run and skipped, and
+    # the nodes reparented, deleted, settled and disconnected.
+
+    ###################################
+
+    return LimbRebuild(config).run()
@@ -0,0 +1,348 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+from typing import *
+
+from config import LimbConfig
+from plan import PLAN_VERSION, BuildPlan, compile_with_scene, execute_plan, load_plan, read_seeds
+from preflight import preflight
+
+
+###################################
+
+# Rig template cache, for crowds : many characters sharing the same
+# skeleton proportions get the same limb rig. The compiled build plan
+# (plan.py) of a limb is stored on disk under a hash of its skeleton and
+# its build options, and the next limb with the same hash replays it
+# instead of compiling it again, into the namespace of its skeleton.
+
+# cache = RigCache(max_size=64 * 1024 * 1024)
+# build_cached(LimbConfig("agent_01:SK_shoulder_L", "agent_01:CTRL_switch_arm_L"), cache)   -> "miss"
+# build_cached(LimbConfig("agent_02:SK_shoulder_L", "agent_02:CTRL_switch_arm_L"), cache)   -> "hit"
+
+# The plans are compiled on the skeleton without its namespace, with the
+# parent of its root joint at the origin : the rig built from the cache is
+# the same for every character, only its namespace and its placement (the
+# world matrix of that parent) change. The least recently used plans are deleted once the
+# cache is over its size on disk.
+
+###################################
+
+
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), "limb_rig_cache")
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+PLAN_EXTENSION = ".plan"
+
+# Skeleton values are hashed rounded, a skeleton exported again still hits
+KEY_DIGITS = 4
+
+# Options of LimbConfig holding node names
+NAME_OPTIONS = ("root_joint", "switch", "foot_root")
+
+
+def strip_namespace(name: str):
+
+    # "agent_01:SK_shoulder_L" -> "SK_shoulder_L", for every part of a path
+    return "|".join(part.rpartition(":")[2] for part in name.split("|"))
+
+
+def namespace_of(name: str):
+
+    # "agent_01:SK_shoulder_L" -> "agent_01", "" for the root namespace
+    return name.split("|")[-1].rpartition(":")[0].lstrip(":")
+
+
+def _rounded(value: Any):
+    if isinstance(value, float):
+        # + 0.0 : -0.0 and 0.0 give the same key
+        return round(value, KEY_DIGITS) + 0.0
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_rounded(item) for item in value]
+    return value
+
+
+def rig_template(config: LimbConfig):
+
+    ###################################
+
+    # Inputs - config, LimbConfig
+    # Returns - (LimbConfig, List[dict], Dict[str, str], List[float])
+
+    # The limb without namespaces : its config, its skeleton (plan.read_seeds),
+    # the names of the skeleton in the scene by name without namespace, and
+    # the placement, the world matrix of the parent of the root joint. The
+    # skeleton is relative to the placement : the seeds without a copied
+    # parent (that parent, the switch...) keep their world matrix times
+    # the inverse of the placement. Identity when the root joint has no parent.
+
+    ###################################
+
+    seeds = read_seeds(config)
+
+    root_parent = (cmds.listRelatives(config.root_joint, p=True) or [None])[0]
+    placement = om.MMatrix(cmds.xform(root_parent, q=True, ws=True, m=True)) if root_parent else om.MMatrix()
+    inverse = placement.inverse()
+
+    names: Dict[str, str] = {}
+    template_seeds: List[Dict[str, Any]] = []
+    for seed in seeds:
+        name = strip_namespace(seed["name"])
+        names[name] = seed["name"]
+        template_seed = dict(seed, name=name, parent=strip_namespace(seed["parent"]) if seed["parent"] else None)
+
+        if root_parent and seed["parent"] is None:
+            world = om.MMatrix(seed["world"] if "world" in seed else cmds.xform(seed["name"], q=True, ws=True, m=True))
+            template_seed.pop("channels", None)
+            template_seed.pop("offsetParentMatrix", None)
+            template_seed["world"] = list(world * inverse)
+
+        template_seeds.append(template_seed)
+
+    data = config.to_dict()
+    for option in NAME_OPTIONS:
+        if data.get(option):
+            data[option] = strip_namespace(data[option])
+
+    return LimbConfig.from_dict(data), template_seeds, names, list(placement)
+
+
+def template_key(config: LimbConfig, seeds: List[Dict[str, Any]]):
+
+    ###################################
+
+    # Inputs - config, LimbConfig; seeds, List[dict]
+    # Returns - str
+
+    # Hash of the skeleton relative to its placement (rig_template) and of
+    # every build option (limb type, stretch, better pole, bendy, hand, foot
+    # roll...) : two limbs with the same key get the same rig, wherever
+    # their characters stand
+
+    ###################################
+
+    data = {"version": PLAN_VERSION, "options": config.to_dict(), "skeleton": _rounded(seeds)}
+    return hashlib.sha1(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class RigCache:
+
+    ###################################
+
+    # Build plans on disk, one file per key. Reading a plan marks it as
+    # used (file modification time), the least recently used plans are
+    # deleted first when the files take more than max_size bytes.
+
+    ###################################
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = int(max_size)
+
+    def __repr__(self):
+        return f"RigCache({self.directory!r}, {self.max_size})"
+
+    def path(self, key: str):
+        return os.path.join(self.directory, key + PLAN_EXTENSION)
+
+    def get(self, key: str):
+
+        ###################################
+
+        # Inputs - key, str
+        # Returns - BuildPlan, None if the key is not cached
+
+        ###################################
+
+        path = self.path(key)
+        try:
+            plan = load_plan(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, KeyError):
+            # Truncated, or written by another version of the tool
+            self._remove(path)
+            return None
+
+        os.utime(path)
+        return plan
+
+    def put(self, key: str, plan: BuildPlan):
+
+        ###################################
+
+        # Inputs - key, str; plan, BuildPlan
+        # Returns - None
+
+        # Stores the plan, then evicts the least recently used plans
+
+        ###################################
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Written next to its path then moved : other processes sharing the cache never read half a plan
+        path = self.path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        plan.save(temporary)
+        os.replace(temporary, path)
+
+        self.evict()
+
+    def entries(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - List[Tuple[str, int, float]]
+
+        # (path, size, last use) of every cached plan, least recently used first
+
+        ###################################
+
+        if not os.path.isdir(self.directory):
+            return []
+
+        entries: List[Tuple[str, int, float]] = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(PLAN_EXTENSION):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - int, number of plans deleted
+
+        ###################################
+
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+            evicted += 1
+
+        return evicted
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def build_cached(
+    config: LimbConfig, cache: Optional[RigCache] = None, namespace: Optional[str] = None, check: bool = True
+):
+
+    ###################################
+
+    # Inputs - config, LimbConfig; cache, RigCache; namespace, str; check, bool
+    # Returns - dict
+
+    # Rigs the limb from the plan cached for its key, compiled and cached
+    # first on a miss. The rig goes in namespace, by default the namespace
+    # of the root joint, and is moved by the placement of the skeleton. The report is execute_plan's, with "cache" ("hit"
+    # or "miss"), "key" and "lookup" (seconds to get the plan).
+
+    ###################################
+
+    start = time.perf_counter()
+    cache = cache if cache is not None else RigCache()
+
+    if check:
+        report = preflight(config)
+        if not report.ok:
+            raise ValueError(str(report))
+
+    template, seeds, names, placement = rig_template(config)
+    key = template_key(template, seeds)
+
+    plan = cache.get(key)
+    status = "hit"
+    if plan is None:
+        status = "miss"
+        plan = compile_with_scene(template, check=False, seeds=seeds)[0]
+        cache.put(key, plan)
+    lookup = time.perf_counter() - start
+
+    if namespace is None:
+        namespace = namespace_of(config.root_joint)
+
+    # A miss is replayed too : a rig is the same whether it came from the cache or not
+    report = execute_plan(plan, check=check, names=names, namespace=namespace, placement=placement)
+    report.update({
+        "limb": (namespace + ":" if namespace else "") + report["limb"],
+        "root_joint": config.root_joint,
+        "cache": status,
+        "key": key,
+        "lookup": lookup,
+        "total": time.perf_counter() - start,
+    })
+    return report
+
+
+def build_cached_queue(configs: Iterable[LimbConfig], cache: Optional[RigCache] = None, stop_on_error: bool = False):
+
+    ###################################
+
+    # Inputs - configs, Iterable[LimbConfig]; cache, RigCache; stop_on_error, bool
+    # Returns - List[dict]
+
+    # build_cached for every limb, like batch.build_queue : a failed limb
+    # is rolled back and reported, the next ones are built
+
+    ###################################
+
+    cache = cache if cache is not None else RigCache()
+    reports: List[Dict[str, Any]] = []
+
+    for config in configs:
+        try:
+            report = build_cached(config, cache)
+            report["status"] = "ok"
+
+        except Exception as error:
+            if stop_on_error:
+                raise
+
+            # execute_plan has rolled the limb back
+            report = {
+                "limb": config.limb_name + "_" + config.root_joint[-1:],
+                "root_joint": config.root_joint,
+                "status": "error",
+                "error": f"{type(error).__name__}: {error}",
+                "rolled_back": True,
+            }
+
+        reports.append(report)
+        print(f"{report['limb']} : {report['status']} {report.get('cache', '')} ({report.get('total', 0.0):.3f}s)")
+
+    return reports
@@ -0,0 +1,1648 @@
+import fnmatch
+import json
+import math
+import re
+import sys
+import types
+from typing import *
+
+
+###################################
+
+# Pure Python, in-memory stand-in for the subset of maya.cmds (and
+# maya.api.OpenMaya) this tool uses. It tracks nodes, DAG parenting,
+# attributes and connections so the whole rig pipeline can run, and be
+# timed, on a machine without Maya.
+
+# It does not evaluate the DG : constraints, IK handles and utility nodes
+# are created and connected, but do not drive anything. Transforms are
+# kept exact (translate, rotate XYZ, scale, jointOrient and the static
+# offsetParentMatrix), which is what the builders query.
+
+# Usage :
+#   import scene_graph
+#   scene_graph.install()     # before importing library / LimbClass
+#   import LimbClass
+
+###################################
+
+
+Matrix = List[float]
+
+IDENTITY: Matrix = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+# ------------------------------------------------------------------------
+# Matrix helpers (row vectors, like Maya : point * S * R * JO * T)
+
+
+def mat_mult(a: Matrix, b: Matrix):
+    a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11, a12, a13, a14, a15 = a
+    b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11, b12, b13, b14, b15 = b
+    return [
+        a0 * b0 + a1 * b4 + a2 * b8 + a3 * b12,
+        a0 * b1 + a1 * b5 + a2 * b9 + a3 * b13,
+        a0 * b2 + a1 * b6 + a2 * b10 + a3 * b14,
+        a0 * b3 + a1 * b7 + a2 * b11 + a3 * b15,
+        a4 * b0 + a5 * b4 + a6 * b8 + a7 * b12,
+        a4 * b1 + a5 * b5 + a6 * b9 + a7 * b13,
+        a4 * b2 + a5 * b6 + a6 * b10 + a7 * b14,
+        a4 * b3 + a5 * b7 + a6 * b11 + a7 * b15,
+        a8 * b0 + a9 * b4 + a10 * b8 + a11 * b12,
+        a8 * b1 + a9 * b5 + a10 * b9 + a11 * b13,
+        a8 * b2 + a9 * b6 + a10 * b10 + a11 * b14,
+        a8 * b3 + a9 * b7 + a10 * b11 + a11 * b15,
+        a12 * b0 + a13 * b4 + a14 * b8 + a15 * b12,
+        a12 * b1 + a13 * b5 + a14 * b9 + a15 * b13,
+        a12 * b2 + a13 * b6 + a14 * b10 + a15 * b14,
+        a12 * b3 + a13 * b7 + a14 * b11 + a15 * b15,
+    ]
+
+
+def mat_inverse(m: Matrix):
+
+    # Gauss-Jordan elimination on a 4x8 augmented matrix
+    rows = [list(m[i * 4:i * 4 + 4]) + [1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+
+    for col in range(4):
+        pivot = max(range(col, 4), key=lambda row: abs(rows[row][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            raise ValueError("Matrix is not invertible.")
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+
+        factor = rows[col][col]
+        rows[col] = [value / factor for value in rows[col]]
+
+        for row in range(4):
+            if row != col and rows[row][col] != 0.0:
+                scale = rows[row][col]
+                rows[row] = [value - scale * pivot_value for value, pivot_value in zip(rows[row], rows[col])]
+
+    return [value for row in rows for value in row[4:]]
+
+
+def euler_to_matrix(rotation: Sequence[float]):
+
+    # Rx * Ry * Rz, expanded
+    if not any(rotation):
+        return list(IDENTITY)
+
+    x, y, z = (math.radians(angle) for angle in rotation)
+    cx, sx, cy, sy, cz, sz = math.cos(x), math.sin(x), math.cos(y), math.sin(y), math.cos(z), math.sin(z)
+
+    return [
+        cy * cz, cy * sz, -sy, 0.0,
+        sx * sy * cz - cx * sz, sx * sy * sz + cx * cz, sx * cy, 0.0,
+        cx * sy * cz + sx * sz, cx * sy * sz - sx * cz, cx * cy, 0.0,
+        0.0, 0.0, 0.0, 1.0,
+    ]
+
+
+def matrix_to_euler(m: Matrix):
+
+    sin_y = max(-1.0, min(1.0, -m[2]))
+    y = math.asin(sin_y)
+
+    if abs(math.cos(y)) > 1e-9:
+        x = math.atan2(m[6], m[10])
+        z = math.atan2(m[1], m[0])
+    else:
+        # Gimbal lock, put everything in X
+        z = 0.0
+        x = math.atan2(m[4] / sin_y, m[5])
+
+    return [math.degrees(x), math.degrees(y), math.degrees(z)]
+
+
+def compose(
+    translate: Sequence[float],
+    rotate: Sequence[float],
+    scale: Sequence[float],
+    joint_orient: Optional[Sequence[float]] = None,
+):
+    matrix = euler_to_matrix(rotate)
+
+    if joint_orient is not None and any(joint_orient):
+        matrix = mat_mult(matrix, euler_to_matrix(joint_orient))
+
+    for row in range(3):
+        for col in range(3):
+            matrix[row * 4 + col] *= scale[row]
+
+    matrix[12], matrix[13], matrix[14] = translate[0], translate[1], translate[2]
+
+    return matrix
+
+
+def decompose(m: Matrix, joint_orient: Optional[Sequence[float]] = None):
+
+    translate = [m[12], m[13], m[14]]
+    scale = [math.sqrt(sum(m[row * 4 + col] ** 2 for col in range(3))) or 1.0 for row in range(3)]
+
+    rotation = list(IDENTITY)
+    for row in range(3):
+        for col in range(3):
+            rotation[row * 4 + col] = m[row * 4 + col] / scale[row]
+
+    if joint_orient is not None and any(joint_orient):
+        # R * JO = rotation  ->  R = rotation * JO^T
+        orient = euler_to_matrix(joint_orient)
+        transposed = [orient[col * 4 + row] for row in range(4) for col in range(4)]
+        rotation = mat_mult(rotation, transposed)
+
+    return translate, matrix_to_euler(rotation), scale
+
+
+# ------------------------------------------------------------------------
+# Scene graph
+
+
+TRANSFORM_TYPES = {"transform", "joint", "ikHandle", "ikEffector"}
+
+SHAPE_TYPES = {
+    "nurbsCurve",
+    "nurbsSurface",
+    "locator",
+    "follicle",
+    "distanceDimShape",
+    "mesh",
+    "deformSine",
+    "deformTwist",
+}
+
+# Deleted with the geometry they feed
+HISTORY_TYPES = {"makeNurbCircle", "makeNurbPlane", "insertKnotSurface", "skinCluster", "blendShape", "nonLinear"}
+
+CHANNELS = {"translate": 0.0, "rotate": 0.0, "scale": 1.0, "jointOrient": 0.0}
+
+COMPOUNDS = {"overrideColorRGB": ("overrideColorR", "overrideColorG", "overrideColorB")}
+
+
+class Node:
+
+    __slots__ = ("name", "type", "parent", "children", "attrs", "user_attrs", "attr_types", "locked", "keyable")
+
+    def __init__(self, name: str, typ: str):
+        self.name = name
+        self.type = typ
+        self.parent: Optional[Node] = None
+        self.children: List[Node] = []
+        self.attrs: Dict[str, Any] = {}
+        self.user_attrs: Set[str] = set()
+        # Type and enum names (or None) of the user attributes, "double" when not listed
+        self.attr_types: Dict[str, Tuple[str, Optional[str]]] = {}
+        self.locked: Set[str] = set()
+        self.keyable: Dict[str, bool] = {}
+
+    def __repr__(self):
+        return f"Node({self.name!r}, {self.type!r})"
+
+    @property
+    def is_dag(self):
+        return self.type in TRANSFORM_TYPES or self.type in SHAPE_TYPES
+
+    @property
+    def is_transform(self):
+        return self.type in TRANSFORM_TYPES
+
+    def channel(self, name: str):
+        default = CHANNELS[name]
+        return [self.attrs.get(name + axis, default) for axis in "XYZ"]
+
+    def set_channel(self, name: str, values: Sequence[float]):
+        for axis, value in zip("XYZ", values):
+            self.attrs[name + axis] = float(value)
+
+    def local_matrix(self):
+        if not self.is_transform:
+            return list(IDENTITY)
+        joint_orient = self.channel("jointOrient") if self.type == "joint" else None
+        return compose(self.channel("translate"), self.channel("rotate"), self.channel("scale"), joint_orient)
+
+    def offset_parent_matrix(self):
+        # Static value only, like everything else the connection is not evaluated
+        matrix = self.attrs.get("offsetParentMatrix")
+        return [float(value) for value in matrix] if matrix is not None else None
+
+    def transform_matrix(self):
+        # matrix * offsetParentMatrix
+        matrix = self.local_matrix()
+        offset = self.offset_parent_matrix()
+        return mat_mult(matrix, offset) if offset is not None else matrix
+
+    def world_matrix(self):
+        matrix = self.transform_matrix()
+        parent = self.parent
+        while parent is not None:
+            matrix = mat_mult(matrix, parent.transform_matrix())
+            parent = parent.parent
+        return matrix
+
+    def parent_matrix(self):
+        return self.parent.world_matrix() if self.parent is not None else list(IDENTITY)
+
+    def set_world_matrix(self, matrix: Matrix):
+        parent_matrix = self.parent_matrix()
+        offset = self.offset_parent_matrix()
+        if offset is not None:
+            parent_matrix = mat_mult(offset, parent_matrix)
+        local = mat_mult(matrix, mat_inverse(parent_matrix))
+        joint_orient = self.channel("jointOrient") if self.type == "joint" else None
+        translate, rotate, scale = decompose(local, joint_orient)
+        self.set_channel("translate", translate)
+        self.set_channel("rotate", rotate)
+        self.set_channel("scale", scale)
+
+    def descendants(self):
+        # Pre-order, children in creation order
+        result: List[Node] = []
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            result.append(node)
+            stack.extend(reversed(node.children))
+        return result
+
+
+def _flatten(values: Iterable[Any]):
+    result: List[str] = []
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            result.extend(_flatten(value))
+        else:
+            result.append(str(value))
+    return result
+
+
+def _split_plug(plug: str):
+    node_name, _, attr = plug.partition(".")
+    # "colorIfTrue.colorIfTrueR" -> "colorIfTrueR", elements of a multi keep
+    # their index : "target[1].targetMatrix"
+    if "]." not in attr:
+        attr = attr.split(".")[-1]
+    return node_name, attr
+
+
+class Scene:
+
+    ###################################
+
+    # The in-memory scene. Every public method named like a maya.cmds
+    # command behaves like that command for the flags this tool uses.
+
+    ###################################
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes: Dict[str, Node] = {}
+        self.order: List[Node] = []
+        self.connections: Dict[Tuple[Node, str], Tuple[Node, str]] = {}
+        self.selection: List[Node] = []
+        self.scene_name: str = ""
+        self.counters: Dict[str, int] = {}
+        self.namespaces: Set[str] = set()
+        self.current_namespace: str = ""
+
+        # Every name a node was given, including deleted and renamed nodes (plan.py)
+        self.given_names: Set[str] = set()
+
+    # --------------------------------------------------------------------
+    # Internal helpers
+
+    def _node(self, name: Any):
+        if isinstance(name, Node):
+            return name
+        short = str(name).split(".")[0].split("|")
+        short = [part.lstrip(":") for part in short if part]
+        if not short or short[-1] not in self.nodes:
+            raise ValueError(f"No object matches name: {name}")
+        return self.nodes[short[-1]]
+
+    def _plug(self, plug: str):
+        node_name, attr = _split_plug(plug)
+        return self._node(node_name), attr
+
+    def _unique_name(self, name: str):
+        if name not in self.nodes:
+            return name
+        match = re.match(r"^(.*?)(\d*)$", name)
+        base = match.group(1)
+        index = int(match.group(2)) if match.group(2) else 0
+        while True:
+            index += 1
+            candidate = f"{base}{index}"
+            if candidate not in self.nodes:
+                return candidate
+
+    def _namespaced(self, name: str):
+        # New names are relative to the current namespace, a leading ":" makes them absolute
+        if name.startswith(":"):
+            return name[1:]
+        return f"{self.current_namespace}:{name}" if self.current_namespace else name
+
+    def _name_flag(self, kwargs: Dict[str, Any]):
+        name = kwargs.get("name", kwargs.get("n"))
+        return self._namespaced(str(name)) if name else None
+
+    def _default_name(self, typ: str):
+        return self._unique_name(self._namespaced(typ + "1"))
+
+    def _create(self, typ: str, name: Optional[str] = None, parent: Optional[Node] = None):
+        node = Node(self._unique_name(name) if name else self._default_name(typ), typ)
+        self.nodes[node.name] = node
+        self.given_names.add(node.name)
+        self.order.append(node)
+        if parent is not None:
+            node.parent = parent
+            parent.children.append(node)
+        return node
+
+    def _create_with_shape(self, shape_type: str, name: Optional[str], default: str):
+        if name:
+            transform = self._create("transform", name)
+            shape = self._create(shape_type, transform.name + "Shape", transform)
+            return transform, shape
+
+        # Default names share their index : locator3 / locatorShape3
+        index = 1
+        while self._namespaced(f"{default}{index}") in self.nodes or self._namespaced(f"{default}Shape{index}") in self.nodes:
+            index += 1
+        transform = self._create("transform", self._namespaced(f"{default}{index}"))
+        shape = self._create(shape_type, self._namespaced(f"{default}Shape{index}"), transform)
+        return transform, shape
+
+    def _reparent(self, node: Node, parent: Optional[Node], keep_world: bool = True):
+        if node.parent is parent:
+            return
+        world = node.world_matrix() if keep_world and node.is_transform else None
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        node.parent = parent
+        if parent is not None:
+            if parent is node or parent in node.descendants():
+                raise RuntimeError(f"Cannot parent {node.name} under its own descendant.")
+            parent.children.append(node)
+        if world is not None:
+            node.set_world_matrix(world)
+
+    def _select(self, nodes: List[Node]):
+        self.selection = list(nodes)
+
+    def _objects(self, args: Sequence[Any]):
+        names = _flatten(args)
+        if names:
+            return [self._node(name) for name in names]
+        return list(self.selection)
+
+    def _remove(self, node: Node):
+        for child in list(node.children):
+            self._remove(child)
+        if node.parent is not None:
+            node.parent.children.remove(node)
+            node.parent = None
+        for key, value in list(self.connections.items()):
+            if key[0] is node or value[0] is node:
+                del self.connections[key]
+        if node in self.selection:
+            self.selection.remove(node)
+        del self.nodes[node.name]
+        self.order.remove(node)
+
+    def _get(self, node: Node, attr: str):
+        attr = attr.split("[")[0]
+        if attr in CHANNELS and node.is_transform:
+            return [tuple(node.channel(attr))]
+        if attr[:-1] in CHANNELS and attr[-1] in "XYZ" and node.is_transform:
+            return node.channel(attr[:-1])["XYZ".index(attr[-1])]
+        if attr == "distance" and node.type in ("distanceDimShape", "transform"):
+            return self._distance(node)
+        if attr == "distance" and node.type == "distanceBetween":
+            return self._distance_between(node)
+        if attr == "worldMatrix":
+            return node.world_matrix()
+        if attr == "parentMatrix":
+            return node.parent_matrix()
+        if attr == "matrix":
+            return node.local_matrix()
+        if attr == "offsetParentMatrix" and node.is_transform:
+            return node.offset_parent_matrix() or list(IDENTITY)
+        if attr in COMPOUNDS:
+            return [tuple(node.attrs.get(child, 0.0) for child in COMPOUNDS[attr])]
+        if attr in node.attrs:
+            return node.attrs[attr]
+        if node.is_transform:
+            for child in node.children:
+                if not child.is_transform and attr in child.attrs:
+                    return child.attrs[attr]
+        if attr == "visibility":
+            return True
+        return 0.0
+
+    def _distance(self, node: Node):
+        shape = node
+        if node.type == "transform":
+            shapes = [child for child in node.children if child.type == "distanceDimShape"]
+            if not shapes:
+                return node.attrs.get("distance", 0.0)
+            shape = shapes[0]
+        points = []
+        for attr in ("startPoint", "endPoint"):
+            source = self.connections.get((shape, attr))
+            points.append(source[0].world_matrix()[12:15] if source else [0.0, 0.0, 0.0])
+        return math.dist(points[0], points[1])
+
+    def _distance_between(self, node: Node):
+        points = []
+        for index in ("1", "2"):
+            point = [0.0, 0.0, 0.0]
+            source = self.connections.get((node, "point" + index))
+            if source:
+                point = list(self._get(*source)[0])
+            source = self.connections.get((node, f"inMatrix{index}"))
+            if source:
+                matrix = self._get(source[0], source[1])
+                point = [
+                    point[0] * matrix[0] + point[1] * matrix[4] + point[2] * matrix[8] + matrix[12],
+                    point[0] * matrix[1] + point[1] * matrix[5] + point[2] * matrix[9] + matrix[13],
+                    point[0] * matrix[2] + point[1] * matrix[6] + point[2] * matrix[10] + matrix[14],
+                ]
+            points.append(point)
+        return math.dist(points[0], points[1])
+
+    # --------------------------------------------------------------------
+    # Scene queries
+
+    def objExists(self, name: str):
+        try:
+            node, attr = self._plug(name)
+        except ValueError:
+            return False
+        return not attr or self.attributeQuery(attr, n=node.name, ex=True)
+
+    def nodeType(self, name: str):
+        return self._node(name).type
+
+    def ls(self, *args, **kwargs):
+        selection = kwargs.get("selection", kwargs.get("sl", False))
+        typ = kwargs.get("type", kwargs.get("typ"))
+        long_names = kwargs.get("long", kwargs.get("l", False))
+        patterns = _flatten(args)
+
+        if selection:
+            nodes = list(self.selection)
+        elif patterns:
+            nodes = []
+            for pattern in patterns:
+                pattern = pattern.split("|")[-1].lstrip(":")
+                if any(char in pattern for char in "*?["):
+                    nodes.extend(node for node in self.order if fnmatch.fnmatchcase(node.name, pattern))
+                elif pattern.split(".")[0] in self.nodes:
+                    nodes.append(self.nodes[pattern.split(".")[0]])
+        else:
+            nodes = list(self.order)
+
+        if typ:
+            types_filter = set(_flatten([typ]))
+            nodes = [node for node in nodes if node.type in types_filter]
+
+        return [self._long_name(node) if long_names else node.name for node in nodes]
+
+    def _long_name(self, node: Node):
+        path = []
+        while node is not None:
+            path.append(node.name)
+            node = node.parent
+        return "|" + "|".join(reversed(path))
+
+    def listRelatives(self, *args, **kwargs):
+        all_descendents = kwargs.get("allDescendents", kwargs.get("ad", False))
+        parent = kwargs.get("parent", kwargs.get("p", False))
+        shapes = kwargs.get("shapes", kwargs.get("s", False))
+        typ = kwargs.get("type", kwargs.get("typ"))
+        full_path = kwargs.get("fullPath", kwargs.get("f", False))
+
+        result: List[Node] = []
+        for node in self._objects(args):
+            if parent:
+                if node.parent is not None:
+                    result.append(node.parent)
+            elif all_descendents:
+                # Maya lists the deepest nodes first
+                result.extend(reversed(node.descendants()))
+            else:
+                result.extend(node.children)
+
+        if shapes:
+            result = [node for node in result if not node.is_transform]
+        if typ:
+            result = [node for node in result if node.type in set(_flatten([typ]))]
+
+        if not result:
+            return None
+        return [self._long_name(node) if full_path else node.name for node in result]
+
+    def listConnections(self, *args, **kwargs):
+        source = kwargs.get("source", kwargs.get("s", True))
+        destination = kwargs.get("destination", kwargs.get("d", True))
+        plugs = kwargs.get("plugs", kwargs.get("p", False))
+        typ = kwargs.get("type", kwargs.get("t"))
+        pairs = kwargs.get("connections", kwargs.get("c", False))
+
+        result: List[str] = []
+        for name in _flatten(args):
+            node, attr = self._plug(name)
+            for (dst_node, dst_attr), (src_node, src_attr) in self.connections.items():
+                if source and dst_node is node and (not attr or dst_attr == attr):
+                    if not typ or src_node.type == typ:
+                        if pairs:
+                            result.append(f"{dst_node.name}.{dst_attr}")
+                        result.append(f"{src_node.name}.{src_attr}" if plugs else src_node.name)
+                if destination and src_node is node and (not attr or src_attr == attr):
+                    if not typ or dst_node.type == typ:
+                        if pairs:
+                            result.append(f"{src_node.name}.{src_attr}")
+                        result.append(f"{dst_node.name}.{dst_attr}" if plugs else dst_node.name)
+        return result
+
+    def attributeQuery(self, attr: str, **kwargs):
+        node = self._node(kwargs.get("node", kwargs.get("n")))
+        if kwargs.get("listEnum", kwargs.get("le", False)):
+            typ, names = node.attr_types.get(attr, ("double", None))
+            if typ != "enum":
+                raise RuntimeError(f"{node.name}.{attr} is not an enum attribute")
+            return [names]
+        if attr in node.attrs or attr in node.user_attrs:
+            return True
+        if node.is_transform and (attr in CHANNELS or attr[:-1] in CHANNELS or attr == "visibility"):
+            return True
+        return False
+
+    def listAttr(self, *args, **kwargs):
+        node = self._objects(args)[0]
+        if kwargs.get("userDefined", kwargs.get("ud", False)):
+            return sorted(node.user_attrs) or None
+        return sorted(set(node.attrs) | node.user_attrs) or None
+
+    def getAttr(self, plug: str, **kwargs):
+        node, attr = self._plug(plug)
+        if kwargs.get("lock", kwargs.get("l", False)):
+            return attr in node.locked
+        if kwargs.get("keyable", kwargs.get("k", False)):
+            return node.keyable.get(attr, node.is_transform)
+        if kwargs.get("type", False):
+            return self._attr_type(node, attr)
+        return self._get(node, attr)
+
+    def _attr_type(self, node: Node, attr: str):
+        if attr in node.attr_types:
+            return node.attr_types[attr][0]
+        value = self._get(node, attr)
+        if isinstance(value, str):
+            return "string"
+        if isinstance(value, bool):
+            return "bool"
+        if isinstance(value, (list, tuple)):
+            return "matrix" if len(value) == 16 else "double3"
+        return "double"
+
+    def xform(self, *args, **kwargs):
+        query = kwargs.get("query", kwargs.get("q", False))
+        world_space = kwargs.get("worldSpace", kwargs.get("ws", False))
+        translation = kwargs.get("translation", kwargs.get("t"))
+        rotation = kwargs.get("rotation", kwargs.get("ro"))
+        matrix = kwargs.get("matrix", kwargs.get("m"))
+
+        nodes = self._objects(args)
+
+        if query:
+            node = nodes[0]
+            if matrix:
+                return node.world_matrix() if world_space else node.local_matrix()
+            if rotation:
+                if world_space:
+                    return decompose(node.world_matrix())[1]
+                return node.channel("rotate")
+            if world_space:
+                return node.world_matrix()[12:15]
+            return node.channel("translate")
+
+        for node in nodes:
+            if matrix is not None and not isinstance(matrix, bool):
+                if world_space:
+                    node.set_world_matrix([float(value) for value in matrix])
+                else:
+                    translate, rotate, scale = decompose([float(value) for value in matrix])
+                    node.set_channel("translate", translate)
+                    node.set_channel("rotate", rotate)
+                    node.set_channel("scale", scale)
+            if translation is not None and not isinstance(translation, bool):
+                if world_space:
+                    world = node.world_matrix()
+                    world[12:15] = [float(value) for value in translation]
+                    node.set_world_matrix(world)
+                else:
+                    node.set_channel("translate", translation)
+            if rotation is not None and not isinstance(rotation, bool):
+                node.set_channel("rotate", rotation)
+
+    # --------------------------------------------------------------------
+    # Selection and naming
+
+    def select(self, *args, **kwargs):
+        if kwargs.get("clear", kwargs.get("cl", False)):
+            self.selection = []
+            return
+        nodes = [self._node(name) for name in _flatten(args)]
+        if kwargs.get("add", False):
+            self.selection.extend(node for node in nodes if node not in self.selection)
+        elif kwargs.get("deselect", kwargs.get("d", False)):
+            self.selection = [node for node in self.selection if node not in nodes]
+        else:
+            self.selection = nodes
+
+    def rename(self, *args, **kwargs):
+        if len(args) == 1:
+            node, new_name = self.selection[0], args[0]
+        else:
+            node, new_name = self._node(args[0]), args[1]
+        del self.nodes[node.name]
+        node.name = self._unique_name(self._namespaced(str(new_name)))
+        self.nodes[node.name] = node
+        self.given_names.add(node.name)
+        return node.name
+
+    # --------------------------------------------------------------------
+    # Node creation
+
+    def createNode(self, typ: str, **kwargs):
+        name = self._name_flag(kwargs)
+        parent = kwargs.get("parent", kwargs.get("p"))
+        parent_node = self._node(parent) if parent else None
+
+        if typ in SHAPE_TYPES and parent_node is None:
+            parent_node = self._create("transform", self._default_name(typ))
+
+        node = self._create(typ, name, parent_node)
+        if not kwargs.get("skipSelect", kwargs.get("ss", False)):
+            self._select([node])
+        return node.name
+
+    def shadingNode(self, typ: str, **kwargs):
+        node = self._create(typ, self._name_flag(kwargs))
+        return node.name
+
+    def group(self, *args, **kwargs):
+        name = self._name_flag(kwargs)
+        empty = kwargs.get("empty", kwargs.get("em", False))
+        parent = kwargs.get("parent", kwargs.get("p"))
+        world = kwargs.get("world", kwargs.get("w", False))
+
+        nodes = [] if empty else self._objects(args)
+
+        group_parent = None
+        if parent:
+            group_parent = self._node(parent)
+        elif nodes and not world:
+            group_parent = nodes[0].parent
+
+        group = self._create("transform", name or self._default_name("group"), group_parent)
+        for node in nodes:
+            self._reparent(node, group, keep_world=False)
+        self._select([group])
+        return group.name
+
+    def joint(self, *args, **kwargs):
+        name = self._name_flag(kwargs)
+        position = kwargs.get("position", kwargs.get("p"))
+
+        parent = None
+        if self.selection:
+            parent = self.selection[0]
+            if not parent.is_transform:
+                parent = parent.parent
+
+        node = self._create("joint", name or self._default_name("joint"), parent)
+        node.attrs["radius"] = float(kwargs.get("radius", kwargs.get("rad", 1.0)))
+        if position is not None:
+            world = node.world_matrix()
+            world[12:15] = [float(value) for value in position]
+            node.set_world_matrix(world)
+        self._select([node])
+        return node.name
+
+    def spaceLocator(self, *args, **kwargs):
+        transform, _ = self._create_with_shape("locator", self._name_flag(kwargs), "locator")
+        position = kwargs.get("position", kwargs.get("p"))
+        if position is not None:
+            transform.set_channel("translate", position)
+        self._select([transform])
+        return [transform.name]
+
+    def circle(self, *args, **kwargs):
+        transform, shape = self._create_with_shape("nurbsCurve", self._name_flag(kwargs), "nurbsCircle")
+        shape.attrs["radius"] = float(kwargs.get("radius", kwargs.get("r", 1.0)))
+        shape.attrs["spans"] = int(kwargs.get("sections", kwargs.get("s", 8)))
+        shape.attrs["normal"] = tuple(kwargs.get("normal", kwargs.get("nr", (0, 0, 1))))
+        self._select([transform])
+        if kwargs.get("constructionHistory", kwargs.get("ch", True)):
+            history = self._create("makeNurbCircle")
+            self.connections[(shape, "create")] = (history, "outputCurve")
+            return [transform.name, history.name]
+        return [transform.name]
+
+    def curve(self, *args, **kwargs):
+        transform, shape = self._create_with_shape("nurbsCurve", self._name_flag(kwargs), "curve")
+        shape.attrs["degree"] = int(kwargs.get("degree", kwargs.get("d", 3)))
+        shape.attrs["points"] = [tuple(point) for point in kwargs.get("point", kwargs.get("p", []))]
+        shape.attrs["knots"] = list(kwargs.get("knot", kwargs.get("k", [])))
+        self._select([transform])
+        return transform.name
+
+    def nurbsPlane(self, *args, **kwargs):
+        transform, shape = self._create_with_shape("nurbsSurface", self._name_flag(kwargs), "nurbsPlane")
+        shape.attrs["patchesU"] = int(kwargs.get("patchesU", kwargs.get("u", 1)))
+        shape.attrs["width"] = float(kwargs.get("width", kwargs.get("w", 1.0)))
+        shape.attrs["lengthRatio"] = float(kwargs.get("lengthRatio", kwargs.get("lr", 1.0)))
+        history = self._create("makeNurbPlane")
+        self.connections[(shape, "create")] = (history, "outputSurface")
+        self._select([transform])
+        return [transform.name, history.name]
+
+    def insertKnotSurface(self, *args, **kwargs):
+        surface = self._objects(args)[0]
+        node = self._create("insertKnotSurface")
+        shapes = [child for child in surface.children if not child.is_transform]
+        if shapes:
+            # Inserted in the construction history of the surface
+            source = self.connections.get((shapes[0], "create"))
+            if source is not None:
+                self.connections[(node, "inputSurface")] = source
+            self.connections[(shapes[0], "create")] = (node, "outputSurface")
+        return [surface.name, node.name]
+
+    def distanceDimension(self, **kwargs):
+        points = [kwargs.get("startPoint", kwargs.get("sp")), kwargs.get("endPoint", kwargs.get("ep"))]
+
+        locators = []
+        for point in points:
+            existing = [
+                node for node in self.order
+                if node.type == "transform"
+                and any(child.type == "locator" for child in node.children)
+                and all(abs(a - b) < 1e-6 for a, b in zip(node.world_matrix()[12:15], point))
+            ]
+            if existing:
+                locators.append(existing[0])
+            else:
+                locator, _ = self._create_with_shape("locator", None, "locator")
+                locator.set_channel("translate", point)
+                locators.append(locator)
+
+        transform, shape = self._create_with_shape("distanceDimShape", None, "distanceDimension")
+        self.connections[(shape, "startPoint")] = (locators[0].children[0], "worldPosition")
+        self.connections[(shape, "endPoint")] = (locators[1].children[0], "worldPosition")
+        return shape.name
+
+    def ikHandle(self, *args, **kwargs):
+        name = self._name_flag(kwargs)
+        start_joint = self._node(kwargs.get("startJoint", kwargs.get("sj")))
+        end_effector = self._node(kwargs.get("endEffector", kwargs.get("ee")))
+
+        effector = self._create("ikEffector", self._default_name("effector"), end_effector.parent)
+        handle = self._create("ikHandle", name or self._default_name("ikHandle"))
+        handle.attrs["ikSolver"] = kwargs.get("solver", kwargs.get("sol", "ikRPsolver"))
+
+        world = handle.world_matrix()
+        world[12:15] = end_effector.world_matrix()[12:15]
+        handle.set_world_matrix(world)
+
+        self.connections[(handle, "startJoint")] = (start_joint, "message")
+        self.connections[(handle, "endEffector")] = (effector, "handlePath")
+        self._select([handle])
+        return [handle.name, effector.name]
+
+    def _constraint(self, typ: str, args: Sequence[Any], kwargs: Dict[str, Any]):
+        nodes = [self._node(name) for name in _flatten(args)]
+        targets, constrained = nodes[:-1], nodes[-1]
+        name = self._name_flag(kwargs) or f"{constrained.name}_{typ}1"
+
+        constraint = self._create(typ, name, constrained if constrained.is_transform else None)
+        constraint.attrs["maintainOffset"] = bool(kwargs.get("maintainOffset", kwargs.get("mo", False)))
+        for index, target in enumerate(targets):
+            self.connections[(constraint, f"target[{index}].targetParentMatrix")] = (target, "parentMatrix")
+            constraint.attrs[f"{target.name.split(':')[-1]}W{index}"] = float(kwargs.get("weight", kwargs.get("w", 1.0)))
+
+        self.connections[(constrained, f"{typ}Driver")] = (constraint, "constraintOutput")
+        return [constraint.name]
+
+    def parentConstraint(self, *args, **kwargs):
+        return self._constraint("parentConstraint", args, kwargs)
+
+    def pointConstraint(self, *args, **kwargs):
+        return self._constraint("pointConstraint", args, kwargs)
+
+    def orientConstraint(self, *args, **kwargs):
+        return self._constraint("orientConstraint", args, kwargs)
+
+    def scaleConstraint(self, *args, **kwargs):
+        return self._constraint("scaleConstraint", args, kwargs)
+
+    def aimConstraint(self, *args, **kwargs):
+        return self._constraint("aimConstraint", args, kwargs)
+
+    def poleVectorConstraint(self, *args, **kwargs):
+        return self._constraint("poleVectorConstraint", args, kwargs)
+
+    def duplicate(self, *args, **kwargs):
+        name = self._name_flag(kwargs)
+        result = []
+        for node in self._objects(args):
+            copy = self._copy(node, name, node.parent)
+            result.append(copy.name)
+        self._select([self.nodes[name] for name in result])
+        return result
+
+    def _copy(self, node: Node, name: Optional[str], parent: Optional[Node]):
+        copy = self._create(node.type, name or node.name, parent)
+        copy.attrs = dict(node.attrs)
+        copy.user_attrs = set(node.user_attrs)
+        copy.attr_types = dict(node.attr_types)
+        copy.locked = set(node.locked)
+        for child in node.children:
+            child_name = child.name.replace(node.name, copy.name) if node.name in child.name else child.name
+            self._copy(child, child_name, copy)
+        return copy
+
+    def _deform(self, geometry: Node, deformer: Node, index: int):
+        # Deformers are chained, the previous history feeds the new deformer
+        source = self.connections.get((geometry, "create"))
+        if source is not None:
+            self.connections[(deformer, f"input[{index}].inputGeometry")] = source
+        self.connections[(geometry, "create")] = (deformer, f"outputGeometry[{index}]")
+
+    def blendShape(self, *args, **kwargs):
+        nodes = self._objects(args)
+        targets, base = nodes[:-1], nodes[-1]
+        blendshape = self._create("blendShape", self._name_flag(kwargs))
+        for index, target in enumerate(targets):
+            blendshape.attrs[target.name] = 0.0
+            blendshape.user_attrs.add(target.name)
+            self.connections[(blendshape, f"inputTarget[{index}]")] = (target, "worldSpace")
+        self._deform(base, blendshape, 0)
+        return [blendshape.name]
+
+    def nonLinear(self, *args, **kwargs):
+        name = self._name_flag(kwargs)
+        typ = kwargs.get("type", kwargs.get("typ"))
+        nodes = self._objects(args)
+
+        deformer = self._create("nonLinear", name or self._default_name(typ))
+        handle, handle_shape = self._create_with_shape(f"deform{typ.capitalize()}", deformer.name + "Handle", "handle")
+        self.connections[(deformer, "deformerData")] = (handle_shape, "deformerData")
+        for index, node in enumerate(nodes):
+            self._deform(node, deformer, index)
+        self._select([handle])
+        return [deformer.name, handle.name]
+
+    def skinCluster(self, *args, **kwargs):
+        nodes = self._objects(args)
+        influences, geometry = nodes[:-1], nodes[-1]
+        skin = self._create("skinCluster", self._name_flag(kwargs))
+        for index, influence in enumerate(influences):
+            self.connections[(skin, f"matrix[{index}]")] = (influence, "worldMatrix[0]")
+        self._deform(geometry, skin, 0)
+        return [skin.name]
+
+    # --------------------------------------------------------------------
+    # DAG edits
+
+    def parent(self, *args, **kwargs):
+        world = kwargs.get("world", kwargs.get("w", False))
+        relative = kwargs.get("relative", kwargs.get("r", False))
+        names = _flatten(args)
+
+        if world:
+            children, parent = [self._node(name) for name in names], None
+        else:
+            children, parent = [self._node(name) for name in names[:-1]], self._node(names[-1])
+            if parent.type not in TRANSFORM_TYPES:
+                raise RuntimeError(f"{parent.name} is not a transform.")
+
+        for child in children:
+            self._reparent(child, parent, keep_world=not relative)
+        return [child.name for child in children]
+
+    def _remove_history(self, nodes: List[Node]):
+        # Like Maya, construction history and deformers left without outputs are deleted, up the chain
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if node.name not in self.nodes or node.type not in HISTORY_TYPES:
+                continue
+            if any(source[0] is node for source in self.connections.values()):
+                continue
+            stack.extend(source[0] for (destination, _), source in self.connections.items() if destination is node)
+            self._remove(node)
+
+    def delete(self, *args, **kwargs):
+        if kwargs.get("constructionHistory", kwargs.get("ch", False)):
+            for node in self._objects(args):
+                for shape in [node] + node.children:
+                    source = self.connections.pop((shape, "create"), None)
+                    if source is not None:
+                        self._remove_history([source[0]])
+            return
+        for node in self._objects(args):
+            if node.name in self.nodes:
+                removed = {node} | set(node.descendants())
+                sources = [source[0] for (destination, _), source in self.connections.items() if destination in removed]
+                self._remove(node)
+                self._remove_history(sources)
+
+    def matchTransform(self, *args, **kwargs):
+        names = _flatten(args)
+        nodes, target = [self._node(name) for name in names[:-1]], self._node(names[-1])
+
+        flags = {key: kwargs.get(key) for key in ("pos", "rot", "scl", "px", "py", "pz", "rx", "ry", "rz")}
+        flags["pos"] = flags["pos"] or kwargs.get("position")
+        flags["rot"] = flags["rot"] or kwargs.get("rotation")
+        flags["scl"] = flags["scl"] or kwargs.get("scale")
+
+        if not any(flags.values()):
+            axes_translate, axes_rotate, match_scale = (0, 1, 2), True, True
+        else:
+            axes_translate = tuple(i for i, axis in enumerate("xyz") if flags["pos"] or flags["p" + axis])
+            axes_rotate = bool(flags["rot"] or flags["rx"] or flags["ry"] or flags["rz"])
+            match_scale = bool(flags["scl"])
+
+        target_world = target.world_matrix()
+        target_translate, target_rotate, target_scale = decompose(target_world)
+
+        for node in nodes:
+            translate, rotate, scale = decompose(node.world_matrix())
+            for axis in axes_translate:
+                translate[axis] = target_translate[axis]
+            if axes_rotate:
+                rotate = target_rotate
+            if match_scale:
+                scale = target_scale
+            node.set_world_matrix(compose(translate, rotate, scale))
+
+    def makeIdentity(self, *args, **kwargs):
+        flags = [kwargs.get(long, kwargs.get(short)) for long, short in (("translate", "t"), ("rotate", "r"), ("scale", "s"))]
+        if all(flag is None for flag in flags):
+            flags = [True, True, True]
+        translate, rotate, scale = (bool(flag) for flag in flags)
+
+        for node in self._objects(args):
+            if rotate:
+                if node.type == "joint":
+                    # Rotations are baked in the joint orient
+                    local = node.local_matrix()
+                    _, orient, _ = decompose(local)
+                    node.set_channel("jointOrient", orient)
+                node.set_channel("rotate", (0.0, 0.0, 0.0))
+            if translate and node.type != "joint":
+                node.set_channel("translate", (0.0, 0.0, 0.0))
+            if scale:
+                node.set_channel("scale", (1.0, 1.0, 1.0))
+
+    def rotate(self, *args, **kwargs):
+        values = [float(value) for value in args if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        names = [value for value in args if not isinstance(value, (int, float))]
+        nodes = self._objects(names)
+
+        axes = [axis for axis in "xyz" if kwargs.get(axis)] or list("xyz")
+        for node in nodes:
+            current = node.channel("rotate")
+            for axis, value in zip(axes, values):
+                index = "xyz".index(axis)
+                if kwargs.get("relative", kwargs.get("r", False)):
+                    current[index] += value
+                else:
+                    current[index] = value
+            node.set_channel("rotate", current)
+
+    # --------------------------------------------------------------------
+    # Attributes
+
+    def addAttr(self, *args, **kwargs):
+        node = self._objects(args)[0]
+        name = kwargs.get("longName", kwargs.get("ln"))
+        if name in node.user_attrs:
+            raise RuntimeError(f"Found more than one attribute named {name} on {node.name}")
+        node.user_attrs.add(name)
+
+        data_type = kwargs.get("dataType", kwargs.get("dt"))
+        typ = data_type or kwargs.get("attributeType", kwargs.get("at", "double"))
+        node.attr_types[name] = (typ, kwargs.get("enumName", kwargs.get("en")) if typ == "enum" else None)
+        node.attrs[name] = None if data_type else kwargs.get("defaultValue", kwargs.get("dv", 0.0))
+
+    def deleteAttr(self, *args, **kwargs):
+        node, attr = self._plug(_flatten(args)[0])
+        if attr not in node.user_attrs:
+            raise RuntimeError(f"Attribute {attr} is not a dynamic attribute of {node.name}")
+        node.user_attrs.discard(attr)
+        node.attr_types.pop(attr, None)
+        node.attrs.pop(attr, None)
+        node.locked.discard(attr)
+        node.keyable.pop(attr, None)
+        for key, value in list(self.connections.items()):
+            if key == (node, attr) or value == (node, attr):
+                del self.connections[key]
+
+    def setAttr(self, plug: str, *values, **kwargs):
+        node, attr = self._plug(plug)
+
+        if "lock" in kwargs or "l" in kwargs:
+            if kwargs.get("lock", kwargs.get("l")):
+                node.locked.add(attr)
+            else:
+                node.locked.discard(attr)
+
+        if "keyable" in kwargs or "k" in kwargs:
+            node.keyable[attr] = bool(kwargs.get("keyable", kwargs.get("k")))
+
+        if not values:
+            return
+
+        if attr in node.locked:
+            raise RuntimeError(f"The attribute '{node.name}.{attr}' is locked or connected and cannot be modified.")
+
+        if attr in CHANNELS and node.is_transform:
+            node.set_channel(attr, values)
+        elif attr in COMPOUNDS:
+            for child, value in zip(COMPOUNDS[attr], values):
+                node.attrs[child] = value
+        elif len(values) == 1:
+            node.attrs[attr] = values[0]
+        else:
+            node.attrs[attr] = tuple(values)
+
+    def connectAttr(self, source: str, destination: str, **kwargs):
+        src = self._plug(source)
+        dst = self._plug(destination)
+        if dst in self.connections and not kwargs.get("force", kwargs.get("f", False)):
+            raise RuntimeError(f"{destination} is already connected.")
+        if dst[1] in dst[0].locked:
+            raise RuntimeError(f"The attribute '{destination}' is locked.")
+        self.connections[dst] = src
+
+    def disconnectAttr(self, source: str, destination: str, **kwargs):
+        self.connections.pop(self._plug(destination), None)
+
+    def isConnected(self, source: str, destination: str, **kwargs):
+        return self.connections.get(self._plug(destination)) == self._plug(source)
+
+    # --------------------------------------------------------------------
+    # Files and session
+
+    def file(self, *args, **kwargs):
+        if kwargs.get("query", kwargs.get("q", False)):
+            return self.scene_name
+        if kwargs.get("new", False):
+            self.reset()
+            return ""
+        if kwargs.get("rename"):
+            self.scene_name = kwargs["rename"]
+            return self.scene_name
+        if kwargs.get("open", kwargs.get("o", False)):
+            with open(args[0], "r") as handle:
+                self.load(json.load(handle))
+            self.scene_name = args[0]
+            return self.scene_name
+        if kwargs.get("save", kwargs.get("s", False)):
+            with open(self.scene_name, "w") as handle:
+                json.dump(self.dump(), handle)
+            return self.scene_name
+        return None
+
+    def namespace(self, *args, **kwargs):
+        if kwargs.get("exists", kwargs.get("ex", False)):
+            name = str(args[0] if args else kwargs.get("exists")).strip(":")
+            return name in self.namespaces or any(node.startswith(name + ":") for node in self.nodes)
+        if kwargs.get("add"):
+            name = self._namespaced(kwargs["add"])
+            self.namespaces.add(name)
+            return name
+        if kwargs.get("set") is not None:
+            name = kwargs["set"].strip(":")
+            if name and not self.namespace(name, exists=True):
+                raise RuntimeError(f"Namespace '{name}' not found.")
+            self.current_namespace = name
+            return ":" + name
+        return None
+
+    def namespaceInfo(self, *args, **kwargs):
+        if kwargs.get("currentNamespace", kwargs.get("cur", False)):
+            return ":" + self.current_namespace
+        return None
+
+    def dump(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - dict
+
+        # Returns the scene as a JSON serializable dictionary
+
+        ###################################
+
+        return {
+            "nodes": [
+                {
+                    "name": node.name,
+                    "type": node.type,
+                    "parent": node.parent.name if node.parent is not None else None,
+                    "attrs": node.attrs,
+                    "user_attrs": sorted(node.user_attrs),
+                    "attr_types": node.attr_types,
+                    "locked": sorted(node.locked),
+                }
+                for node in self.order
+            ],
+            "connections": [
+                [f"{src[0].name}.{src[1]}", f"{dst[0].name}.{dst[1]}"]
+                for dst, src in self.connections.items()
+            ],
+        }
+
+    def load(self, data: Dict[str, Any]):
+        self.reset()
+        for entry in data["nodes"]:
+            node = self._create(entry["type"], entry["name"])
+            node.attrs = {key: tuple(value) if isinstance(value, list) else value for key, value in entry["attrs"].items()}
+            node.user_attrs = set(entry["user_attrs"])
+            node.attr_types = {key: tuple(value) for key, value in entry.get("attr_types", {}).items()}
+            node.locked = set(entry["locked"])
+        for entry in data["nodes"]:
+            if entry["parent"]:
+                self._reparent(self.nodes[entry["name"]], self.nodes[entry["parent"]], keep_world=False)
+        for source, destination in data["connections"]:
+            self.connectAttr(source, destination, f=True)
+
+    def warning(self, *args, **kwargs):
+        print("# Warning: " + " ".join(str(arg) for arg in args))
+
+    def scriptEditorInfo(self, *args, **kwargs):
+        return None
+
+    def refresh(self, *args, **kwargs):
+        return None
+
+    def undoInfo(self, *args, **kwargs):
+        # Nothing is recorded : undo is reported off, chunks are ignored
+        return False if kwargs.get("query", kwargs.get("q", False)) else None
+
+
+# ------------------------------------------------------------------------
+# maya.api.OpenMaya stand-in
+
+
+class MVector:
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, *args):
+        if len(args) == 1:
+            args = tuple(args[0])
+        self.x, self.y, self.z = (float(value) for value in (args or (0.0, 0.0, 0.0)))
+
+    def __add__(self, other):
+        return MVector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return MVector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, value):
+        if isinstance(value, MVector):
+            return self.x * value.x + self.y * value.y + self.z * value.z
+        return MVector(self.x * value, self.y * value, self.z * value)
+
+    __rmul__ = __mul__
+
+    def __xor__(self, other):
+        return MVector(
+            self.y * other.z - self.z * other.y,
+            self.z * other.x - self.x * other.z,
+            self.x * other.y - self.y * other.x,
+        )
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.z)[index]
+
+    def __repr__(self):
+        return f"MVector({self.x}, {self.y}, {self.z})"
+
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def normal(self):
+        length = self.length()
+        if length == 0.0:
+            raise ZeroDivisionError("Cannot normalize a null vector.")
+        return MVector(self.x / length, self.y / length, self.z / length)
+
+
+class MObject:
+
+    __slots__ = ("node",)
+
+    kNullObj = None
+
+    def __init__(self, node: Optional[Node] = None):
+        self.node = node
+
+    def isNull(self):
+        return self.node is None or self.node.name not in scene.nodes or scene.nodes[self.node.name] is not self.node
+
+    def __eq__(self, other):
+        return isinstance(other, MObject) and other.node is self.node
+
+    def __hash__(self):
+        return id(self.node)
+
+
+MObject.kNullObj = MObject()
+
+
+class MPlug:
+
+    __slots__ = ("node", "attr")
+
+    def __init__(self, node: Node, attr: str):
+        self.node = node
+        self.attr = attr
+
+    def name(self):
+        return f"{self.node.name}.{self.attr}"
+
+    def partialName(self, *args, **kwargs):
+        return self.attr
+
+    def _children(self):
+        if self.attr in CHANNELS:
+            return [self.attr + axis for axis in "XYZ"]
+        return list(COMPOUNDS.get(self.attr, ()))
+
+    @property
+    def isCompound(self):
+        return bool(self._children())
+
+    def numChildren(self):
+        return len(self._children())
+
+    def child(self, index: int):
+        return MPlug(self.node, self._children()[index])
+
+    def elementByLogicalIndex(self, index: int):
+        return MPlug(self.node, f"{self.attr}[{index}]")
+
+    def selectAncestorLogicalIndex(self, index: int, attribute: str):
+        self.attr = f"{attribute}[{index}].{self.attr}"
+
+    @property
+    def isLocked(self):
+        return self.attr in self.node.locked
+
+    @isLocked.setter
+    def isLocked(self, value: bool):
+        if value:
+            self.node.locked.add(self.attr)
+        else:
+            self.node.locked.discard(self.attr)
+
+    @property
+    def isKeyable(self):
+        return self.node.keyable.get(self.attr, self.node.is_transform)
+
+    @isKeyable.setter
+    def isKeyable(self, value: bool):
+        self.node.keyable[self.attr] = bool(value)
+
+    @property
+    def isDestination(self):
+        return (self.node, self.attr) in scene.connections
+
+    def source(self):
+        node, attr = scene.connections[(self.node, self.attr)]
+        return MPlug(node, attr)
+
+    def node_object(self):
+        return MObject(self.node)
+
+    def asDouble(self):
+        return float(scene._get(self.node, self.attr))
+
+
+class MDagPath:
+
+    __slots__ = ("node_object",)
+
+    def __init__(self, node_object: Optional[MObject] = None):
+        self.node_object = node_object
+
+    def node(self):
+        return self.node_object
+
+    def fullPathName(self):
+        return scene._long_name(self.node_object.node)
+
+    def partialPathName(self):
+        return self.node_object.node.name
+
+    def inclusiveMatrix(self):
+        return MMatrix(self.node_object.node.world_matrix())
+
+    def inclusiveMatrixInverse(self):
+        return MMatrix(mat_inverse(self.node_object.node.world_matrix()))
+
+    def exclusiveMatrix(self):
+        return MMatrix(self.node_object.node.parent_matrix())
+
+
+class MMatrix:
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Optional[Sequence[float]] = None):
+        self.values = [float(value) for value in values] if values is not None else list(IDENTITY)
+
+    def __mul__(self, other):
+        return MMatrix(mat_mult(self.values, other.values))
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return 16
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def inverse(self):
+        return MMatrix(mat_inverse(self.values))
+
+    def getElement(self, row: int, col: int):
+        return self.values[row * 4 + col]
+
+
+class MSelectionList:
+
+    def __init__(self):
+        self.items: List[Tuple[Node, str]] = []
+
+    def add(self, name: str):
+        node, attr = scene._plug(name)
+        self.items.append((node, attr))
+        return self
+
+    def length(self):
+        return len(self.items)
+
+    def getDependNode(self, index: int):
+        return MObject(self.items[index][0])
+
+    def getDagPath(self, index: int):
+        return MDagPath(MObject(self.items[index][0]))
+
+    def getPlug(self, index: int):
+        node, attr = self.items[index]
+        return MPlug(node, attr)
+
+
+class MFnDependencyNode:
+
+    def __init__(self, node_object: Optional[MObject] = None):
+        self.node_object = node_object
+
+    def setObject(self, node_object: MObject):
+        self.node_object = node_object
+        return self
+
+    def name(self):
+        return self.node_object.node.name
+
+    def typeName(self):
+        return self.node_object.node.type
+
+    def findPlug(self, attr: str, want_networked: bool = False):
+        return MPlug(self.node_object.node, attr.split(".")[-1])
+
+    def attribute(self, attr: str):
+        # Attributes are only used to resolve plugs, their name stands for them
+        return attr
+
+
+class MDGModifier:
+
+    ###################################
+
+    # Queues operations and runs them on doIt(), undoIt() reverts them
+
+    ###################################
+
+    def __init__(self):
+        self.operations: List[Tuple[Callable[[], Any], Callable[[], Any]]] = []
+        self.done: List[Callable[[], Any]] = []
+
+    def _queue(self, do: Callable[[], Any], undo: Callable[[], Any]):
+        self.operations.append((do, undo))
+
+    def createNode(self, typ: str, parent: Optional[MObject] = None):
+        # The node exists right away, it is only linked to the scene by doIt()
+        node = Node(scene._default_name(typ), typ)
+        node_object = MObject(node)
+
+        def do():
+            node.name = scene._unique_name(node.name)
+            scene.nodes[node.name] = node
+            scene.order.append(node)
+            if parent is not None and parent.node is not None:
+                node.parent = parent.node
+                parent.node.children.append(node)
+
+        def undo():
+            if node.name in scene.nodes:
+                scene._remove(node)
+
+        self._queue(do, undo)
+        return node_object
+
+    def renameNode(self, node_object: MObject, name: str):
+        node = node_object.node
+        previous: List[str] = []
+
+        def do():
+            previous.append(node.name)
+            if scene.nodes.get(node.name) is node:
+                del scene.nodes[node.name]
+                node.name = scene._unique_name(name)
+                scene.nodes[node.name] = node
+            else:
+                node.name = name
+
+        def undo():
+            scene.rename(node.name, previous.pop())
+
+        self._queue(do, undo)
+
+    def connect(self, source: MPlug, destination: MPlug):
+        key = (destination.node, destination.attr)
+        previous: List[Any] = []
+
+        def do():
+            previous.append(scene.connections.get(key))
+            scene.connections[key] = (source.node, source.attr)
+
+        def undo():
+            value = previous.pop()
+            if value is None:
+                scene.connections.pop(key, None)
+            else:
+                scene.connections[key] = value
+
+        self._queue(do, undo)
+
+    def disconnect(self, source: MPlug, destination: MPlug):
+        key = (destination.node, destination.attr)
+
+        def do():
+            scene.connections.pop(key, None)
+
+        def undo():
+            scene.connections[key] = (source.node, source.attr)
+
+        self._queue(do, undo)
+
+    def _new_value(self, plug: MPlug, value: Any):
+        previous: List[Any] = []
+
+        def do():
+            previous.append(plug.node.attrs.get(plug.attr))
+            plug.node.attrs[plug.attr] = value
+
+        def undo():
+            value = previous.pop()
+            if value is None:
+                plug.node.attrs.pop(plug.attr, None)
+            else:
+                plug.node.attrs[plug.attr] = value
+
+        self._queue(do, undo)
+
+    def newPlugValueDouble(self, plug: MPlug, value: float):
+        self._new_value(plug, float(value))
+
+    def newPlugValueFloat(self, plug: MPlug, value: float):
+        self._new_value(plug, float(value))
+
+    def newPlugValueInt(self, plug: MPlug, value: int):
+        self._new_value(plug, int(value))
+
+    def newPlugValueBool(self, plug: MPlug, value: bool):
+        self._new_value(plug, bool(value))
+
+    def newPlugValueString(self, plug: MPlug, value: str):
+        self._new_value(plug, str(value))
+
+    def doIt(self):
+        for do, undo in self.operations[len(self.done):]:
+            do()
+            self.done.append(undo)
+
+    def undoIt(self):
+        while self.done:
+            self.done.pop()()
+
+
+class MDagModifier(MDGModifier):
+    pass
+
+
+# ------------------------------------------------------------------------
+# Installation
+
+
+scene = Scene()
+
+cmds = types.ModuleType("maya.cmds")
+
+
+def _build_cmds_module(module: types.ModuleType, target: Scene):
+    for name in dir(Scene):
+        if not name.startswith("_") and name not in ("reset", "dump", "load"):
+            setattr(module, name, getattr(target, name))
+    return module
+
+
+_build_cmds_module(cmds, scene)
+
+OpenMaya = types.ModuleType("maya.api.OpenMaya")
+for _class in (MVector, MObject, MPlug, MDagPath, MMatrix, MSelectionList, MFnDependencyNode, MDGModifier, MDagModifier):
+    setattr(OpenMaya, _class.__name__, _class)
+
+
+def install():
+
+    ###################################
+
+    # Inputs - None
+    # Returns - None
+
+    # Registers the stand-in as maya, maya.cmds and maya.api.OpenMaya,
+    # so that "import maya.cmds as cmds" resolves to the in-memory scene
+
+    ###################################
+
+    maya = types.ModuleType("maya")
+    maya.__path__ = []
+    api = types.ModuleType("maya.api")
+    api.__path__ = []
+
+    maya.cmds = cmds
+    maya.api = api
+    api.OpenMaya = OpenMaya
+
+    sys.modules["maya"] = maya
+    sys.modules["maya.cmds"] = cmds
+    sys.modules["maya.api"] = api
+    sys.modules["maya.api.OpenMaya"] = OpenMaya
+
+
+def new_scene():
+
+    ###################################
+
+    # Inputs - None
+    # Returns - Scene
+
+    # Clears the in-memory scene and returns it
+
+    ###################################
+
+    scene.reset()
+    return scene
+
+
+def scene_commands(target: Scene):
+
+    ###################################
+
+    # Inputs - target, Scene
+    # Returns - module
+
+    # A maya.cmds stand-in working on another scene than the module one.
+    # The OpenMaya stand-in always works on scene_graph.scene, swap it too.
+
+    ###################################
+
+    return _build_cmds_module(types.ModuleType("maya.cmds"), target)
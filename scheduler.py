@@ -0,0 +1,367 @@
+import contextlib
+import sys
+import time
+import maya.cmds as cmds
+from typing import *
+
+from config import LimbConfig
+from library import constraint_mode, keep_selection
+from LimbClass import LimbClass, HandClass
+from bendy_limbs import create_bendy_limb
+from performance import performance_mode
+from preflight import preflight
+from tracer import trace_stage
+from transaction import BuildTransaction, NodeState, delete_created
+
+
+###################################
+
+# Step by step limb builds.
+# A BuildJob splits the build of a limb into steps (setup, one step per
+# build stage), each one a BuildTransaction. The job can be run straight
+# through (run(), used by batch.build_limb) : the steps are nested in the
+# transaction of the whole limb, one undo chunk. Or one step at a time
+# (step()), e.g. one step per idle event in the UI with run_deferred(), so
+# Maya stays responsive and shows the progress : nothing is left open
+# between two steps then, every step is its own undo chunk and the job
+# keeps the list of the nodes they created.
+
+# job = BuildJob(config, progress=lambda job: print(job.progress))
+# job.run()                     -> same report as batch.build_limb
+
+# job.cancel() is checked between steps : the job stops and the limb is
+# rolled back, like when a step raises. A job run step by step deletes the
+# nodes of its finished steps (the failed step undoes its own chunk), and
+# puts the existing nodes it edited (switch attributes and locks, skeleton
+# offset parent matrices...) back as they were before its first step.
+
+###################################
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+_deferred_job: Optional["BuildJob"] = None
+
+
+class BuildJob:
+
+    def __init__(self, config: LimbConfig, check: bool = True, progress: Optional[Callable[["BuildJob"], None]] = None):
+        self.config = config
+        self.check = check
+        self.progress_callback = progress
+
+        self.name = "build_" + config.limb_name + "_" + config.root_joint[-1:]
+
+        self.limb: Optional[LimbClass] = None
+        self.hand: Optional[HandClass] = None
+
+        self.steps: List[Tuple[str, Callable]] = self._plan()
+        self.current = 0
+
+        # pending, running, done, cancelled, error
+        self.status = "pending"
+        self.error: Optional[BaseException] = None
+        self.cancel_requested = False
+
+        self.timings: Dict[str, float] = {}
+        self.created: Dict[str, List[str]] = {}
+
+        # Every node created by the finished steps, deleted if a job run step by step is cancelled,
+        # and the existing nodes the steps edit as they were before the first one
+        self.nodes: List[str] = []
+        self.existing: Optional[NodeState] = None
+
+        # Transaction of the whole limb, None when every step has its own
+        self._stack: Optional[contextlib.ExitStack] = None
+        self._start = 0.0
+
+    def _plan(self):
+
+        # The steps only look the limb objects up when they run, the setup makes them
+        config = self.config
+
+        steps: List[Tuple[str, Callable]] = [("setup", self._setup)]
+        if config.hand:
+            steps.append(("hand_setup", self._hand_setup))
+
+        steps += [
+            ("duplicate_hierarchy", lambda: self.limb.duplicate_hierarchy()),
+            ("pair_blend", lambda: self.limb.pair_blend()),
+            ("biped_rig", lambda: self.limb.biped_rig()),
+        ]
+
+        if config.foot_roll:
+            steps.append(("foot_roll", lambda: self.limb.foot_roll()))
+
+        if config.hand:
+            steps.append(("add_fingers_controls", lambda: self.hand.add_fingers_controls()))
+
+        if config.bendy:
+            steps.append(("create_bendy_limb", lambda: create_bendy_limb(config=config)))
+
+        return steps
+
+    def _setup(self):
+
+        self.limb = LimbClass(self.config)
+
+        # Every name the build will create is checked at once, before anything is built
+        stages = ["duplicate_hierarchy", "pair_blend", "biped_rig"]
+        if self.config.stretch:
+            stages.append("stretch")
+        if self.config.better_pole:
+            stages.append("unbreakable_knees")
+        if self.config.foot_roll:
+            stages.append("foot_roll")
+        if self.config.bendy:
+            stages.append("create_bendy_limb")
+        self.limb.names.check(*stages)
+
+    def _hand_setup(self):
+        self.hand = HandClass(self.config)
+        self.hand.names.check("add_fingers_controls")
+
+    # --------------------------------------------------------------------
+    # State
+
+    @property
+    def progress(self):
+        return self.current / len(self.steps)
+
+    @property
+    def next_step(self):
+        return self.steps[self.current][0] if self.current < len(self.steps) else ""
+
+    @property
+    def finished(self):
+        return self.status in ("done", "cancelled", "error")
+
+    def cancel(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - None
+
+        # Asks the job to stop before its next step, the limb is then rolled back
+
+        ###################################
+
+        self.cancel_requested = True
+
+    def _report_progress(self):
+        if self.progress_callback is not None:
+            self.progress_callback(self)
+
+    # --------------------------------------------------------------------
+    # Execution
+
+    def start(self, hold_transaction: bool = True):
+
+        ###################################
+
+        # Inputs - hold_transaction, bool
+        # Returns - None
+
+        # Runs the preflight checks (unless check is False) and, if
+        # hold_transaction, opens the transaction of the limb, nothing is
+        # built yet. Without it every step opens and closes its own.
+
+        ###################################
+
+        if self.status != "pending":
+            raise RuntimeError(f"{self.name} was already started.")
+
+        self._start = time.perf_counter()
+
+        if self.check:
+            report = preflight(self.config)
+            self.timings["preflight"] = report.duration
+            if not report.ok:
+                self.status = "error"
+                self.error = ValueError(str(report))
+                raise self.error
+
+        # Left open between the steps : one undo chunk for the whole limb.
+        # Otherwise a cancel can only revert the existing nodes from their state now
+        if hold_transaction:
+            self._stack = contextlib.ExitStack()
+            self._stack.enter_context(keep_selection())
+            self._stack.enter_context(BuildTransaction(self.name))
+        else:
+            self.existing = NodeState(self._existing_nodes())
+
+        self.status = "running"
+        self._report_progress()
+
+    def _existing_nodes(self):
+
+        # The nodes of the scene the builders edit : the skeleton, the reverse foot and the switch
+        nodes = [self.config.root_joint, self.config.switch]
+        nodes += cmds.listRelatives(self.config.root_joint, ad=True, type=["joint", "transform"]) or []
+        if self.config.foot_roll and self.config.foot_root:
+            nodes.append(self.config.foot_root)
+            nodes += cmds.listRelatives(self.config.foot_root, ad=True, type=["joint", "transform"]) or []
+        return list(dict.fromkeys(nodes))
+
+    def step(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - bool, True while steps are left
+
+        # Runs the next step. A cancelled job is rolled back instead, a
+        # failed step rolls the limb back and raises.
+
+        ###################################
+
+        if self.status == "pending":
+            self.start()
+
+        if self.finished:
+            return False
+
+        if self.cancel_requested:
+            self._finish(BuildCancelled(f"{self.name} was cancelled."))
+            return False
+
+        name, function = self.steps[self.current]
+        step_start = time.perf_counter()
+
+        try:
+            with contextlib.ExitStack() as stack:
+                # Step by step, the selection is restored and the transaction closed before the next idle event
+                if self._stack is None:
+                    stack.enter_context(keep_selection())
+                stack.enter_context(trace_stage(name))
+                stack.enter_context(constraint_mode(self.config.constraint_mode))
+                stage = stack.enter_context(BuildTransaction(f"{self.name}/{name}" if self._stack is None else name))
+                function()
+        except Exception as error:
+            self._finish(error, sys.exc_info()[2])
+            raise
+
+        self.timings[name] = time.perf_counter() - step_start
+        self.created[name] = stage.created
+        self.nodes += stage.created
+
+        self.current += 1
+        self._report_progress()
+
+        if self.current == len(self.steps):
+            self._finish()
+            return False
+
+        return True
+
+    def _finish(self, error: Optional[BaseException] = None, traceback: Any = None):
+
+        # Closes the limb transaction : rolled back on error or cancel, then the selection is restored
+        stack, self._stack = self._stack, None
+
+        if error is None:
+            self.status = "done"
+        else:
+            self.status = "cancelled" if isinstance(error, BuildCancelled) else "error"
+            self.error = error
+
+        if stack is not None:
+            stack.__exit__(type(error) if error else None, error, traceback)
+
+        elif error is not None:
+            # Step by step : the finished steps are already closed, their nodes are deleted in one chunk
+            # and the edits they made to the existing nodes are reverted
+            with keep_selection(), BuildTransaction(f"{self.name}/rollback"):
+                delete_created(self.nodes)
+                if self.existing is not None:
+                    self.existing.restore()
+
+        self._report_progress()
+
+    def run(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - dict
+
+        # Runs every step in performance mode and returns the report,
+        # raises BuildCancelled if the job was cancelled
+
+        ###################################
+
+        with performance_mode(self.name):
+            while self.step():
+                pass
+
+        if self.status == "cancelled":
+            raise self.error
+
+        return self.report()
+
+    def report(self):
+        return {
+            "limb": self.limb.suffix_name if self.limb else self.config.limb_name + "_" + self.config.root_joint[-1:],
+            "root_joint": self.config.root_joint,
+            "timings": self.timings,
+            "created": self.created,
+            "total": time.perf_counter() - self._start,
+        }
+
+
+def active_job():
+    return _deferred_job
+
+
+def run_deferred(job: BuildJob, on_finished: Optional[Callable[[BuildJob], None]] = None):
+
+    ###################################
+
+    # Inputs - job, BuildJob; on_finished, Callable
+    # Returns - BuildJob
+
+    # Runs the job one step per idle event (evalDeferred), so the UI is
+    # redrawn and can cancel the job between two steps. Every step runs in
+    # performance mode, in its own transaction : nothing stays open while
+    # Maya is idle. on_finished(job) is called once it is done, cancelled
+    # or failed.
+
+    ###################################
+
+    global _deferred_job
+
+    if _deferred_job is not None:
+        raise RuntimeError(f"{_deferred_job.name} is already running.")
+
+    def finish():
+        global _deferred_job
+        _deferred_job = None
+        if on_finished is not None:
+            on_finished(job)
+
+    def run_step():
+        try:
+            with performance_mode(f"{job.name}/{job.next_step or 'cancel'}"):
+                more = job.step()
+        except Exception:
+            finish()
+            raise
+
+        if more:
+            cmds.evalDeferred(run_step, lowestPriority=True)
+        else:
+            finish()
+
+    _deferred_job = job
+
+    try:
+        job.start(hold_transaction=False)
+    except Exception:
+        finish()
+        raise
+
+    cmds.evalDeferred(run_step, lowestPriority=True)
+    return job
@@ -0,0 +1,231 @@
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+from typing import *
+
+from hierarchy import hierarchy_index
+from transaction import active_transaction
+
+try:
+    import numpy as np
+except ImportError:  # mayapy without numpy, matrices are kept as plain tuples
+    np = None
+
+
+###################################
+
+# World transforms snapshot of a skeleton.
+# The world matrices of every joint under a root are read once, with one
+# OpenMaya selection list, into an (N, 4, 4) array indexed by joint. The
+# builders query it instead of calling xform / matchTransform on the SK
+# joints over and over.
+
+# snapshot = take_snapshot("SK_shoulder_L")
+# snapshot.position("SK_elbow_L")
+
+# The SK joints are not moved by the build, so a snapshot stays valid for
+# the whole build. It is NOT refreshed on its own : call invalidate_snapshot()
+# when the skeleton is edited (LimbClass takes a new one on every setup, the
+# limb contexts drop theirs from their callbacks).
+
+# world_position and match_world_matrix only read the snapshots taken in the
+# current build transaction : the joints are forgotten when it ends, and the
+# joints are read from the scene outside of a build.
+
+###################################
+
+
+_snapshots: Dict[str, "SkeletonSnapshot"] = {}
+_joint_snapshots: Dict[str, "SkeletonSnapshot"] = {}
+
+
+class SkeletonSnapshot:
+
+    def __init__(self, root_joint: str, hierarchy: Optional[List[str]] = None):
+        self.root_joint = root_joint
+        self.joints: List[str] = hierarchy or hierarchy_index(root_joint).joints
+        self.index: Dict[str, int] = {joint: i for i, joint in enumerate(self.joints)}
+        self.matrices = self._read_matrices()
+
+    def _read_matrices(self):
+
+        selection = om.MSelectionList()
+        for joint in self.joints:
+            selection.add(joint)
+
+        matrices = [tuple(selection.getDagPath(i).inclusiveMatrix()) for i in range(len(self.joints))]
+
+        if np is None:
+            return matrices
+
+        array = np.array(matrices, dtype=np.float64).reshape(len(self.joints), 4, 4)
+        array.setflags(write=False)
+        return array
+
+    def __contains__(self, joint: str):
+        return joint in self.index
+
+    def world_matrix(self, joint: str):
+
+        ###################################
+
+        # Inputs - joint, str
+        # Returns - List[float], 16 values, as xform(q=True, ws=True, m=True)
+
+        ###################################
+
+        matrix = self.matrices[self.index[joint]]
+        if np is None:
+            return list(matrix)
+        return matrix.ravel().tolist()
+
+    def position(self, joint: str):
+
+        ###################################
+
+        # Inputs - joint, str
+        # Returns - List[float], as xform(q=True, ws=True, t=True)
+
+        ###################################
+
+        matrix = self.matrices[self.index[joint]]
+        if np is None:
+            return list(matrix[12:15])
+        return matrix[3, :3].tolist()
+
+    def positions(self, joints: Optional[Sequence[str]] = None):
+
+        ###################################
+
+        # Inputs - joints, Sequence[str], every joint if None
+        # Returns - (N, 3) array (list of lists without numpy)
+
+        ###################################
+
+        if joints is None:
+            joints = self.joints
+
+        if np is None:
+            return [self.position(joint) for joint in joints]
+        return self.matrices[[self.index[joint] for joint in joints], 3, :3]
+
+
+def take_snapshot(root_joint: str, hierarchy: Optional[List[str]] = None):
+
+    ###################################
+
+    # Inputs - root_joint, str; hierarchy, List[str]
+    # Returns - SkeletonSnapshot
+
+    # Reads the skeleton under root_joint and caches it, replacing any older
+    # snapshot. In a build transaction, world_position and match_world_matrix
+    # read its joints until the transaction ends.
+
+    ###################################
+
+    invalidate_snapshot(root_joint)
+
+    snapshot = SkeletonSnapshot(root_joint, hierarchy)
+    _snapshots[root_joint] = snapshot
+
+    transaction = active_transaction()
+    if transaction is not None:
+        for joint in snapshot.joints:
+            _joint_snapshots[joint] = snapshot
+        transaction.on_exit(_joint_snapshots.clear)
+
+    return snapshot
+
+
+def skeleton_snapshot(root_joint: str):
+
+    ###################################
+
+    # Inputs - root_joint, str
+    # Returns - SkeletonSnapshot
+
+    # Returns the cached snapshot of root_joint, taking it if needed
+
+    ###################################
+
+    snapshot = _snapshots.get(root_joint)
+    if snapshot is None:
+        snapshot = take_snapshot(root_joint)
+    return snapshot
+
+
+def invalidate_snapshot(root_joint: Optional[str] = None):
+
+    ###################################
+
+    # Inputs - root_joint, str, every snapshot if None
+    # Returns - None
+
+    ###################################
+
+    if root_joint is None:
+        _snapshots.clear()
+        _joint_snapshots.clear()
+        return
+
+    snapshot = _snapshots.pop(root_joint, None)
+    if snapshot is None:
+        return
+
+    for joint in snapshot.joints:
+        if _joint_snapshots.get(joint) is snapshot:
+            del _joint_snapshots[joint]
+
+
+def has_snapshots():
+    return bool(_snapshots)
+
+
+def invalidate_joint_snapshots(*joints: str):
+
+    ###################################
+
+    # Inputs - joints, str
+    # Returns - None
+
+    # Drops every snapshot holding one of joints (renamed, reparented or deleted)
+
+    ###################################
+
+    for root_joint, snapshot in list(_snapshots.items()):
+        if any(joint in snapshot for joint in joints):
+            invalidate_snapshot(root_joint)
+
+
+def world_position(obj: str):
+
+    ###################################
+
+    # Inputs - obj, str
+    # Returns - List[float]
+
+    # World position of obj, from a snapshot when one holds it, from the scene otherwise
+
+    ###################################
+
+    snapshot = _joint_snapshots.get(obj)
+    if snapshot is not None:
+        return snapshot.position(obj)
+    return cmds.xform(obj, q=True, ws=True, t=True)
+
+
+def match_world_matrix(obj: str, target: str):
+
+    ###################################
+
+    # Inputs - obj, str; target, str
+    # Returns - None
+
+    # Same as matchTransform(obj, target), reading target from a snapshot when one holds it
+
+    ###################################
+
+    snapshot = _joint_snapshots.get(target)
+    if snapshot is None:
+        cmds.matchTransform(obj, target)
+    else:
+        cmds.xform(obj, ws=True, m=snapshot.world_matrix(target))
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The tool is a flat set of modules, imported from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scene_graph
+
+# The tests run on the in-memory scene, without Maya
+scene_graph.install()
+
+
+@pytest.fixture
+def cmds():
+    import maya.cmds as cmds
+    from modules import control_factory
+
+    cmds.file(new=True, force=True)
+    control_factory.clear()
+    return cmds
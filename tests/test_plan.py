@@ -0,0 +1,27 @@
+from benchmark import create_skeleton
+from plan import compile_plan, record_plan, validate_plan
+
+
+def test_compiled_plan_matches_build(cmds):
+
+    limbs = create_skeleton(cmds, "small")
+    config = limbs[0]["config"]
+    config.bendy = True
+
+    before = sorted(cmds.ls())
+
+    assert validate_plan(config) == []
+    assert sorted(cmds.ls()) == before
+
+
+def test_recorded_plan_builds_the_limb(cmds):
+
+    limbs = create_skeleton(cmds, "small")
+    config = limbs[0]["config"]
+
+    plan = compile_plan(config)
+    recorded = record_plan(config)
+
+    assert recorded.digest == plan.digest
+    assert recorded.reserved == plan.reserved
+    assert all(cmds.objExists(name) for name in recorded.created)
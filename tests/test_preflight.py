@@ -0,0 +1,36 @@
+from batch import build_limb
+from benchmark import create_skeleton
+from config import LimbConfig
+from manifest import get_manifest
+from preflight import preflight
+
+
+def _arm(cmds, **options):
+    config = create_skeleton(cmds, "medium")[0]["config"]
+    return LimbConfig.from_dict(dict(config.to_dict(), **options))
+
+
+def test_squash_and_volume_reach_the_stretch(cmds):
+
+    config = _arm(cmds, stretch=True, squash=True, volume=True)
+    assert LimbConfig.from_dict(config.to_dict()).to_dict() == config.to_dict()
+    assert preflight(config).ok
+
+    build_limb(config)
+    manifest = get_manifest(config.limb_name + "_" + config.root_joint[-1])
+
+    # Squash drops the clamp to the rest length, volume drives Y and Z
+    assert "stretch.max" not in manifest
+    volume = manifest["stretch.volume"]
+    assert cmds.listConnections(config.root_joint + ".scaleY", s=True, d=False) == [volume]
+
+
+def test_preflight_checks_squash_and_volume(cmds):
+
+    config = _arm(cmds, volume=True)
+    assert [issue.check for issue in preflight(config).issues] == ["config"]
+
+    config.stretch = True
+    cmds.setAttr(config.root_joint + ".scaleZ", lock=True)
+    issues = preflight(config).issues
+    assert [(issue.check, issue.node) for issue in issues] == [("attributes", config.root_joint + ".scaleZ")]
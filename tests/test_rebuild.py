@@ -0,0 +1,72 @@
+import re
+
+import pytest
+
+from batch import build_limb
+from benchmark import create_skeleton
+from config import LimbConfig
+from rebuild import rebuild_limb
+
+# Nodes Maya names itself get the next free number, which depends on what the scene held before
+NUMBERED = re.compile(r"\b(effector|makeNurbCircle|makeNurbPlane|skinCluster|insertKnotSurface)\d+")
+
+# name : (options of the limb built first, options of the rebuild, edit of the skeleton in between)
+CASES = {
+    "elbow_moved": ({}, {}, ("SK_elbow_L.translateY", 4.0)),
+    "stretch_on": ({"stretch": False}, {"stretch": True}, None),
+    "stretch_off": ({"stretch": True}, {"stretch": False}, None),
+    "bendy_off": ({"bendy": True}, {"bendy": False}, None),
+    "squash_volume_on": ({}, {"squash": True, "volume": True}, None),
+    "matrix_blend": ({}, {"fkik_blend": "matrix"}, None),
+}
+
+
+def _arm(config, options):
+    data = dict(config.to_dict(), stretch=True, bendy=True)
+    data.update(options)
+    return LimbConfig.from_dict(data)
+
+
+def _rig(cmds):
+
+    # Every node, and the world matrix of every transform, with the Maya numbers left out
+    nodes = sorted(NUMBERED.sub(r"\1#", node) for node in cmds.ls())
+    matrices = {
+        NUMBERED.sub(r"\1#", node): [round(value, 3) + 0.0 for value in cmds.xform(node, q=True, ws=True, m=True)]
+        for node in cmds.ls(type=["transform", "joint"])
+    }
+    return nodes, matrices
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_rebuild_matches_fresh_build(cmds, case):
+
+    built, rebuilt, edit = CASES[case]
+
+    config = create_skeleton(cmds, "medium")[0]["config"]
+    if edit:
+        cmds.setAttr(*edit)
+    build_limb(_arm(config, rebuilt))
+    fresh = _rig(cmds)
+
+    # Built with the first options on the skeleton as it was, then brought up to date
+    cmds.file(new=True, force=True)
+    config = create_skeleton(cmds, "medium")[0]["config"]
+    build_limb(_arm(config, built))
+    if edit:
+        cmds.setAttr(*edit)
+    rebuild_limb(_arm(config, rebuilt))
+
+    assert _rig(cmds) == fresh
+
+
+def test_rebuild_of_an_up_to_date_limb_changes_nothing(cmds):
+
+    config = _arm(create_skeleton(cmds, "medium")[0]["config"], {})
+    build_limb(config)
+    before = _rig(cmds)
+
+    report = rebuild_limb(config)
+
+    assert report["run"] == 0 and report["skipped"] == report["steps"]
+    assert _rig(cmds) == before
@@ -0,0 +1,102 @@
+from batch import build_limb
+from benchmark import create_skeleton
+from config import LimbConfig
+from plan import read_seeds
+from rig_cache import RigCache, build_cached, rig_template, template_key
+
+
+def _place(cmds, config, translate, rotate_y, namespace=""):
+
+    # The arm and its switch under a character root, moved and turned
+    root = cmds.createNode("transform", n=namespace + "character_root")
+    cmds.parent(config.root_joint, root)
+    cmds.parent(config.switch, root)
+    cmds.setAttr(root + ".translate", *translate)
+    cmds.setAttr(root + ".rotateY", rotate_y)
+
+
+def _world_matrices(cmds, nodes):
+    return {node: [round(value, 3) + 0.0 for value in cmds.xform(node, q=True, ws=True, m=True)] for node in nodes}
+
+
+def test_key_ignores_placement(cmds):
+
+    config = create_skeleton(cmds, "small")[0]["config"]
+    _place(cmds, config, (0, 0, 0), 0)
+    key = template_key(*rig_template(config)[:2])
+
+    cmds.setAttr("character_root.translate", 120, 0, -40)
+    cmds.setAttr("character_root.rotateY", 45)
+
+    assert template_key(*rig_template(config)[:2]) == key
+
+
+def test_cached_rig_is_placed(cmds, tmp_path):
+
+    config = create_skeleton(cmds, "small")[0]["config"]
+    _place(cmds, config, (120, 0, -40), 45)
+    before = set(cmds.ls())
+
+    build_limb(config)
+    nodes = sorted(node for node in set(cmds.ls(type="transform")) - before)
+    built = _world_matrices(cmds, nodes)
+
+    cmds.file(new=True, force=True)
+    config = create_skeleton(cmds, "small")[0]["config"]
+    _place(cmds, config, (120, 0, -40), 45)
+
+    # Compiled at the origin, replayed where the character stands
+    assert build_cached(config, RigCache(str(tmp_path)))["cache"] == "miss"
+    assert _world_matrices(cmds, nodes) == built
+
+
+def test_seeds_keep_string_and_enum_attributes(cmds):
+
+    config = create_skeleton(cmds, "small")[0]["config"]
+    cmds.addAttr(config.switch, ln="label", dt="string")
+    cmds.setAttr(config.switch + ".label", "arm", type="string")
+    cmds.addAttr(config.switch, ln="space", at="enum", en="world:chest:head", dv=2)
+
+    attrs = [seed for seed in read_seeds(config) if seed["name"] == config.switch][0]["attrs"]
+
+    assert attrs["label"] == {"type": "string", "value": "arm"}
+    assert attrs["space"] == {"type": "enum", "value": 2, "enum": "world:chest:head"}
+
+
+def _character(cmds, namespace, translate, rotate_y):
+
+    # A skeleton moved into its namespace, its arm placed like _place
+    before = set(cmds.ls())
+    config = create_skeleton(cmds, "small")[0]["config"]
+    cmds.namespace(add=namespace)
+    for node in set(cmds.ls()) - before:
+        cmds.rename(node, f"{namespace}:{node}")
+
+    data = config.to_dict()
+    data.update(root_joint=f"{namespace}:{config.root_joint}", switch=f"{namespace}:{config.switch}")
+    config = LimbConfig.from_dict(data)
+    _place(cmds, config, translate, rotate_y, namespace + ":")
+    return config
+
+
+def test_cache_hit_is_placed(cmds, tmp_path):
+
+    config = create_skeleton(cmds, "small")[0]["config"]
+    _place(cmds, config, (-60, 0, 90), -30)
+    before = set(cmds.ls())
+
+    build_limb(config)
+    nodes = sorted(node for node in set(cmds.ls(type="transform")) - before)
+    built = _world_matrices(cmds, nodes)
+
+    cmds.file(new=True, force=True)
+    cache = RigCache(str(tmp_path))
+
+    # Compiled for a character at the origin, replayed for one standing and turned elsewhere
+    first = _character(cmds, "agent_01", (0, 0, 0), 0)
+    second = _character(cmds, "agent_02", (-60, 0, 90), -30)
+    assert build_cached(first, cache)["cache"] == "miss"
+    assert build_cached(second, cache)["cache"] == "hit"
+
+    placed = _world_matrices(cmds, ["agent_02:" + node for node in nodes])
+    assert {node.partition(":")[2]: matrix for node, matrix in placed.items()} == built
@@ -0,0 +1,30 @@
+from batch import build_limb
+from benchmark import create_skeleton
+from scheduler import BuildJob
+
+
+def _switch_state(cmds, switch):
+    locks = {attr: cmds.getAttr(f"{switch}.{attr}", lock=True) for attr in ("translateX", "rotateX", "visibility")}
+    return cmds.listAttr(switch, ud=True), locks
+
+
+def test_cancelled_job_reverts_existing_nodes(cmds):
+
+    config = create_skeleton(cmds, "small")[0]["config"]
+    before = sorted(cmds.ls())
+    switch = _switch_state(cmds, config.switch)
+
+    # One step at a time, cancelled once the switch got its attributes and locks
+    job = BuildJob(config)
+    job.start(hold_transaction=False)
+    while job.next_step != "create_bendy_limb":
+        job.step()
+    job.cancel()
+    job.step()
+
+    assert job.status == "cancelled"
+    assert sorted(cmds.ls()) == before
+    assert _switch_state(cmds, config.switch) == switch
+
+    # The limb builds again on the same skeleton
+    build_limb(config)
@@ -0,0 +1,41 @@
+import pytest
+
+from batch import build_limb
+from benchmark import create_skeleton
+
+
+@pytest.mark.parametrize("selected", ["nothing", "joints", "switch"])
+def test_build_keeps_selection(cmds, selected):
+
+    limbs = create_skeleton(cmds, "medium")
+
+    if selected == "joints":
+        cmds.select(cmds.ls("SK_*", type="joint"), replace=True)
+    elif selected == "switch":
+        cmds.select(limbs[0]["config"].switch, replace=True)
+    else:
+        cmds.select(clear=True)
+
+    before = cmds.ls(selection=True)
+
+    for limb in limbs:
+        config = limb["config"]
+        config.bendy = True
+        build_limb(config)
+
+    assert cmds.ls(selection=True) == before
+
+
+def test_failed_build_keeps_selection(cmds):
+
+    limbs = create_skeleton(cmds, "small")
+    config = limbs[0]["config"]
+
+    build_limb(config)
+    cmds.select(config.root_joint, replace=True)
+
+    # Every name of the limb is taken now, the second build stops before building
+    with pytest.raises(ValueError):
+        build_limb(config)
+
+    assert cmds.ls(selection=True) == [config.root_joint]
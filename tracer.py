@@ -0,0 +1,217 @@
+import contextlib
+import json
+import time
+import maya.cmds as cmds
+from typing import *
+
+
+###################################
+
+# Opt-in cmds call tracer.
+# While a Tracer is active, every command of maya.cmds is swapped for a
+# wrapper that records the command name, its arguments, its duration and
+# the enclosing build stage. Every module calling cmds.<command> is traced
+# without being listed anywhere. When no tracer is active the commands are
+# the maya.cmds ones, so tracing costs nothing.
+
+# with Tracer() as tracer:
+#     build_limb(config)
+# tracer.print_summary()
+# tracer.export_chrome_trace("trace.json")      # chrome://tracing or Perfetto
+
+###################################
+
+
+_active_tracer = None
+
+_NO_STAGE = contextlib.nullcontext()
+
+
+class CallRecord:
+
+    __slots__ = ("command", "args", "start", "duration", "stage")
+
+    def __init__(self, command: str, args: str, start: float, duration: float, stage: str):
+        self.command = command
+        self.args = args
+        self.start = start
+        self.duration = duration
+        self.stage = stage
+
+
+def _traced(name: str, function: Callable, tracer: "Tracer"):
+
+    clock = time.perf_counter
+
+    def traced(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            tracer.calls.append(CallRecord(name, _format_args(args, kwargs), start, clock() - start, tracer.current_stage))
+
+    return traced
+
+
+def _format_args(args: Sequence[Any], kwargs: Dict[str, Any]):
+    arguments = [repr(arg) for arg in args] + [f"{key}={value!r}" for key, value in kwargs.items()]
+    return ", ".join(arguments)
+
+
+class Tracer:
+
+    ###################################
+
+    # Records every maya.cmds call made while active
+
+    ###################################
+
+    def __init__(self):
+        self.calls: List[CallRecord] = []
+        self.stages: List[Tuple[str, float, float, int]] = []
+        self.stage_stack: List[str] = []
+        self.originals: Dict[str, Any] = {}
+
+    @property
+    def current_stage(self):
+        return self.stage_stack[-1] if self.stage_stack else ""
+
+    def __enter__(self):
+        global _active_tracer
+
+        if _active_tracer is not None:
+            raise RuntimeError("A tracer is already active.")
+
+        # The commands are looked up on the module at every call, wrapping them traces every caller
+        for name in dir(cmds):
+            function = getattr(cmds, name)
+            if name.startswith("_") or not callable(function) or isinstance(function, type):
+                continue
+            self.originals[name] = function
+            setattr(cmds, name, _traced(name, function, self))
+
+        _active_tracer = self
+        return self
+
+    def __exit__(self, type, value, traceback):
+        global _active_tracer
+
+        for name, function in self.originals.items():
+            setattr(cmds, name, function)
+
+        self.originals = {}
+        _active_tracer = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+
+        ###################################
+
+        # Inputs - name, str
+        # Returns - context manager
+
+        # Every call made inside the block is attributed to this stage
+
+        ###################################
+
+        self.stage_stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_stack.pop()
+            self.stages.append((name, start, time.perf_counter() - start, len(self.stage_stack)))
+
+    def summary(self, by_stage: bool = False):
+
+        ###################################
+
+        # Inputs - by_stage, bool
+        # Returns - List[dict]
+
+        # Returns the call count and time per command (per stage and command
+        # if by_stage), most expensive first
+
+        ###################################
+
+        rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        for call in self.calls:
+            key = (call.stage if by_stage else "", call.command)
+            row = rows.setdefault(key, {"stage": key[0], "command": call.command, "calls": 0, "total": 0.0, "max": 0.0})
+            row["calls"] += 1
+            row["total"] += call.duration
+            row["max"] = max(row["max"], call.duration)
+
+        for row in rows.values():
+            row["mean"] = row["total"] / row["calls"]
+
+        return sorted(rows.values(), key=lambda row: row["total"], reverse=True)
+
+    def print_summary(self, by_stage: bool = False, limit: int = 20):
+
+        total = sum(call.duration for call in self.calls) or 1.0
+
+        print(f"{'stage':<24}{'command':<24}{'calls':>8}{'total ms':>12}{'mean us':>10}{'%':>7}")
+        for row in self.summary(by_stage)[:limit]:
+            print(
+                f"{row['stage']:<24}{row['command']:<24}{row['calls']:>8}"
+                f"{row['total'] * 1e3:>12.3f}{row['mean'] * 1e6:>10.1f}{row['total'] / total * 100:>7.1f}"
+            )
+
+    def export_chrome_trace(self, path: str):
+
+        ###################################
+
+        # Inputs - path, str
+        # Returns - None
+
+        # Writes the stages and calls in the Chrome trace_event JSON format
+
+        ###################################
+
+        origin = min([call.start for call in self.calls] + [stage[1] for stage in self.stages] or [0.0])
+
+        events: List[Dict[str, Any]] = []
+
+        for name, start, duration, depth in self.stages:
+            events.append({
+                "name": name,
+                "cat": "stage",
+                "ph": "X",
+                "ts": (start - origin) * 1e6,
+                "dur": duration * 1e6,
+                "pid": 1,
+                "tid": 1,
+            })
+
+        for call in self.calls:
+            events.append({
+                "name": call.command,
+                "cat": "cmds",
+                "ph": "X",
+                "ts": (call.start - origin) * 1e6,
+                "dur": call.duration * 1e6,
+                "pid": 1,
+                "tid": 1,
+                "args": {"args": call.args, "stage": call.stage},
+            })
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def trace_stage(name: str):
+
+    ###################################
+
+    # Inputs - name, str
+    # Returns - context manager
+
+    # Marks a build stage on the active tracer, does nothing otherwise
+
+    ###################################
+
+    if _active_tracer is None:
+        return _NO_STAGE
+    return _active_tracer.stage(name)
@@ -0,0 +1,311 @@
+import functools
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+from typing import *
+
+
+###################################
+
+# Build transactions.
+# Everything done inside a BuildTransaction is one undo chunk, and the
+# nodes it creates are tracked (node added callback in Maya, scene diff
+# otherwise). If an exception leaves the outermost transaction, it is
+# rolled back : the chunk is undone, or without undo the created nodes are
+# deleted. Nested transactions only track their own nodes, the outermost
+# one owns the chunk and the rollback.
+
+# with BuildTransaction("arm_L") as transaction:
+#     limb.biped_rig()
+# transaction.created        -> every node the build made
+# transaction.on_exit(clear) -> clear() runs when the outermost transaction ends
+
+###################################
+
+
+_active_transaction: Optional["BuildTransaction"] = None
+
+
+class BuildTransaction:
+
+    def __init__(self, name: str = "build"):
+        self.name = name
+        self.parent: Optional[BuildTransaction] = None
+
+        self.created: List[str] = []
+        self.rolled_back = False
+        self.exit_callbacks: List[Callable[[], None]] = []
+
+        self._undo_chunk = False
+        self._callback_id = None
+        self._added: List[Any] = []
+        self._before: Optional[Set[str]] = None
+
+    @property
+    def is_outermost(self):
+        return self.parent is None
+
+    @property
+    def outermost(self):
+        transaction = self
+        while transaction.parent is not None:
+            transaction = transaction.parent
+        return transaction
+
+    def on_exit(self, callback: Callable[[], None]):
+
+        ###################################
+
+        # Inputs - callback, callable without arguments
+        # Returns - None
+
+        # Runs callback once when the outermost transaction ends, inside
+        # its undo chunk, whether the build succeeded or not
+
+        ###################################
+
+        outermost = self.outermost
+        if callback not in outermost.exit_callbacks:
+            outermost.exit_callbacks.append(callback)
+
+    # --------------------------------------------------------------------
+    # Tracking
+
+    def _on_node_added(self, node, *args):
+        self._added.append(om.MObjectHandle(node))
+
+    def _start_tracking(self):
+        if hasattr(om, "MDGMessage"):
+            self._callback_id = om.MDGMessage.addNodeAddedCallback(self._on_node_added, "dependNode")
+        else:
+            # In-memory scene, no callbacks : the scene is compared before and after
+            self._before = set(cmds.ls())
+
+    def _stop_tracking(self):
+
+        if self._callback_id is not None:
+            om.MMessage.removeCallback(self._callback_id)
+            self._callback_id = None
+
+            # Names are read at the end, nodes are renamed after being added
+            created = []
+            for handle in self._added:
+                if not handle.isValid():
+                    continue
+                node = handle.object()
+                if node.hasFn(om.MFn.kDagNode):
+                    created.append(om.MFnDagNode(node).partialPathName())
+                else:
+                    created.append(om.MFnDependencyNode(node).name())
+            self._added = []
+            self.created = created
+
+        else:
+            before = self._before or set()
+            self.created = [node for node in cmds.ls() if node not in before]
+            self._before = None
+
+    # --------------------------------------------------------------------
+    # Context
+
+    def __enter__(self):
+        global _active_transaction
+
+        self.parent = _active_transaction
+        _active_transaction = self
+
+        if self.is_outermost:
+            self._undo_chunk = bool(cmds.undoInfo(query=True, state=True))
+            if self._undo_chunk:
+                cmds.undoInfo(openChunk=True, chunkName=self.name)
+
+        self._start_tracking()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        failed = type is not None
+        try:
+            callbacks, self.exit_callbacks = self.exit_callbacks, []
+            for callback in callbacks:
+                callback()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._close(failed)
+
+        return False
+
+    def _close(self, failed: bool):
+        global _active_transaction
+
+        try:
+            self._stop_tracking()
+        finally:
+            _active_transaction = self.parent
+
+            if self._undo_chunk:
+                cmds.undoInfo(closeChunk=True)
+
+        if failed and self.is_outermost:
+            self.rollback()
+
+    def rollback(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - None
+
+        # Undoes the chunk of the transaction, which also reverts the edits
+        # made to existing nodes. Without undo, only the created nodes can be
+        # deleted : the existing nodes parented under them go back to the world.
+
+        ###################################
+
+        if self._undo_chunk:
+            cmds.undo()
+
+        delete_created(self.created)
+
+        self.rolled_back = True
+
+
+def delete_created(nodes: List[str]):
+
+    ###################################
+
+    # Inputs - nodes, List[str]
+    # Returns - None
+
+    # Deletes the nodes a build created that are still in the scene. The
+    # existing nodes parented under them go back to the world.
+
+    ###################################
+
+    leftovers = cmds.ls(nodes) if nodes else []
+
+    if leftovers:
+        created = set(leftovers)
+        children = cmds.listRelatives(leftovers, children=True, type=["transform", "joint"]) or []
+        kept = [child for child in children if child not in created]
+        if kept:
+            cmds.parent(kept, world=True)
+        cmds.delete(leftovers)
+
+
+# Channels NodeState restores, with their lock and keyable state
+STATE_CHANNELS = [attr + axis for attr in ("translate", "rotate", "scale") for axis in "XYZ"] + ["visibility"]
+
+
+class NodeState:
+
+    ###################################
+
+    # The state of existing nodes a build edits : parent, user attributes,
+    # channels (values, locks, keyable) and offset parent matrix. restore()
+    # puts it back, for the edits a rollback cannot undo without an undo
+    # chunk (e.g. the steps of a job run one at a time, already closed).
+
+    # state = NodeState([config.switch, config.root_joint])
+    # ... build, delete_created(nodes)
+    # state.restore()
+
+    ###################################
+
+    def __init__(self, nodes: List[str]):
+        self.states: Dict[str, Dict[str, Any]] = {node: self._read(node) for node in cmds.ls(nodes) or []}
+
+    @staticmethod
+    def _channels(node: str):
+        return STATE_CHANNELS + (["jointOrientX", "jointOrientY", "jointOrientZ"] if cmds.nodeType(node) == "joint" else [])
+
+    def _read(self, node: str):
+
+        state: Dict[str, Any] = {
+            "parent": (cmds.listRelatives(node, p=True) or [None])[0],
+            "user_attrs": {},
+            "channels": {},
+        }
+
+        for attr in cmds.listAttr(node, ud=True) or []:
+            value = cmds.getAttr(f"{node}.{attr}")
+            state["user_attrs"][attr] = value if isinstance(value, (bool, int, float)) else None
+
+        for attr in self._channels(node):
+            plug = f"{node}.{attr}"
+            state["channels"][attr] = (cmds.getAttr(plug), cmds.getAttr(plug, lock=True), cmds.getAttr(plug, keyable=True))
+
+        if cmds.attributeQuery("offsetParentMatrix", node=node, exists=True):
+            state["offsetParentMatrix"] = list(cmds.getAttr(node + ".offsetParentMatrix"))
+
+        return state
+
+    def restore(self):
+
+        ###################################
+
+        # Inputs - None
+        # Returns - None
+
+        # Deletes the user attributes added since, and sets the parent, the
+        # values, the locks and the offset parent matrix back. Run it once
+        # the created nodes are deleted, their connections with them.
+
+        ###################################
+
+        for node, state in self.states.items():
+            if not cmds.objExists(node):
+                continue
+
+            parent = (cmds.listRelatives(node, p=True) or [None])[0]
+            if parent != state["parent"]:
+                if state["parent"] and cmds.objExists(state["parent"]):
+                    cmds.parent(node, state["parent"])
+                elif parent:
+                    cmds.parent(node, world=True)
+
+            for attr in cmds.listAttr(node, ud=True) or []:
+                plug = f"{node}.{attr}"
+                if attr not in state["user_attrs"]:
+                    cmds.setAttr(plug, lock=False)
+                    cmds.deleteAttr(plug)
+                elif state["user_attrs"][attr] is not None and cmds.getAttr(plug) != state["user_attrs"][attr]:
+                    cmds.setAttr(plug, lock=False)
+                    cmds.setAttr(plug, state["user_attrs"][attr])
+
+            for attr, (value, locked, keyable) in state["channels"].items():
+                plug = f"{node}.{attr}"
+                cmds.setAttr(plug, lock=False)
+                if cmds.getAttr(plug) != value and not cmds.listConnections(plug, s=True, d=False):
+                    cmds.setAttr(plug, value)
+                cmds.setAttr(plug, lock=locked, keyable=keyable)
+
+            if "offsetParentMatrix" in state and not cmds.listConnections(node + ".offsetParentMatrix", s=True, d=False):
+                cmds.setAttr(node + ".offsetParentMatrix", state["offsetParentMatrix"], type="matrix")
+
+
+def active_transaction():
+    return _active_transaction
+
+
+def transactional(name: str):
+
+    ###################################
+
+    # Inputs - name, str
+    # Returns - decorator
+
+    # Runs the decorated function (e.g. a UI callback) in a BuildTransaction
+
+    ###################################
+
+    def decorator(function: Callable):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with BuildTransaction(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator